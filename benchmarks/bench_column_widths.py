@@ -0,0 +1,114 @@
+"""
+Column width estimation: autosize_columns over the finished sheet vs ColumnWidths while writing
+(exact and approximate), for record rows (Kapital's append_records) and a RowTable (Pasha's
+append_table).
+
+    python benchmarks/bench_column_widths.py --rows 200000
+
+Reported per mode: seconds spent on the widths alone (autosize_columns on a written sheet, or
+ColumnWidths over the same rows in SheetWriter's batches), rows written and sized per second,
+and how many columns got a different width than the exact one. The garbage collector is off
+while timing: the sheet's millions of cells make its pauses larger than the difference measured.
+"""
+import argparse
+import gc
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from openpyxl import Workbook
+from openpyxl.worksheet.worksheet import Worksheet
+
+from banks_api.excel_writer import (
+    WIDTH_APPROXIMATE, WIDTH_EXACT, ColumnWidths, SheetWriter, autosize_columns, batched,
+)
+from banks_api.row_table import RowTable
+from bench_excel_writer import synthetic_card_operations
+
+MAX_WIDTH = 50
+
+
+def timed(run: Callable[[], None]) -> float:
+    gc.collect()
+    gc.disable()
+    try:
+        started = time.perf_counter()
+        run()
+        return time.perf_counter() - started
+    finally:
+        gc.enable()
+
+
+def post_pass(write: Callable[[SheetWriter], None]) -> Tuple[float, float, List[float]]:
+    """Write without widths, then autosize_columns: (write seconds, sizing seconds, widths)."""
+    ws = Workbook().active
+    writer = SheetWriter(ws)
+    write_seconds = timed(lambda: write(writer))
+    sizing_seconds = timed(lambda: autosize_columns(ws, max_width=MAX_WIDTH))
+    return write_seconds, sizing_seconds, _widths(ws)
+
+
+def inline(write: Callable[[SheetWriter], None], observe: Callable[[ColumnWidths], None],
+           mode: str) -> Tuple[float, float, List[float]]:
+    """Write with ColumnWidths: (write + sizing seconds, sizing alone seconds, widths)."""
+    ws = Workbook().active
+    writer = SheetWriter(ws, ColumnWidths(mode, max_width=MAX_WIDTH))
+    total_seconds = timed(lambda: (write(writer), writer.autosize()))
+    sizing_seconds = timed(lambda: observe(ColumnWidths(mode, max_width=MAX_WIDTH)))
+    return total_seconds, sizing_seconds, _widths(ws)
+
+
+def _widths(ws: Worksheet) -> List[float]:
+    return [ws.column_dimensions[letter].width for letter in sorted(ws.column_dimensions)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200_000)
+    args = parser.parse_args()
+
+    operations = synthetic_card_operations(args.rows)
+    headers = list(operations[0].keys())
+    rows = [[operation.get(h) for h in headers] for operation in operations]
+    table = RowTable.from_records(operations)
+
+    def observe_rows(widths: ColumnWidths) -> None:
+        widths.observe_rows([headers])
+        for batch in batched(rows):
+            widths.observe_rows(batch)
+
+    def observe_table(widths: ColumnWidths) -> None:
+        widths.observe_rows([table.column_names])
+        widths.observe_columns([table.column(c) for c in table.column_names])
+
+    def write_records(writer: SheetWriter) -> None:
+        writer.append_header(headers)
+        writer.append_records(operations, headers)
+
+    cases = [
+        ("records", write_records, observe_rows),
+        ("RowTable", lambda writer: writer.append_table(table), observe_table),
+    ]
+
+    print(f"{args.rows:,} rows x {len(headers)} columns, widths capped at {MAX_WIDTH}")
+    print(f"{'rows':<9} {'mode':<12} {'sizing':>8} {'write+size':>11} {'rows/s':>10} {'differ':>7}")
+
+    for name, write, observe in cases:
+        write_seconds, post_sizing, post_widths = post_pass(write)
+        exact_total, exact_sizing, exact = inline(write, observe, WIDTH_EXACT)
+        approximate_total, approximate_sizing, approximate = inline(write, observe, WIDTH_APPROXIMATE)
+        results = [
+            ("post-pass", post_sizing, write_seconds + post_sizing, post_widths),
+            (WIDTH_EXACT, exact_sizing, exact_total, exact),
+            (WIDTH_APPROXIMATE, approximate_sizing, approximate_total, approximate),
+        ]
+        for mode, sizing, total, widths in results:
+            differ = sum(a != b for a, b in zip(widths, exact))
+            print(f"{name:<9} {mode:<12} {sizing:7.3f}s {total:10.2f}s {args.rows / total:>10,.0f} {differ:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Rows/second of the Cards_Statements sheet: legacy per-cell writer vs SheetWriter.
+
+    python benchmarks/bench_excel_writer.py --rows 200000
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from openpyxl import Workbook
+from openpyxl.styles import Font, PatternFill, Alignment
+
+from banks_api.excel_writer import SheetWriter, autosize_columns
+
+
+def synthetic_card_operations(count: int) -> list:
+    return [
+        {
+            "accountNumber": "4169" + str(100000000000 + i % 50),
+            "cardNumber": "4169********" + str(1000 + i % 50),
+            "operationDate": f"2024-{1 + i % 12:02d}-{1 + i % 28:02d} 12:{i % 60:02d}:00",
+            "postingDate": f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}",
+            "amount": round((i % 997) * 1.37, 2),
+            "currency": "AZN",
+            "amountInCardCurrency": round((i % 997) * 1.37, 2),
+            "fee": round((i % 13) * 0.1, 2),
+            "description": f"POS PURCHASE MERCHANT {i % 311} BAKU AZ",
+            "merchantName": f"MERCHANT {i % 311}",
+            "mcc": 5411 + i % 7,
+            "referenceNumber": f"{400000000000 + i}",
+            "approvalCode": f"{i % 999999:06d}",
+            "operationType": "DEBIT" if i % 5 else "CREDIT",
+            "status": "POSTED",
+        }
+        for i in range(count)
+    ]
+
+
+def legacy_writer(ws, operations: list) -> None:
+    """The pre-SheetWriter _prepare_excel loop (per-cell chr(64 + idx), new Font per cell)."""
+    headers = list(operations[0].keys())
+    for col_idx, header in enumerate(headers, start=1):
+        col_letter = chr(64 + col_idx)
+        cell = ws[f"{col_letter}1"]
+        cell.value = header
+        cell.font = Font(bold=True)
+        cell.fill = PatternFill(start_color="BDD7EE", end_color="BDD7EE", fill_type="solid")
+        cell.alignment = Alignment(horizontal="center")
+
+    for row_idx, operation in enumerate(operations, start=2):
+        for col_idx, header in enumerate(headers, start=1):
+            col_letter = chr(64 + col_idx)
+            cell = ws[f"{col_letter}{row_idx}"]
+            cell.value = operation.get(header, "")
+            cell.font = Font(size=11, color="000000")
+
+
+def bulk_writer(ws, operations: list) -> None:
+    headers = list(operations[0].keys())
+    writer = SheetWriter(ws)
+    writer.append_header(headers)
+    writer.append_records(operations, headers)
+
+
+def run(name: str, write, operations: list, save_dir: Path) -> float:
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Cards_Statements"
+
+    started = time.perf_counter()
+    write(ws, operations)
+    autosize_columns(ws, max_width=50)
+    wb.save(save_dir / f"bench_{name}.xlsx")
+    elapsed = time.perf_counter() - started
+
+    rate = len(operations) / elapsed
+    print(f"{name:>8}: {elapsed:8.2f}s  {rate:12,.0f} rows/s")
+    return rate
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--out", type=Path, default=Path("/tmp"))
+    args = parser.parse_args()
+
+    operations = synthetic_card_operations(args.rows)
+    print(f"Cards_Statements with {args.rows:,} operations x {len(operations[0])} columns")
+
+    before = run("legacy", legacy_writer, operations, args.out)
+    after = run("bulk", bulk_writer, operations, args.out)
+    print(f" speedup: {after / before:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+End-to-end export throughput against a local fake bank (benchmarks/fake_bank_server.py), no real API.
+
+    python benchmarks/bench_export.py                          # small and 10k scenarios, both banks
+    python benchmarks/bench_export.py --scenario 1m --bank pasha --latency 0.05
+    python benchmarks/bench_export.py --scenario 10k --asyncio --stream-json
+    python benchmarks/bench_export.py --scenario 1m --bank pasha --format parquet
+
+Each run is one process_data call in a fresh process (peak RSS is that process' ru_maxrss),
+with the fake server in this process. Reported: wall time of process_data, requests answered
+by the server and requests per second, MiB received, peak RSS. Rate limits are off unless
+--rate-limited, so the numbers are the client's, not the limiter's.
+"""
+import argparse
+import logging
+import multiprocessing
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from fake_bank_server import KAPITAL_PREFIX, FakeBank, FakeBankServer
+
+# операций выписок на одну выгрузку банка и число счетов
+SCENARIOS = {
+    "small": {"operations": 500, "accounts": 3},
+    "10k": {"operations": 10_000, "accounts": 10},
+    "1m": {"operations": 1_000_000, "accounts": 20},
+}
+
+DATE_FROM = "2024-01-01"
+DATE_TO = "2024-12-31"
+
+
+def run_export(bank: str, url: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    """One process_data in this (child) process: wall time, result and peak RSS."""
+    logging.basicConfig(level=logging.ERROR)
+
+    from banks_api.rate_limiter import RateLimiter
+
+    # (0, 1) — без ограничения; иначе встроенные лимиты DEFAULT_RATE_LIMITS
+    rate_limiter = RateLimiter() if options["rate_limited"] else RateLimiter({(bank, "*"): (0, 1)})
+    output_dir = Path(tempfile.mkdtemp(prefix=f"bench-{bank}-"))
+    kwargs = dict(rate_limiter=rate_limiter, use_asyncio=options["asyncio"], streaming_json=options["stream_json"],
+                  report_format=options["format"], sheet_rows=options["sheet_rows"], shard_by=options["shard_by"],
+                  column_widths=options["column_widths"])
+
+    if bank == "pasha":
+        from banks_api.pasha_bank_api import PashaBankAPI
+
+        client = PashaBankAPI(output_dir, streaming_export=options["streaming_export"], **kwargs)
+        client.base_url = url
+        start = time.perf_counter()
+        ok = client.process_data(DATE_FROM, DATE_TO, "jwt", "api-key")
+    else:
+        from banks_api.kapital_bank_api import KapitalBankAPI
+
+        client = KapitalBankAPI(output_dir, **kwargs)
+        client.base_url = url + KAPITAL_PREFIX
+        day_from, day_to = (f"{d[8:10]}-{d[5:7]}-{d[:4]}" for d in (DATE_FROM, DATE_TO))
+        start = time.perf_counter()
+        ok = client.process_data(day_from, day_to, "user", "password")
+
+    elapsed = time.perf_counter() - start
+    # отчёт — файл (xlsx, sqlite) или каталог с файлом на таблицу (csv, parquet)
+    report_bytes = sum(path.stat().st_size for path in output_dir.rglob("*") if path.is_file())
+    result = {
+        "ok": bool(ok),
+        "seconds": elapsed,
+        "peak_rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "report_mib": report_bytes / 2 ** 20,
+    }
+    shutil.rmtree(output_dir, ignore_errors=True)
+    return result
+
+
+def run(server: FakeBankServer, bank: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    requests_before, bytes_before = server.stats()
+    # новый процесс на каждый прогон: пиковая память не наследуется от предыдущего
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        result = executor.submit(run_export, bank, server.url, options).result()
+    requests_after, bytes_after = server.stats()
+
+    result["requests"] = requests_after - requests_before
+    result["received_mib"] = (bytes_after - bytes_before) / 2 ** 20
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS,
+                        help="scenario to run, repeatable (default: small and 10k; 1m takes minutes)")
+    parser.add_argument("--bank", action="append", choices=("pasha", "kapital"), help="default: both")
+    parser.add_argument("--latency", type=float, default=0.02, help="server delay per request, seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random delay per request, up to seconds")
+    parser.add_argument("--page-size", type=int, default=500, help="operations per Pasha statements page")
+    parser.add_argument("--asyncio", action="store_true", help="clients fetch through asyncio (needs aiohttp)")
+    parser.add_argument("--stream-json", action="store_true", help="streamed JSON parsing (needs ijson)")
+    parser.add_argument("--streaming-export", action="store_true", help="Pasha write_only workbook")
+    parser.add_argument("--rate-limited", action="store_true", help="keep the built-in per-bank rate limits")
+    parser.add_argument("--format", default="xlsx", choices=("xlsx", "csv", "parquet", "sqlite"),
+                        help="report format (banks_api.report_sinks)")
+    parser.add_argument("--sheet-rows", type=int, help="xlsx rows per sheet (default: Excel's limit)")
+    parser.add_argument("--shard-by", choices=("account", "month"), help="xlsx statements per account / month")
+    parser.add_argument("--column-widths", default="exact", choices=("exact", "approximate"),
+                        help="xlsx column widths from every value or from a sample of the rows")
+    args = parser.parse_args()
+
+    options = {
+        "asyncio": args.asyncio,
+        "stream_json": args.stream_json,
+        "streaming_export": args.streaming_export,
+        "rate_limited": args.rate_limited,
+    }
+
+    variant = ", ".join(name for name, enabled in options.items() if enabled) or "defaults"
+    options.update(format=args.format, sheet_rows=args.sheet_rows, shard_by=args.shard_by,
+                   column_widths=args.column_widths)
+    variant += f", {args.format}"
+    if args.column_widths != "exact":
+        variant += f", {args.column_widths} widths"
+    if args.sheet_rows or args.shard_by:
+        variant += f", sheets of {args.sheet_rows or 'max'} rows by {args.shard_by or 'count'}"
+    print(f"latency {args.latency * 1000:.0f} ms (+{args.jitter * 1000:.0f} ms jitter), {variant}")
+    print(f"{'scenario':<8} {'bank':<8} {'ok':<3} {'wall':>9} {'requests':>9} {'req/s':>8} "
+          f"{'received':>10} {'report':>9} {'peak RSS':>10}")
+
+    for scenario in args.scenario or ["small", "10k"]:
+        bank_data = FakeBank(page_size=args.page_size, **SCENARIOS[scenario])
+        with FakeBankServer(bank_data, latency=args.latency, jitter=args.jitter) as server:
+            for bank in args.bank or ["pasha", "kapital"]:
+                r = run(server, bank, options)
+                print(f"{scenario:<8} {bank:<8} {'yes' if r['ok'] else 'NO':<3} {r['seconds']:8.2f}s "
+                      f"{r['requests']:>9} {r['requests'] / r['seconds']:>8.1f} {r['received_mib']:>7.1f} MiB "
+                      f"{r['report_mib']:>5.1f} MiB {r['peak_rss_mib']:>6.0f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Statement/POS row building: the old hand-written dict builders vs the compiled RecordExtractor schemas.
+
+    python benchmarks/bench_field_mapping.py --pages 500 --ops 100
+"""
+import argparse
+import sys
+import timeit
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from banks_api.pasha_bank_api import PashaBankAPI, _normalize_value
+
+
+def legacy_statements_rows(account_id: str, statements_obj: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """_gather_statements_rows before the field schemas (operations branch)."""
+    rows = []
+    for op in statements_obj.get("operations", []) or []:
+        r = {
+            "accountNo": account_id,
+            "openingBalance": statements_obj.get("openingBalance", 0),
+            "closingBalance": statements_obj.get("closingBalance", 0),
+            "availableOpeningBalance": statements_obj.get("availableOpeningBalance", 0),
+            "availableClosingBalance": statements_obj.get("availableClosingBalance", 0),
+            "message": _normalize_value(statements_obj.get("message", "")),
+            "page_current": statements_obj.get("pagination", {}).get("currentPage"),
+            "page_total": statements_obj.get("pagination", {}).get("totalPages"),
+            "operationDate": _normalize_value(op.get("operationDate")),
+            "transactionDate": _normalize_value(op.get("transactionDate")),
+            "transactionNo": _normalize_value(op.get("transactionNo")),
+            "transactionType": _normalize_value(op.get("transactionType")),
+            "transactionDescription": _normalize_value(op.get("transactionDescription")),
+            "transactionCurrency": _normalize_value(op.get("transactionCurrency")),
+            "amountInTransactionCurrency": op.get("amountInTransactionCurrency") if op.get(
+                "amountInTransactionCurrency") is not None else "N/A",
+            "amountInAccountCurrency": op.get("amountInAccountCurrency") if op.get(
+                "amountInAccountCurrency") is not None else "N/A",
+            "amountInTransactionCurrencyAzn": op.get("amountInTransactionCurrencyAzn") if op.get(
+                "amountInTransactionCurrencyAzn") is not None else "N/A",
+            "transactionFXRate": op.get("transactionFXRate") if op.get("transactionFXRate") is not None else "N/A",
+            "openingBalance_op": op.get("openingBalance") if op.get("openingBalance") is not None else "N/A",
+            "closingBalance_op": op.get("closingBalance") if op.get("closingBalance") is not None else "N/A",
+            "openingAvlBalance": op.get("openingAvlBalance") if op.get("openingAvlBalance") is not None else "N/A",
+            "closingAvlBalance": op.get("closingAvlBalance") if op.get("closingAvlBalance") is not None else "N/A",
+            "afterOperationBalance": op.get("afterOperationBalance") if op.get(
+                "afterOperationBalance") is not None else "N/A",
+            "afterOperationAvlBalance": op.get("afterOperationAvlBalance") if op.get(
+                "afterOperationAvlBalance") is not None else "N/A",
+            "counterPartyName": _normalize_value(op.get("counterPartyName")),
+            "counterPartyId": _normalize_value(op.get("counterPartyId")),
+            "counterPartyTin": _normalize_value(op.get("counterPartyTin")),
+            "counterPartyPin": _normalize_value(op.get("counterPartyPin")),
+            "cardNo": _normalize_value(op.get("cardNo")),
+            "sourceSystem": _normalize_value(op.get("sourceSystem"))
+        }
+        r["page_current"] = r.get("page_current") if r.get("page_current") is not None else "N/A"
+        r["page_total"] = r.get("page_total") if r.get("page_total") is not None else "N/A"
+        rows.append(r)
+    return rows
+
+
+def legacy_pos_rows(account_id: str, pos_blocks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """_gather_pos_rows before the field schemas."""
+    rows: List[Dict[str, Any]] = []
+    for block in pos_blocks:
+        opening = block.get("openingBalance", {}) or {}
+        closing = block.get("closingBalance", {}) or {}
+        terminal = block.get("terminalInfo", {}) or {}
+
+        summary_row = {
+            "rowType": "Summary",
+            "accountNo": account_id,
+            "terminalId": _normalize_value(terminal.get("id")),
+            "terminalAddress": _normalize_value(terminal.get("address")),
+            "opening_amountToReceive": opening.get("amountToReceive", "N/A"),
+            "opening_transactionAmount": opening.get("transactionAmount", "N/A"),
+            "opening_transactionCurrency": _normalize_value(opening.get("transactionCurrency")),
+            "opening_cashBack": opening.get("cashBack", "N/A"),
+            "opening_transactionFee": opening.get("transactionFee", "N/A"),
+            "closing_amountToReceive": closing.get("amountToReceive", "N/A"),
+            "closing_transactionAmount": closing.get("transactionAmount", "N/A"),
+            "closing_transactionCurrency": _normalize_value(closing.get("transactionCurrency")),
+            "closing_cashBack": closing.get("cashBack", "N/A"),
+            "closing_transactionFee": closing.get("transactionFee", "N/A"),
+        }
+        rows.append({k: _normalize_value(v) for k, v in summary_row.items()})
+
+        for op in block.get("posOperationEntityList", []) or []:
+            balance = op.get("balance", {}) or {}
+            op_row = {
+                "rowType": "Operation",
+                "accountNo": account_id,
+                "terminalId": _normalize_value(terminal.get("id")),
+                "postingDate": _normalize_value(op.get("postingDate")),
+                "transactionDate": _normalize_value(op.get("transactionDate")),
+                "transactionTime": _normalize_value(op.get("transactionTime")),
+                "cardName": _normalize_value(op.get("cardName")),
+                "cardNumber": _normalize_value(op.get("cardNumber")),
+                "cardType": _normalize_value(op.get("cardType")),
+                "approvalCode": _normalize_value(op.get("approvalCode")),
+                "description": _normalize_value(op.get("description")),
+                "processingType": _normalize_value(op.get("processingType")),
+                "referenceNumber": _normalize_value(op.get("referenceNumber")),
+                "taksitCount": _normalize_value(op.get("taksitCount")),
+                "balance_amountToReceive": balance.get("amountToReceive", "N/A"),
+                "balance_cashBack": balance.get("cashBack", "N/A"),
+                "balance_transactionAmount": balance.get("transactionAmount", "N/A"),
+                "balance_transactionCurrency": _normalize_value(balance.get("transactionCurrency")),
+                "balance_transactionFee": balance.get("transactionFee", "N/A"),
+            }
+            rows.append({k: _normalize_value(v) for k, v in op_row.items()})
+    return rows
+
+
+def synthetic_page(page: int, ops: int) -> Dict[str, Any]:
+    return {
+        "openingBalance": 1500.25, "closingBalance": 1720.5,
+        "availableOpeningBalance": 1500.25, "availableClosingBalance": 1720.5,
+        "message": None,
+        "pagination": {"currentPage": page, "totalPages": 500},
+        "operations": [
+            {
+                "operationDate": "2024-03-01", "transactionDate": "2024-03-01T10:15:00",
+                "transactionNo": f"TRN{page * ops + i}", "transactionType": "D" if i % 3 else "C",
+                "transactionDescription": f"PAYMENT {i}", "transactionCurrency": "AZN",
+                "amountInTransactionCurrency": i * 1.1, "amountInAccountCurrency": i * 1.1,
+                "amountInTransactionCurrencyAzn": None, "transactionFXRate": 1,
+                "openingBalance": 100.0, "closingBalance": 90.0,
+                "counterPartyName": f"COUNTERPARTY {i % 17}", "counterPartyTin": "",
+                "sourceSystem": "CBS",
+            }
+            for i in range(ops)
+        ],
+    }
+
+
+def synthetic_pos_blocks(blocks: int, ops: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "terminalInfo": {"id": f"T{b}", "address": "BAKU"},
+            "openingBalance": {"amountToReceive": 10, "transactionAmount": 12, "transactionCurrency": "AZN"},
+            "closingBalance": {"amountToReceive": 20, "transactionAmount": 22, "transactionCurrency": "AZN"},
+            "posOperationEntityList": [
+                {
+                    "postingDate": "2024-03-01", "transactionDate": "2024-03-01", "transactionTime": "10:15",
+                    "cardNumber": "4169********1234", "cardType": "VISA", "approvalCode": f"{i:06d}",
+                    "referenceNumber": f"{b * ops + i}", "description": "",
+                    "balance": {"amountToReceive": 9.8, "transactionAmount": 10, "transactionCurrency": "AZN"},
+                }
+                for i in range(ops)
+            ],
+        }
+        for b in range(blocks)
+    ]
+
+
+def bench(name: str, func, rows: int, repeat: int) -> float:
+    best = min(timeit.repeat(func, number=1, repeat=repeat))
+    print(f"  {name:<10} {best * 1000:8.1f} ms  {rows / best:>12,.0f} rows/s")
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--ops", type=int, default=100, help="operations per page / POS block")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    client = PashaBankAPI(excel_path=None)
+    pages = [synthetic_page(p, args.ops) for p in range(1, args.pages + 1)]
+    blocks = synthetic_pos_blocks(args.pages, args.ops)
+    rows = args.pages * args.ops
+
+    print(f"statements: {args.pages} pages x {args.ops} operations")
+    legacy = bench("legacy", lambda: [legacy_statements_rows("ACC", page) for page in pages], rows, args.repeat)
+    schema = bench("schema", lambda: [client._gather_statements_rows("ACC", page) for page in pages],
+                   rows, args.repeat)
+    print(f"  speedup    {legacy / schema:8.2f}x")
+
+    print(f"POS: {args.pages} blocks x {args.ops} operations")
+    legacy = bench("legacy", lambda: legacy_pos_rows("ACC", blocks), rows + args.pages, args.repeat)
+    schema = bench("schema", lambda: client._gather_pos_rows("ACC", blocks), rows + args.pages, args.repeat)
+    print(f"  speedup    {legacy / schema:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
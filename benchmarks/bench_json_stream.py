@@ -0,0 +1,113 @@
+"""
+Large statement responses: response.json() vs streaming parse (banks_api.json_stream).
+
+    python benchmarks/bench_json_stream.py --operations 200000
+
+Each run parses one Pasha-style statements page of --operations operations into report rows,
+reading the body from a requests.Response (the socket is replaced by an in-memory stream, its
+bytes are allocated before tracing starts). "json" is the old path: resp.json(), then the
+extractor over the operations list; "stream" parses operations one at a time (ijson when
+installed, json fallback otherwise) and keeps only the extracted rows; "items" is the same
+without collecting the rest of the page (keep_rest=False, Kapital card statements).
+"""
+import argparse
+import gc
+import io
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import requests
+
+from banks_api import json_stream
+from banks_api.json_stream import stream_array
+from banks_api.pasha_bank_api import STATEMENT_OPERATION_EXTRACTOR
+
+
+def synthetic_body(count: int) -> bytes:
+    operations = [
+        {
+            "operationDate": f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}",
+            "transactionDate": f"2024-{1 + i % 12:02d}-{1 + i % 28:02d} 10:{i % 60:02d}:00",
+            "transactionNo": f"TRN{900000000 + i}",
+            "transactionType": "D" if i % 3 else "C",
+            "transactionDescription": f"PAYMENT TO COUNTERPARTY {i % 509} " + "X" * (i % 40),
+            "amountInTransactionCurrency": round((i % 1999) * 0.73, 2),
+            "transactionCurrency": "AZN",
+            "amountInAccountCurrency": round((i % 1999) * 0.73, 2),
+            "openingBalance": 1000.0 + i % 77,
+            "closingBalance": 1000.0 + i % 91,
+            "counterPartyName": f"COUNTERPARTY {i % 509}",
+            "counterPartyTin": f"{1400000000 + i % 509}",
+            "counterPartyPin": None,
+            "sourceSystem": "CBS",
+        }
+        for i in range(count)
+    ]
+    return json.dumps({
+        "operations": operations,
+        "openingBalance": 1000.0,
+        "closingBalance": 2000.0,
+        "paginationMetaData": {"currentPage": 1, "totalPages": 1},
+        "message": "",
+    }).encode()
+
+
+def response(body: bytes) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = 200
+    resp.raw = io.BytesIO(body)
+    return resp
+
+
+def parse_json(body: bytes) -> int:
+    data = response(body).json()
+    rows = STATEMENT_OPERATION_EXTRACTOR.many(data.get("operations") or [])
+    return len(rows)
+
+
+def parse_stream(body: bytes) -> int:
+    rows = STATEMENT_OPERATION_EXTRACTOR.many(stream_array(response(body), "operations"))
+    return len(rows)
+
+
+def parse_items(body: bytes) -> int:
+    rows = STATEMENT_OPERATION_EXTRACTOR.many(stream_array(response(body), "operations", keep_rest=False))
+    return len(rows)
+
+
+def run(name: str, parse, body: bytes) -> None:
+    gc.collect()
+    start = time.perf_counter()
+    count = parse(body)
+    elapsed = time.perf_counter() - start
+
+    gc.collect()
+    tracemalloc.start()
+    parse(body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{name:<7} {elapsed:8.2f} s  {count / elapsed:>10,.0f} ops/s  peak {peak / 2 ** 20:8.1f} MiB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--operations", type=int, default=200_000)
+    args = parser.parse_args()
+
+    body = synthetic_body(args.operations)
+    backend = json_stream.ijson.backend if json_stream.ijson is not None else "json fallback"
+    print(f"{args.operations:,} operations, body {len(body) / 2 ** 20:.1f} MiB, stream parser: {backend}")
+
+    run("json", parse_json, body)
+    run("stream", parse_stream, body)
+    run("items", parse_items, body)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Statements sheet rows: pandas DataFrame (old save_report path) vs RowTable.
+
+    python benchmarks/bench_row_table.py --rows 500000
+    python benchmarks/bench_row_table.py --rows 500000 --xlsx   # also write the rows to a write_only sheet
+
+Both paths start from the same list of statement dicts and produce the header plus row
+values in STATEMENT_COLUMNS order. Time is measured without tracing; peak memory is
+measured in a second pass with tracemalloc (numpy reports its buffers to tracemalloc too).
+"""
+import argparse
+import collections
+import gc
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from openpyxl import Workbook
+
+from banks_api.pasha_bank_api import STATEMENT_COLUMNS
+from banks_api.row_table import RowTable
+
+
+def synthetic_statements(count: int) -> list:
+    return [
+        {
+            "accountNo": f"AZ{10 + i % 40}PAHA0000000000{i % 40:04d}",
+            "operationDate": f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}",
+            "transactionDate": f"2024-{1 + i % 12:02d}-{1 + i % 28:02d} 10:{i % 60:02d}:00",
+            "transactionNo": f"TRN{900000000 + i}",
+            "transactionType": "D" if i % 3 else "C",
+            "transactionDescription": f"PAYMENT TO COUNTERPARTY {i % 509}",
+            "amountInTransactionCurrency": round((i % 1999) * 0.73, 2),
+            "transactionCurrency": "AZN",
+            "amountInAccountCurrency": round((i % 1999) * 0.73, 2),
+            "openingBalance_op": 1000.0 + i % 77,
+            "closingBalance_op": 1000.0 + i % 91,
+            "counterPartyName": f"COUNTERPARTY {i % 509}",
+            "counterPartyTin": f"{1400000000 + i % 509}",
+            "sourceSystem": "CBS",
+            "page_current": 1 + i // 100,
+            "page_total": 1 + count // 100,
+        }
+        for i in range(count)
+    ]
+
+
+def pandas_rows(records: list):
+    import pandas as pd
+    from openpyxl.utils.dataframe import dataframe_to_rows
+
+    df = pd.DataFrame(records)
+    cols = [c for c in STATEMENT_COLUMNS if c in df.columns] + [c for c in df.columns if c not in STATEMENT_COLUMNS]
+    df = df[cols]
+    return dataframe_to_rows(df, index=False, header=True)
+
+
+def row_table_rows(records: list):
+    table = RowTable.from_records(records, STATEMENT_COLUMNS)
+    columns = table.column_names
+    yield columns
+    yield from table.rows(columns)
+
+
+def consume(rows, xlsx: bool) -> None:
+    if not xlsx:
+        collections.deque(rows, maxlen=0)
+        return
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Statements")
+    for values in rows:
+        ws.append(values)
+    with tempfile.TemporaryFile() as f:
+        wb.save(f)
+
+
+def run(name: str, build, records: list, xlsx: bool) -> None:
+    gc.collect()
+    start = time.perf_counter()
+    consume(build(records), xlsx)
+    elapsed = time.perf_counter() - start
+
+    gc.collect()
+    tracemalloc.start()
+    consume(build(records), xlsx)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{name:<10} {elapsed:8.2f} s  {len(records) / elapsed:>10,.0f} rows/s  peak {peak / 2 ** 20:8.1f} MiB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--xlsx", action="store_true", help="write rows into a write_only workbook")
+    args = parser.parse_args()
+
+    records = synthetic_statements(args.rows)
+    print(f"{args.rows:,} statement rows, {len(records[0])} columns")
+
+    run("pandas", pandas_rows, records, args.xlsx)
+    run("RowTable", row_table_rows, records, args.xlsx)
+
+
+if __name__ == "__main__":
+    main()
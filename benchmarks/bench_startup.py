@@ -0,0 +1,96 @@
+"""
+Cold import time of the desktop app modules, measured with `python -X importtime`.
+
+    python benchmarks/bench_startup.py --budget-ms 250
+
+Imports what main.py imports before the window appears (main.py itself starts the Tk
+main loop, so it is not imported). Exits with 1 when the total is over budget or when a
+module that must load lazily (pandas, openpyxl, requests) is imported at startup.
+tests/test_startup.py checks the same budget and lazy modules.
+"""
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+
+STARTUP_MODULES = ["db.db_utils", "banks_api.api_logger", "tkinter_utils"]
+
+# загружаются только при первой выгрузке
+LAZY_MODULES = ["pandas", "openpyxl", "requests"]
+
+# бюджет импортов при старте, мс
+BUDGET_MS = 250.0
+
+
+def measure_imports(python: str, code: str) -> dict:
+    """Cumulative import time (us) of every top-level import done by the interpreter running `code`."""
+    result = subprocess.run([python, "-X", "importtime", "-c", code], cwd=SRC,
+                            capture_output=True, text=True, check=True)
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # вложенные импорты идут с отступом, их время уже входит в cumulative родителя
+        if not name[1:].startswith(" "):
+            timings[name.strip()] = int(cumulative)
+    return timings
+
+
+def measure_all_imports(python: str, code: str) -> set:
+    """Names of all modules (nested ones too) loaded by `code`."""
+    result = subprocess.run([python, "-c", f"import sys; {code}; print(' '.join(sys.modules))"], cwd=SRC,
+                            capture_output=True, text=True, check=True)
+    return set(result.stdout.split())
+
+
+def startup_code() -> str:
+    return "; ".join(f"import {module}" for module in STARTUP_MODULES)
+
+
+def measure_startup(python: str, runs: int) -> dict:
+    """Import timings (us) of the startup modules, the best of `runs` cold starts."""
+    # site, encodings и т.п. импортирует сам интерпретатор — в бюджет не входят
+    interpreter = set(measure_imports(python, "pass"))
+
+    measured = []
+    for _ in range(max(1, runs)):
+        timings = measure_imports(python, startup_code())
+        measured.append({name: us for name, us in timings.items() if name not in interpreter})
+    return min(measured, key=lambda run: sum(run.values()))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget-ms", type=float, default=BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=5, help="best of N cold interpreter starts")
+    parser.add_argument("--python", default=sys.executable)
+    args = parser.parse_args()
+
+    code = startup_code()
+    timings = measure_startup(args.python, args.runs)
+    total_ms = sum(timings.values()) / 1000
+
+    print(f"startup imports: {total_ms:.1f} ms (budget {args.budget_ms:.0f} ms, best of {max(1, args.runs)})")
+    for name, us in sorted(timings.items(), key=lambda item: item[1], reverse=True)[:10]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    failed = False
+    all_imported = measure_all_imports(args.python, code)
+    eager = [module for module in LAZY_MODULES if module in all_imported]
+    if eager:
+        print(f"FAIL: imported at startup: {', '.join(eager)}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print("FAIL: over budget")
+        failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
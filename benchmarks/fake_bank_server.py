@@ -0,0 +1,406 @@
+"""
+Local fake of the Pasha and Kapital APIs for offline benchmarks (benchmarks/bench_export.py) and tests.
+
+    with FakeBankServer(FakeBank(operations=10_000, accounts=10), latency=0.02) as server:
+        client.base_url = server.url            # Pasha
+        client.base_url = server.url + "/b2b"   # Kapital
+
+Serves the endpoints and paging the clients use: Pasha /api/v1/accounts, statements pages
+(/current/paginated, paginationMetaData) and POS pages (cursorToken); Kapital /login, /refresh,
+/accounts, /cards, /v2/statement/account and /v2/statement/card. Data is synthetic and
+deterministic, generated per request (the server never holds a whole scale in memory).
+Every request sleeps latency (+ up to jitter) seconds before answering.
+
+For retry tests the server can answer the next requests to a path with scripted failures
+instead of data (FakeBankServer.script) and keeps a log of the requests it received.
+"""
+import json
+import random
+import threading
+import time
+from collections import deque
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Deque, Dict, List, NamedTuple, Optional, Tuple, Union
+from urllib.parse import parse_qs, urlsplit
+
+# Kapital API лежит под своим префиксом, чтобы оба банка обслуживал один сервер
+KAPITAL_PREFIX = "/b2b"
+
+# сбой из сценария: закрыть соединение, ничего не ответив
+DROP = "drop"
+
+# ответ из сценария: статус, (статус, заголовки) или DROP
+ScriptedReply = Union[int, Tuple[int, Dict[str, str]], str]
+
+
+class ReceivedRequest(NamedTuple):
+    at: float  # time.monotonic() прихода запроса
+    method: str
+    path: str
+    query: Dict[str, str]
+
+
+class FakeBank:
+    """
+    Synthetic accounts and operations at a given scale.
+
+    operations is the number of statement operations of one export of each bank over
+    [date_from, date_to]: Pasha spreads them over accounts in pages of page_size (plus
+    pos_share of them as POS operations); Kapital gives card_share of them to card
+    statements and the rest to account statements. Each of the cards card accounts holds
+    cards_per_account cards (GET /cards lists them all, statements are per account).
+    """
+
+    def __init__(self, operations: int, accounts: int = 10, page_size: int = 500, pos_share: float = 0.1,
+                 pos_page_blocks: int = 5, card_share: float = 0.25, cards: Optional[int] = None,
+                 cards_per_account: int = 1, date_from: date = date(2024, 1, 1),
+                 date_to: date = date(2024, 12, 31)) -> None:
+        self.operations = operations
+        self.accounts = max(1, accounts)
+        self.page_size = max(1, page_size)
+        self.pos_share = pos_share
+        self.pos_page_blocks = max(1, pos_page_blocks)
+        self.card_share = card_share
+        self.cards = cards if cards is not None else max(1, self.accounts // 2)
+        self.cards_per_account = max(1, cards_per_account)
+        self.date_from = date_from
+        self.date_to = date_to
+
+    # ---------- распределение операций ----------
+    def _share(self, total: int, parts: int, index: int) -> int:
+        """index-th of parts near-equal shares of total."""
+        return total // parts + (1 if index < total % parts else 0)
+
+    def pasha_operations(self, account: int) -> int:
+        return self._share(self.operations, self.accounts, account)
+
+    def pasha_pos_operations(self, account: int) -> int:
+        return self._share(int(self.operations * self.pos_share), self.accounts, account)
+
+    def kapital_operations(self, account: int) -> int:
+        return self._share(self.operations - self.kapital_card_total(), self.accounts, account)
+
+    def kapital_card_total(self) -> int:
+        return int(self.operations * self.card_share)
+
+    def kapital_card_operations(self, card: int, day_from: date, day_to: date) -> Tuple[int, int]:
+        """(offset, count) of the card's operations whose day falls in [day_from, day_to]."""
+        total = self._share(self.kapital_card_total(), self.cards, card)
+        span = (self.date_to - self.date_from).days + 1
+
+        # операции карты равномерно распределены по дням диапазона выгрузки
+        def before(day: date) -> int:
+            days = min(max((day - self.date_from).days, 0), span)
+            return total * days // span
+
+        start, end = before(day_from), before(date.fromordinal(day_to.toordinal() + 1))
+        return start, end - start
+
+    def _day(self, i: int, count: int) -> date:
+        span = (self.date_to - self.date_from).days + 1
+        return date.fromordinal(self.date_from.toordinal() + (i * span // max(1, count)))
+
+    # ---------- Pasha ----------
+    def pasha_accounts(self) -> Dict[str, Any]:
+        return {"accounts": [
+            {
+                "accountNo": f"AZ{i:02d}PAHA{40060000000000 + i}",
+                "iban": f"AZ{i:02d}PAHA{40060000000000 + i}",
+                "currency": "AZN",
+                "accountName": f"CURRENT ACCOUNT {i}",
+                "currentBalance": 10000.0 + i,
+                "availableBalance": 9000.0 + i,
+                "accountStatus": "ACTIVE",
+                "branchCode": "001",
+                "accountType": "CURRENT",
+            }
+            for i in range(self.accounts)
+        ]}
+
+    def pasha_statements_page(self, account: int, page: int) -> Dict[str, Any]:
+        count = self.pasha_operations(account)
+        total_pages = max(1, -(-count // self.page_size))
+        if count == 0:
+            return {"operations": [], "message": "There is no operations for the period"}
+
+        start = (page - 1) * self.page_size
+        end = min(count, start + self.page_size)
+        operations = [self._pasha_operation(account, i, count) for i in range(start, end)]
+        return {
+            "operations": operations,
+            "openingBalance": 1000.0,
+            "closingBalance": 2000.0,
+            "availableOpeningBalance": 1000.0,
+            "availableClosingBalance": 2000.0,
+            "paginationMetaData": {"currentPage": page, "totalPages": total_pages},
+            "message": "",
+        }
+
+    def _pasha_operation(self, account: int, i: int, count: int) -> Dict[str, Any]:
+        day = self._day(i, count).isoformat()
+        amount = round((i % 1999) * 0.73, 2)
+        return {
+            "operationDate": day,
+            "transactionDate": f"{day} 10:{i % 60:02d}:00",
+            "transactionNo": f"TRN{account:03d}{i:09d}",
+            "transactionType": "D" if i % 3 else "C",
+            "transactionDescription": f"PAYMENT TO COUNTERPARTY {i % 509}",
+            "amountInTransactionCurrency": amount,
+            "transactionCurrency": "AZN",
+            "amountInAccountCurrency": amount,
+            "openingBalance": 1000.0 + i % 77,
+            "closingBalance": 1000.0 + i % 91,
+            "counterPartyName": f"COUNTERPARTY {i % 509}",
+            "counterPartyTin": f"{1400000000 + i % 509}",
+            "counterPartyPin": None,
+            "sourceSystem": "CBS",
+        }
+
+    def pasha_pos_page(self, account: int, cursor: int) -> Dict[str, Any]:
+        """Page cursor of the account's POS blocks (terminals), 10 operations per block."""
+        blocks = -(-self.pasha_pos_operations(account) // 10)
+        start = cursor * self.pos_page_blocks
+        page = [self._pos_block(account, b) for b in range(start, min(blocks, start + self.pos_page_blocks))]
+        next_cursor = str(cursor + 1) if start + self.pos_page_blocks < blocks else None
+        return {"data": {"posStatementList": page}, "pageResponse": {"cursorToken": next_cursor}}
+
+    def _pos_block(self, account: int, block: int) -> Dict[str, Any]:
+        balance = {"amountToReceive": 100.0, "transactionAmount": 120.0, "transactionCurrency": "AZN",
+                   "cashBack": 0.0, "transactionFee": 2.4}
+        return {
+            "terminalInfo": {"id": f"T{account:03d}{block:06d}", "address": f"BAKU, STREET {block % 97}"},
+            "openingBalance": balance,
+            "closingBalance": balance,
+            "posOperationEntityList": [
+                {
+                    "postingDate": self.date_from.isoformat(),
+                    "transactionDate": self.date_from.isoformat(),
+                    "transactionTime": f"12:{k:02d}:00",
+                    "cardName": "VISA",
+                    "cardNumber": f"4169********{1000 + k}",
+                    "cardType": "DEBIT",
+                    "approvalCode": f"{block * 10 + k:06d}",
+                    "description": "PURCHASE",
+                    "processingType": "POS",
+                    "referenceNumber": f"{account:03d}{block:07d}{k:02d}",
+                    "taksitCount": 0,
+                    "balance": {"amountToReceive": 9.8, "cashBack": 0.0, "transactionAmount": 10.0,
+                                "transactionCurrency": "AZN", "transactionFee": 0.2},
+                }
+                for k in range(10)
+            ],
+        }
+
+    # ---------- Kapital ----------
+    def kapital_accounts(self) -> Dict[str, Any]:
+        return {"responseData": {"accountsList": [
+            {
+                "branchCode": "001",
+                "custAcNo": f"{3800000000 + i}",
+                "ibanAcNo": f"AZ{i:02d}AIIB{38000000000000 + i}",
+                "ccy": "AZN",
+                "status": "ACTIVE",
+                "plannedAmt": 0,
+                "currAmt": 10000.0 + i,
+                "hold": 0,
+            }
+            for i in range(self.accounts)
+        ]}}
+
+    def kapital_account_statement(self, account_number: str) -> Dict[str, Any]:
+        account = int(account_number) - 3800000000
+        count = self.kapital_operations(account)
+        return {"responseData": {"operations": {
+            "accountInfo": {"accountNumber": account_number, "currency": "AZN", "openingBalance": 1000.0,
+                            "closingBalance": 2000.0},
+            "statementList": [self._kapital_operation(account, i, count) for i in range(count)],
+        }}}
+
+    def _kapital_operation(self, account: int, i: int, count: int) -> Dict[str, Any]:
+        return {
+            "trnDate": self._day(i, count).isoformat(),
+            "trnRefNo": f"{account:03d}{i:09d}",
+            "drcrInd": "D" if i % 3 else "C",
+            "amount": round((i % 1999) * 0.73, 2),
+            "ccy": "AZN",
+            "narrative": f"PAYMENT TO COUNTERPARTY {i % 509}",
+            "counterparty": f"COUNTERPARTY {i % 509}",
+            "balance": 1000.0 + i % 91,
+        }
+
+    def kapital_cards(self) -> Dict[str, Any]:
+        return {"responseData": {"cards": [
+            {"accountNumber": f"{4100000000 + i}", "cardNumber": f"4169********{1000 + i * self.cards_per_account + k}",
+             "cardType": "VISA", "currency": "AZN", "status": "ACTIVE"}
+            for i in range(self.cards)
+            for k in range(self.cards_per_account)
+        ]}}
+
+    def kapital_card_statement(self, account_number: str, day_from: date, day_to: date) -> Dict[str, Any]:
+        card = int(account_number) - 4100000000
+        offset, count = self.kapital_card_operations(card, day_from, day_to)
+        return {"responseData": {"operation": [
+            {
+                "operationDate": day_from.isoformat(),
+                "referenceNumber": f"{card:03d}{offset + i:09d}",
+                "amount": round(((offset + i) % 997) * 1.37, 2),
+                "currency": "AZN",
+                "description": f"POS PURCHASE MERCHANT {(offset + i) % 311} BAKU AZ",
+                "mcc": 5411 + i % 7,
+            }
+            for i in range(count)
+        ]}}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # keep-alive, как у настоящих API: клиенты переиспользуют соединения пула
+    protocol_version = "HTTP/1.1"
+    server: "FakeBankServer"
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        self._handle("GET")
+
+    def do_POST(self) -> None:
+        self._handle("POST")
+
+    def _handle(self, method: str) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"null") if length else None
+        url = urlsplit(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        scripted = self.server.receive(method, url.path, query)
+
+        self.server.pause()
+        if scripted == DROP:
+            self.close_connection = True
+            return
+        if scripted is not None:
+            status, headers = scripted if isinstance(scripted, tuple) else (scripted, {})
+            self._reply(status, {"message": f"scripted {status}"}, headers)
+            return
+
+        try:
+            payload = self.server.route(method, url.path, query, body)
+        except (KeyError, ValueError, TypeError):
+            payload = None
+
+        if payload is None:
+            self._reply(404, {"message": "not found"})
+        else:
+            self._reply(200, payload)
+
+    def _reply(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+        self.server.count(len(data))
+
+
+class FakeBankServer(ThreadingHTTPServer):
+    """HTTP server for a FakeBank in a background thread; counts requests and bytes sent, logs requests received."""
+
+    daemon_threads = True
+
+    def __init__(self, bank: FakeBank, latency: float = 0.0, jitter: float = 0.0,
+                 host: str = "127.0.0.1", port: int = 0) -> None:
+        super().__init__((host, port), _Handler)
+        self.bank = bank
+        self.latency = latency
+        self.jitter = jitter
+        self.requests = 0
+        self.bytes_sent = 0
+        self.received: List[ReceivedRequest] = []
+        self._scripts: Dict[str, Deque[ScriptedReply]] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "FakeBankServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="fake-bank", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def pause(self) -> None:
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+
+    def count(self, size: int) -> None:
+        with self._lock:
+            self.requests += 1
+            self.bytes_sent += size
+
+    def stats(self) -> Tuple[int, int]:
+        with self._lock:
+            return self.requests, self.bytes_sent
+
+    def script(self, path: str, *replies: ScriptedReply) -> None:
+        """
+        Answer the next requests to path with replies, in order, instead of the data: a status (503),
+        (status, headers) such as (429, {"Retry-After": "1"}), or DROP to close the connection unanswered.
+        """
+        with self._lock:
+            self._scripts.setdefault(path, deque()).extend(replies)
+
+    def receive(self, method: str, path: str, query: Dict[str, str]) -> Optional[ScriptedReply]:
+        """Log a request; its scripted reply, None to answer with data."""
+        with self._lock:
+            self.received.append(ReceivedRequest(time.monotonic(), method, path, query))
+            replies = self._scripts.get(path)
+            return replies.popleft() if replies else None
+
+    def requests_to(self, path: str, method: Optional[str] = None) -> List[ReceivedRequest]:
+        with self._lock:
+            return [r for r in self.received if r.path == path and (method is None or r.method == method)]
+
+    def route(self, method: str, path: str, query: Dict[str, str], body: Any) -> Optional[Dict[str, Any]]:
+        bank = self.bank
+        if path.startswith(KAPITAL_PREFIX):
+            return self._route_kapital(method, path[len(KAPITAL_PREFIX):], query)
+
+        parts: List[str] = path.strip("/").split("/")
+        if path == "/api/v1/accounts":
+            return bank.pasha_accounts()
+        if method == "POST" and path.endswith("/current/paginated"):
+            return bank.pasha_statements_page(_pasha_account(parts[3]), int(body["pageNumber"]))
+        if method == "GET" and path.endswith("/statements/pos"):
+            return bank.pasha_pos_page(_pasha_account(parts[3]), int(query.get("cursorToken") or 0))
+        return None
+
+    def _route_kapital(self, method: str, path: str, query: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        bank = self.bank
+        if method == "POST" and path in ("/login", "/refresh"):
+            token = f"token-{time.time_ns()}"
+            return {"responseData": {"jwttoken": token, "jwtrefreshtoken": f"refresh-{token}",
+                                     "userInfo": {"chatData": {"clientId": 1}}}}
+        if path == "/accounts":
+            return bank.kapital_accounts()
+        if path == "/cards":
+            return bank.kapital_cards()
+        if path == "/v2/statement/account":
+            return bank.kapital_account_statement(query["accountNumber"])
+        if path == "/v2/statement/card":
+            return bank.kapital_card_statement(query["accountNumber"], date.fromisoformat(query["fromDate"]),
+                                               date.fromisoformat(query["toDate"]))
+        return None
+
+
+def _pasha_account(account_no: str) -> int:
+    return int(account_no[8:]) - 40060000000000
@@ -1,21 +1,146 @@
+import atexit
+import copy
+import datetime
+import json
 import logging.handlers
 import os
+import queue
+import random
+import reprlib
 import time
+from typing import Any, Dict, Optional
+
+# размер файла лога до ротации и сколько старых файлов хранить
+LOG_MAX_BYTES = 10 * 2 ** 20
+LOG_BACKUP_COUNT = 5
+# сообщение длиннее обрезается при записи
+MAX_MESSAGE_CHARS = 2000
+
+# стандартные атрибуты LogRecord; остальные (extra=...) попадают в JSON отдельными полями
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+# усечённое представление данных ответа: ограниченная стоимость при любом размере
+_preview = reprlib.Repr()
+_preview.maxlevel = 3
+_preview.maxdict = 8
+_preview.maxlist = 5
+_preview.maxstring = 80
+_preview.maxother = 80
+
+_listener: Optional[logging.handlers.QueueListener] = None
+# доля записей log_payload с усечённым содержимым данных (0 — только счётчики)
+_payload_sample_rate = 0.0
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись — одна строка JSON: время, уровень, сообщение (с ограничением длины) и поля extra."""
+
+    def __init__(self, api_type: str, max_message_chars: int = MAX_MESSAGE_CHARS) -> None:
+        super().__init__()
+        self.api_type = api_type
+        self.max_message_chars = max_message_chars
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = record.getMessage()
+        if len(message) > self.max_message_chars:
+            message = f"{message[:self.max_message_chars]}... (+{len(message) - self.max_message_chars} chars)"
+
+        entry: Dict[str, Any] = {
+            "ts": datetime.datetime.fromtimestamp(record.created).astimezone().isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "api": self.api_type,
+            "pid": record.process,
+            "thread": record.threadName,
+            "msg": message,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler, который не вклеивает трассировку в сообщение (иначе её обрежет MAX_MESSAGE_CHARS)."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # сообщение собирается в потоке вызова: аргументы могут измениться, пока запись в очереди
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_api_logger(api_type: str, max_bytes: int = LOG_MAX_BYTES, backup_count: int = LOG_BACKUP_COUNT,
+                     payload_sample_rate: float = 0.0,
+                     console: bool = False) -> logging.handlers.QueueListener:
+    """
+    Log to <api_type>.log as JSON lines, rotated by size.
+
+    Records are handed to a background thread (QueueHandler/QueueListener), so the threads of an
+    export do not wait for file writes. console=True also prints plain text to stderr.
+    """
+    global _listener, _payload_sample_rate
+
+    # повторный вызов (GUI и CLI в одном процессе) ничего не меняет
+    if _listener is not None:
+        return _listener
+    _payload_sample_rate = payload_sample_rate
 
-def setup_api_logger(api_type: str):
     os.environ['TZ'] = 'Asia/Baku'
     time.tzset()
 
-    handler = logging.handlers.WatchedFileHandler(f"{api_type}.log")
-    formatter = logging.Formatter(
-        f'%(asctime)s {api_type} [%(process)d]: %(message)s',
-        '%b %d %H:%M:%S')
+    file_handler = logging.handlers.RotatingFileHandler(f"{api_type}.log", maxBytes=max_bytes,
+                                                        backupCount=backup_count, encoding="utf-8")
+    file_handler.setFormatter(JsonFormatter(api_type))
+    handlers = [file_handler]
 
+    if console:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s", "%H:%M:%S"))
+        handlers.append(console_handler)
 
-    formatter.converter = time.localtime
-    handler.setFormatter(formatter)
-
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    # записи, оставшиеся в очереди, дописываются при выходе
+    atexit.register(_listener.stop)
 
     logger = logging.getLogger()
-    logger.addHandler(handler)
+    logger.addHandler(_QueueHandler(log_queue))
     logger.setLevel(logging.INFO)
+    return _listener
+
+
+def log_payload(message: str, payload: Any, level: int = logging.INFO, **fields: Any) -> None:
+    """
+    Log what an API returned by its size (items, bytes) instead of its contents.
+
+    A payload_sample_rate share of records (setup_api_logger) also carries a truncated preview.
+    """
+    logger = logging.getLogger()
+    if not logger.isEnabledFor(level):
+        return
+
+    fields.update(payload_summary(payload))
+    if _payload_sample_rate and random.random() < _payload_sample_rate:
+        fields["payload_preview"] = _preview.repr(payload)
+
+    summary = ", ".join(f"{key}={value}" for key, value in fields.items() if key != "payload_preview")
+    logger.log(level, f"{message} ({summary})", extra=fields)
+
+
+def payload_summary(payload: Any) -> Dict[str, Any]:
+    if isinstance(payload, (bytes, str)):
+        return {"size": len(payload)}
+    if isinstance(payload, (list, tuple, dict)):
+        return {"items": len(payload)}
+    return {"type": type(payload).__name__}
@@ -0,0 +1,635 @@
+"""
+asyncio-загрузка данных Pasha и Kapital: те же запросы, лимиты, повторы, кэш и хранилище, что у
+синхронных клиентов, но все аккаунты, страницы и периоды идут из одного цикла событий.
+
+Строки отчёта строят методы самих клиентов (PashaBankAPI._gather_*_rows, KapitalRun), поэтому
+результат совпадает с синхронной выгрузкой. Нужен aiohttp (необязательная зависимость).
+
+    fetcher = AsyncPashaFetcher(client)
+    accounts, results = run_sync(fetcher.fetch_all("2024-01-01", "2024-01-31"))
+
+Много клиентов (арендаторов) в одном цикле — общий AsyncTransport и asyncio.gather:
+
+    async with AsyncTransport() as transport:
+        await asyncio.gather(*(AsyncPashaFetcher(c, transport).fetch_all(...) for c in clients))
+"""
+import asyncio
+import concurrent.futures
+import contextlib
+import json
+import logging
+import threading
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Coroutine, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from banks_api.api_logger import log_payload
+from banks_api.json_stream import AsyncStreamedArray
+from banks_api.metrics import NULL_METRICS
+from banks_api.progress import (
+    ACCOUNT_DONE, ACCOUNTS_TOTAL, BYTES_DOWNLOADED, PAGE_FETCHED, ProgressReporter, ensure_progress,
+)
+from banks_api.retry_policy import CircuitOpenError
+
+try:
+    import aiohttp
+except ImportError:  # без aiohttp доступна только синхронная выгрузка
+    aiohttp = None
+
+if TYPE_CHECKING:
+    from banks_api.kapital_bank_api import KapitalBankAPI, KapitalRun
+    from banks_api.pasha_bank_api import PashaBankAPI, StatementsPagination
+
+T = TypeVar("T")
+
+
+def run_sync(coro: Awaitable[T]) -> T:
+    """Sync facade: run a fetch coroutine on a new event loop (not from inside a running loop)."""
+    return asyncio.run(coro)
+
+
+async def in_thread(func: Callable[..., T], *args: Any) -> T:
+    """Blocking call (SQLite of the cache and the store) in the loop's thread pool, not in the loop itself."""
+    return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+
+class AsyncResponse:
+    """
+    Прочитанный ответ aiohttp с той частью интерфейса requests.Response, которой пользуются клиенты.
+
+    С read (AsyncTransport.request) тело успешного ответа не хранится: read разбирает его из
+    сокета, результат — в document, json() возвращает его.
+    """
+
+    __slots__ = ("url", "status_code", "headers", "content", "document", "parse_error", "bytes_read")
+
+    def __init__(self, url: str, status_code: int, headers: CaseInsensitiveDict, content: bytes,
+                 document: Any = None, bytes_read: Optional[int] = None,
+                 parse_error: Optional[ValueError] = None) -> None:
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.document = document
+        self.parse_error = parse_error
+        self.bytes_read = len(content) if bytes_read is None else bytes_read
+
+    def json(self) -> Any:
+        if self.parse_error is not None:
+            raise self.parse_error
+        if self.document is not None:
+            return self.document
+        try:
+            return json.loads(self.content)
+        except ValueError as e:
+            # как requests: ошибка разбора — и ValueError, и RequestException
+            raise requests.JSONDecodeError(str(e), "", 0) from e
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            kind = "Client" if self.status_code < 500 else "Server"
+            raise requests.HTTPError(f"{self.status_code} {kind} Error for url: {self.url}", response=self)
+
+
+class AsyncTransport:
+    """
+    Асинхронный аналог HttpTransport: одна aiohttp-сессия с пулом соединений на хост.
+
+    Ошибки aiohttp превращаются в исключения requests (Timeout, ConnectionError), поэтому
+    RetryPolicy и обработка ошибок клиентов работают без изменений.
+    """
+
+    def __init__(self, limit_per_host: int = 16, connect_timeout: float = 10.0, read_timeout: float = 30.0) -> None:
+        if aiohttp is None:
+            raise ImportError("asyncio export needs aiohttp: pip install aiohttp")
+
+        self.limit_per_host = limit_per_host
+        self.timeout = aiohttp.ClientTimeout(total=None, sock_connect=connect_timeout, sock_read=read_timeout)
+        self._session: Optional["aiohttp.ClientSession"] = None
+
+    async def __aenter__(self) -> "AsyncTransport":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self) -> "aiohttp.ClientSession":
+        # сессия создаётся внутри работающего цикла событий
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=0, limit_per_host=self.limit_per_host),
+                timeout=self.timeout,
+            )
+        return self._session
+
+    async def request(self, method: str, url: str, headers: Optional[Dict[str, str]] = None,
+                      read: Optional[Callable[[Any], Awaitable[Tuple[Any, int]]]] = None, **kwargs) -> AsyncResponse:
+        """
+        The response read whole, or, with read, a successful body parsed from the socket by
+        read(response.content), which returns the parsed document and the bytes it read.
+        """
+        try:
+            async with self._get_session().request(method, url, headers=headers, **kwargs) as response:
+                status, response_headers = response.status, CaseInsensitiveDict(response.headers)
+                if read is not None and status < 400:
+                    try:
+                        document, bytes_read = await read(response.content)
+                    except ValueError as e:
+                        # как у тела, прочитанного целиком: ответ получен, ошибка разбора — в json()
+                        return AsyncResponse(str(response.url), status, response_headers, b"", parse_error=e)
+                    return AsyncResponse(str(response.url), status, response_headers, b"", document, bytes_read)
+                content = await response.read()
+                return AsyncResponse(str(response.url), status, response_headers, content)
+        except asyncio.TimeoutError as e:
+            raise requests.Timeout(f"{method} {url} timed out") from e
+        except aiohttp.ClientConnectionError as e:
+            raise requests.ConnectionError(f"{method} {url}: {e}") from e
+        except aiohttp.ClientError as e:
+            raise requests.RequestException(f"{method} {url}: {e}") from e
+
+
+async def _cancel_tasks() -> None:
+    """Cancel every other task of the running loop and wait for them to finish."""
+    tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _read_operations(content: Any) -> Tuple[Tuple[Any, List[Dict[str, Any]]], int]:
+    """Pasha statements page from the socket: the page without operations and the operations' row fields."""
+    from banks_api.pasha_bank_api import STATEMENT_OPERATION_EXTRACTOR
+
+    operations = AsyncStreamedArray(content, "operations")
+    operation_rows = [STATEMENT_OPERATION_EXTRACTOR(operation) async for operation in operations]
+    return (operations.rest, operation_rows), operations.bytes_read
+
+
+async def _read_statement_list(content: Any) -> Tuple[dict, int]:
+    """Kapital account statements from the socket, shaped like KapitalBankAPI._read_json."""
+    from banks_api.kapital_bank_api import KapitalBankAPI
+
+    statements = AsyncStreamedArray(content, "responseData.operations.statementList")
+    items = [item async for item in statements]
+    return KapitalBankAPI._statements_document(statements.rest, items), statements.bytes_read
+
+
+async def _read_card_operations(content: Any) -> Tuple[dict, int]:
+    """Kapital card operations from the socket; the rest of the document is skipped (KapitalBankAPI._read_array)."""
+    operations = AsyncStreamedArray(content, "responseData.operation", keep_rest=False)
+    items = [item async for item in operations]
+    return {"responseData": {"operation": items}}, operations.bytes_read
+
+
+class _AsyncFetcher:
+    """Общее для асинхронных загрузчиков: транспорт, лимит запросов и повторы клиента."""
+
+    bank = ""
+
+    def __init__(self, client: Any, transport: Optional[AsyncTransport] = None) -> None:
+        self.client = client
+        # общий транспорт нескольких загрузчиков; без него fetch_all открывает свой на время выгрузки
+        # (тогда один загрузчик выполняет один fetch_all за раз)
+        self.transport = transport
+        self._http: Optional[AsyncTransport] = transport
+
+    @contextlib.asynccontextmanager
+    async def _opened(self):
+        if self.transport is not None:
+            yield
+            return
+
+        connect_timeout, read_timeout = self.client.transport.adapter.timeout
+        async with AsyncTransport(self.client.transport.pool_maxsize, connect_timeout, read_timeout) as http:
+            self._http = http
+            try:
+                yield
+            finally:
+                self._http = None
+
+    def _start(self) -> None:
+        """Per-run state: semaphores of the client's concurrency limits."""
+
+    @contextlib.contextmanager
+    def in_background(self) -> Iterator[Callable[[Coroutine[Any, Any, T]], "concurrent.futures.Future[T]"]]:
+        """
+        The fetcher's event loop in a thread of its own, with the transport open, for sync code that
+        pulls results as it goes (PashaBankAPI streamed reports); yields submit(coroutine) -> Future.
+        """
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=loop.run_forever, name=f"{self.bank}-fetch", daemon=True)
+        thread.start()
+
+        def submit(coro: Coroutine[Any, Any, T]) -> "concurrent.futures.Future[T]":
+            return asyncio.run_coroutine_threadsafe(coro, loop)
+
+        opened = self._opened()
+        try:
+            submit(opened.__aenter__()).result()
+            self._start()
+            try:
+                yield submit
+            finally:
+                # загрузки, брошенные потребителем (отмена, ошибка записи), завершаются до закрытия транспорта
+                submit(_cancel_tasks()).result()
+                submit(opened.__aexit__(None, None, None)).result()
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+
+    async def _send(self, method: str, url: str, progress: Optional[ProgressReporter] = None,
+                    endpoint: str = "*", **kwargs) -> AsyncResponse:
+        client = self.client
+        metrics = progress.metrics if progress is not None else NULL_METRICS
+
+        async def request() -> AsyncResponse:
+            # заголовки читаются на каждый запрос: Kapital может обновить токен посреди выгрузки
+            return await self._http.request(method, url, headers=dict(client.session.headers), **kwargs)
+
+        async def send() -> AsyncResponse:
+            await client.rate_limiter.acquire_async(self.bank, endpoint, progress)
+            return await metrics.timed_request_async(endpoint, request)
+
+        return await client.retry_policy.send_async(send, url, progress)
+
+
+class AsyncPashaFetcher(_AsyncFetcher):
+    """Асинхронная загрузка аккаунтов, выписок (страницы параллельно) и POS (по курсору) для PashaBankAPI."""
+
+    bank = "pasha"
+
+    def __init__(self, client: "PashaBankAPI", transport: Optional[AsyncTransport] = None) -> None:
+        super().__init__(client, transport)
+        self._accounts_slots: Optional[asyncio.Semaphore] = None
+        self._page_slots: Optional[asyncio.Semaphore] = None
+
+    async def fetch_all(self, date_from: str, date_to: str, force_refresh: bool = False, sync: bool = False,
+                        progress: Optional[ProgressReporter] = None) -> Tuple[List[Dict[str, Any]], List[tuple]]:
+        """Same as PashaBankAPI._fetch_all: accounts and (statement rows, POS rows) of each, in order."""
+        progress = ensure_progress(progress)
+
+        async with self._opened():
+            self._start()
+
+            logging.log(msg="Загрузка списка аккаунтов ...", level=logging.INFO)
+            accounts = await self.load_accounts(force_refresh, progress)
+            if not accounts:
+                return [], []
+
+            log_payload("Current accounts", accounts)
+            progress.emit(ACCOUNTS_TOTAL, len(accounts))
+
+            results = await asyncio.gather(*(
+                self.fetch_account(acc.get("accountNo"), date_from, date_to, sync, progress) for acc in accounts
+            ))
+            return accounts, list(results)
+
+    def _start(self) -> None:
+        # max_workers аккаунтов и page_workers страниц выписок одновременно, как у пулов потоков
+        self._accounts_slots = asyncio.Semaphore(self.client.max_workers)
+        self._page_slots = asyncio.Semaphore(self.client.page_workers)
+
+    async def _request(self, url: str, method: str = "GET", params: Optional[Dict] = None,
+                       progress: Optional[ProgressReporter] = None, endpoint: str = "*",
+                       read: Optional[Callable[[Any], Awaitable[Tuple[Any, int]]]] = None) -> Any:
+        """PashaBankAPI._make_request: {} on any failure; with read, the body parsed by it (AsyncTransport)."""
+        if method.upper() == "POST":
+            kwargs = {"json": params}
+        else:
+            kwargs = {"params": params}
+        if read is not None:
+            kwargs["read"] = read
+
+        try:
+            resp = await self._send(method, url, progress, endpoint, **kwargs)
+            resp.raise_for_status()
+        except CircuitOpenError as e:
+            logging.error(f"❌ {e} -> {url}")
+            return {}
+        except (requests.Timeout, requests.ConnectionError) as e:
+            logging.error(f"❌ Failed after retries: {e} -> {url}")
+            return {}
+        except requests.RequestException as e:
+            logging.log(msg=f"❌ Ошибка запроса: {e} -> {url}", level=logging.INFO)
+            return {}
+
+        if progress is not None:
+            progress.emit(BYTES_DOWNLOADED, resp.bytes_read)
+        try:
+            return resp.json()
+        except ValueError:
+            logging.log(msg="⚠️ Response is not JSON", level=logging.INFO)
+            return {}
+
+    # ---------- Accounts ----------
+    async def load_accounts(self, force_refresh: bool = False,
+                            progress: Optional[ProgressReporter] = None) -> List[Dict[str, Any]]:
+        client = self.client
+        if client.cache is None:
+            return await self.fetch_accounts(progress)
+
+        return await client.cache.get_or_fetch_async(
+            "pasha",
+            client.cache.fingerprint(client.config_jwt, client.config_key),
+            client.accounts_list_path,
+            lambda: self.fetch_accounts(progress),
+            force_refresh=force_refresh,
+        )
+
+    async def fetch_accounts(self, progress: Optional[ProgressReporter] = None) -> List[Dict[str, Any]]:
+        url = f"{self.client.base_url}{self.client.accounts_list_path}"
+        return self.client._accounts_list(await self._request(url, "GET", {"accountType": "CURRENT"}, progress,
+                                                              endpoint="accounts"))
+
+    # ---------- Statements ----------
+    async def get_current_statements(self, account_id: str, date_from: str, date_to: str, page_number: int = 1,
+                                     progress: Optional[ProgressReporter] = None) -> Dict[str, Any]:
+        progress = ensure_progress(progress)
+        progress.check_cancelled()
+
+        url = f"{self.client.base_url}{self.client.stmt_path.replace('{accountId}', account_id)}"
+        params = {
+            "pageNumber": page_number,
+            "fromDate": date_from,
+            "toDate": date_to
+        }
+
+        async with self._page_slots:
+            if self.client.streaming_json:
+                statements_obj = await self._stream_statements_page(url, params, progress)
+            else:
+                statements_obj = self.client._statements_page(
+                    await self._request(url, "POST", params, progress, "statements") or {})
+        self.client._log_statements_page(account_id, page_number, statements_obj)
+        progress.emit(PAGE_FETCHED)
+
+        return statements_obj
+
+    async def _stream_statements_page(self, url: str, params: Dict[str, Any],
+                                      progress: ProgressReporter) -> Dict[str, Any]:
+        """PashaBankAPI._stream_statements_page: operations become row fields as they are read from the socket."""
+        document = await self._request(url, "POST", params, progress, "statements", read=_read_operations)
+        if not document:
+            return self.client._statements_page({})
+
+        rest, operation_rows = document
+        statements_obj = self.client._statements_page(rest if isinstance(rest, dict) else {})
+        statements_obj["operation_rows"] = operation_rows
+        return statements_obj
+
+    async def fetch_statements(self, acc_no: str, date_from: str, date_to: str,
+                               progress: Optional[ProgressReporter] = None) -> "StatementsPagination":
+        """Page 1, then pages 2..totalPages concurrently."""
+        from banks_api.pasha_bank_api import StatementsPagination
+
+        pagination = StatementsPagination(acc_no, date_from, date_to)
+        pagination.add_page(1, await self.get_current_statements(acc_no, date_from, date_to, 1, progress))
+        logging.log(msg=f"Account {acc_no}: total pages {pagination.total_pages}", level=logging.INFO)
+
+        remaining = pagination.remaining_pages()
+        pages = await asyncio.gather(*(
+            self.get_current_statements(acc_no, date_from, date_to, number, progress) for number in remaining
+        ))
+        for number, statements_obj in zip(remaining, pages):
+            pagination.add_page(number, statements_obj)
+
+        return pagination
+
+    # ---------- POS operations with cursor-based pagination ----------
+    async def get_pos_operations(self, account_id: str,
+                                 progress: Optional[ProgressReporter] = None) -> List[Dict[str, Any]]:
+        progress = ensure_progress(progress)
+        url = f"{self.client.base_url}{self.client.pos_operations.replace('{accountId}', account_id)}"
+
+        all_blocks: List[Dict[str, Any]] = []
+        cursor: Optional[str] = None
+
+        while True:
+            progress.check_cancelled()
+            params = {"cursorToken": cursor} if cursor else {}
+            resp = await self._request(url, "GET", params, progress, "pos") or {}
+            progress.emit(PAGE_FETCHED)
+            blocks, cursor = self.client._pos_page(resp)
+            all_blocks.extend(blocks)
+            if not cursor:
+                break
+
+        return all_blocks
+
+    async def fetch_account(self, acc_no: str, date_from: str, date_to: str, sync: bool = False,
+                            progress: Optional[ProgressReporter] = None) -> Tuple[List[Dict[str, Any]],
+                                                                                  List[Dict[str, Any]]]:
+        """PashaBankAPI._fetch_account: statement and POS rows of one account."""
+        progress = ensure_progress(progress)
+
+        async with self._accounts_slots:
+            statements_rows = await self.fetch_account_statements(acc_no, date_from, date_to, sync, progress)
+            pos_rows = await self.fetch_account_pos(acc_no, progress)
+
+        self.client._count_rows(progress, statements_rows, pos_rows)
+        progress.emit(ACCOUNT_DONE)
+        return statements_rows, pos_rows
+
+    async def fetch_account_statements(self, acc_no: str, date_from: str, date_to: str, sync: bool,
+                                       progress: ProgressReporter) -> List[Dict[str, Any]]:
+        """PashaBankAPI._fetch_account_statements."""
+        client = self.client
+        progress.check_cancelled()
+        client._log_account(acc_no, date_from, date_to)
+
+        if sync and client.store is not None:
+            window = await in_thread(client._sync_window, acc_no, date_from, date_to)
+            _, _, fetch_from, fetch_to = window
+            pagination = await self.fetch_statements(acc_no, fetch_from.isoformat(), fetch_to.isoformat(), progress)
+            return await in_thread(client._store_synced, acc_no, window, *client._pagination_rows(pagination))
+
+        pagination = await self.fetch_statements(acc_no, date_from, date_to, progress)
+        statements_rows, _ = client._pagination_rows(pagination)
+        return statements_rows
+
+    async def fetch_account_pos(self, acc_no: str, progress: ProgressReporter) -> List[Dict[str, Any]]:
+        """PashaBankAPI._fetch_account_pos."""
+        return self.client._gather_pos_rows(acc_no, await self.get_pos_operations(acc_no, progress))
+
+
+class AsyncKapitalFetcher(_AsyncFetcher):
+    """Асинхронная загрузка аккаунтов, выписок, карт и выписок карт по периодам для KapitalBankAPI."""
+
+    bank = "kapital"
+
+    def __init__(self, client: "KapitalBankAPI", transport: Optional[AsyncTransport] = None) -> None:
+        super().__init__(client, transport)
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    async def fetch_all(self, run: "KapitalRun") -> None:
+        """Fill run like _get_statements_for_accounts + _get_cards_statements; the two go concurrently."""
+        async with self._opened():
+            self._start()
+            await asyncio.gather(self.get_statements_for_accounts(run), self.get_cards_statements(run))
+
+    def _start(self) -> None:
+        # не больше max_workers запросов выписок одновременно, как у пула потоков
+        self._slots = asyncio.Semaphore(self.client.max_workers)
+
+    async def _get(self, url: str, progress: Optional[ProgressReporter] = None, endpoint: str = "*",
+                   read: Optional[Callable[[Any], Awaitable[Tuple[Any, int]]]] = None) -> AsyncResponse:
+        """GET with a re-login on 401; with read (streaming_json) the body is parsed from the socket."""
+        client = self.client
+        token = client.tokens.access_token
+        kwargs = {"read": read} if read is not None else {}
+        response = await self._send("GET", url, progress, endpoint, **kwargs)
+
+        # вход/обновление токена синхронные и под блокировкой токенов — в потоке, не в цикле событий
+        if response.status_code == 401 and await asyncio.get_running_loop().run_in_executor(
+                None, client._reauthenticate, token):
+            response = await self._send("GET", url, progress, endpoint, **kwargs)
+
+        if progress is not None:
+            progress.emit(BYTES_DOWNLOADED, response.bytes_read)
+        return response
+
+    async def _cached(self, run: "KapitalRun", endpoint: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        cache = self.client.cache
+        if cache is None:
+            return await fetch()
+        return await cache.get_or_fetch_async("kapital", run.cache_fingerprint, endpoint, fetch,
+                                              force_refresh=run.force_refresh)
+
+    # ---------- Accounts ----------
+    async def fetch_accounts(self, progress: Optional[ProgressReporter] = None) -> list:
+        try:
+            logging.info("Getting accounts")
+            response = await self._get(f"{self.client.base_url}/accounts", progress, "accounts")
+            response.raise_for_status()
+            accounts = response.json().get("responseData", {}).get("accountsList", [])
+            log_payload("Accounts retrieved successfully", accounts)
+            return accounts
+
+        except requests.RequestException as e:
+            logging.error(f"Failed to get accounts: {e}")
+            return []
+
+    async def get_statements_for_accounts(self, run: "KapitalRun") -> None:
+        run.accounts = await self._cached(run, "/accounts", lambda: self.fetch_accounts(run.progress))
+        run.progress.emit(ACCOUNTS_TOTAL, len(run.accounts))
+
+        logging.info("Processing each account's statements:")
+        datasets = await asyncio.gather(*(self._account_statements(run, account) for account in run.accounts))
+        run.statements_dataset.extend(data for data in datasets if data is not None)
+
+    async def _account_statements(self, run: "KapitalRun", account: dict) -> Optional[dict]:
+        from banks_api.kapital_bank_api import INPUT_DATE_FORMAT
+
+        client = self.client
+        run.progress.check_cancelled()
+        acc_no = account.get('custAcNo')
+        logging.info(f"Processing account: {acc_no}")
+
+        if run.sync and client.store is not None:
+            window = await in_thread(client._account_sync_window, acc_no, run.date_from, run.date_to)
+            _, _, fetch_from, fetch_to = window
+            data = await self.fetch_account_statements(acc_no, fetch_from.strftime(INPUT_DATE_FORMAT),
+                                                       fetch_to.strftime(INPUT_DATE_FORMAT), run.progress)
+            data = await in_thread(client._store_account_statements, acc_no, window, data)
+        else:
+            data = await self.fetch_account_statements(acc_no, run.date_from, run.date_to, run.progress)
+
+        run.progress.emit(ACCOUNT_DONE)
+        return data
+
+    async def fetch_account_statements(self, acc_no: str, date_from: str, date_to: str,
+                                       progress: Optional[ProgressReporter] = None) -> Optional[dict]:
+        try:
+            async with self._slots:
+                response = await self._get(f"{self.client.base_url}/v2/statement/account?fromDate={date_from}"
+                                           f"&toDate={date_to}&accountNumber={acc_no}", progress, "account_statement",
+                                           _read_statement_list if self.client.streaming_json else None)
+
+            logging.info(f"Getting statements for account {acc_no}")
+            response.raise_for_status()
+            data = response.json()
+            logging.info(f"Statements retrieved successfully for account {acc_no}")
+            if progress is not None:
+                progress.emit(PAGE_FETCHED)
+            return data
+
+        except requests.RequestException as e:
+            logging.error(f"Failed to get statements for account {acc_no}: {e}")
+            return None
+
+    # ---------- Cards ----------
+    async def fetch_cards(self, progress: Optional[ProgressReporter] = None) -> list:
+        try:
+            response = await self._get(f"{self.client.base_url}/cards", progress, "cards")
+            response.raise_for_status()
+
+            logging.info("Cards data retrieved successfully")
+
+            return response.json().get("responseData", {}).get("cards", [])
+
+        except requests.RequestException as e:
+            logging.error(f"Failed to get cards data: {e}")
+            return []
+
+    async def get_cards_statements(self, run: "KapitalRun") -> None:
+        client = self.client
+
+        logging.info("Getting cards data")
+        cards_data = client._add_cards(run, await self._cached(run, "/cards", lambda: self.fetch_cards(run.progress)))
+        log_payload("Cards data retrieved successfully", cards_data)
+
+        if not cards_data:
+            logging.warning("No cards found to get statements for.")
+            return
+
+        # все запросы (карта x период) сразу, результаты собираются в исходном порядке
+        # с sync план и слияние читают и пишут хранилище (SQLite)
+        plans = await in_thread(client._plan_card_statements, run, cards_data)
+        results = await asyncio.gather(*(
+            asyncio.gather(*(self.fetch_card_statements(plan.account_number, period, run.progress)
+                             for period in plan.periods))
+            for plan in plans
+        ))
+        for plan, datasets in zip(plans, results):
+            await in_thread(client._add_card_statements, run, plan, datasets)
+
+        log_payload("Cards statements retrieved successfully", run.cards_statements)
+
+    async def fetch_card_statements(self, account_number: str, period: dict,
+                                    progress: Optional[ProgressReporter] = None) -> Optional[list]:
+        """Operations of one card account for one period; None when the request failed."""
+        progress = ensure_progress(progress)
+
+        async with self._slots:
+            progress.check_cancelled()
+            logging.info(f"Getting cards statements for period: {period.get('start')} - {period.get('end')}")
+
+            read = _read_card_operations if self.client.streaming_json else None
+            try:
+                response = await self._get(f"{self.client.base_url}/v2/statement/card?fromDate={period.get('start')}"
+                                           f"&toDate={period.get('end')}&accountNumber={account_number}", progress,
+                                           "card_statement", read)
+
+                response.raise_for_status()
+                data = response.json()
+                progress.emit(PAGE_FETCHED)
+
+                dataset = data.get("responseData", {}).get("operation", [])
+
+                if not dataset:
+                    logging.warning(f"No statements found for account {account_number}")
+                    return []
+
+                logging.info(f"Cards statements retrieved successfully for account {account_number}")
+                return dataset
+
+            except requests.RequestException as e:
+                logging.error(f"Failed to get cards statements for card account {account_number}: {e}")
+                return None
@@ -0,0 +1,324 @@
+import operator
+from functools import partial
+from itertools import zip_longest
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment, NamedStyle
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.hyperlink import Hyperlink
+from openpyxl.worksheet.worksheet import Worksheet
+
+from banks_api.row_table import RowTable
+
+# Имена общих стилей книги (регистрируются один раз, ячейки ссылаются на них по имени)
+SECTION_TITLE_STYLE = "section_title"
+SUMMARY_ROW_STYLE = "summary_row"
+CARD_VALUE_STYLE = "card_value"
+
+# оценка ширины колонок: exact — по всем значениям, approximate — по выборке строк
+WIDTH_EXACT = "exact"
+WIDTH_APPROXIMATE = "approximate"
+WIDTH_MODES = (WIDTH_EXACT, WIDTH_APPROXIMATE)
+
+# строк в пачке, которая измеряется за раз (SheetWriter.append_rows)
+WIDTH_BATCH_ROWS = 1000
+
+_is_value = partial(operator.is_not, None)
+
+
+def solid_fill(color: str) -> PatternFill:
+    return PatternFill(start_color=color, end_color=color, fill_type="solid")
+
+
+def header_style(color: str) -> str:
+    """Name of the bold, centered, filled header style for a given fill colour."""
+    return f"header_{color}"
+
+
+def _build_named_style(name: str) -> NamedStyle:
+    if name.startswith("header_"):
+        color = name[len("header_"):]
+        return NamedStyle(name=name, font=Font(bold=True), fill=solid_fill(color),
+                          alignment=Alignment(horizontal="center"))
+    if name == SECTION_TITLE_STYLE:
+        return NamedStyle(name=name, font=Font(bold=True, size=12, color="000000"), fill=solid_fill("366092"))
+    if name == SUMMARY_ROW_STYLE:
+        return NamedStyle(name=name, fill=solid_fill("EEECE1"))
+    if name == CARD_VALUE_STYLE:
+        return NamedStyle(name=name, font=Font(size=12, color="000000"))
+    raise ValueError(f"Unknown style: {name}")
+
+
+def ensure_named_style(workbook: Workbook, name: str) -> str:
+    if name not in workbook.named_styles:
+        workbook.add_named_style(_build_named_style(name))
+    return name
+
+
+class ColumnWidths:
+    """
+    Ширины колонок по строкам, которые пишутся на лист, — вместо второго прохода по готовому
+    листу (autosize_columns). Строки измеряются пачками по колонкам: len(str(v)) через map,
+    без обращения к ячейкам openpyxl.
+
+    exact — все значения (ширины как у autosize_columns); approximate — первые sample_rows
+    строк и дальше каждая stride-я. Колонка, которая уже шире max_width, больше не измеряется.
+    """
+
+    def __init__(self, mode: str = WIDTH_EXACT, max_width: Optional[int] = None,
+                 sample_rows: int = 1000, stride: int = 100) -> None:
+        if mode not in WIDTH_MODES:
+            raise ValueError(f"Unknown column width mode: {mode} (expected one of {', '.join(WIDTH_MODES)})")
+        self.mode = mode
+        self.max_width = max_width
+        self.sample_rows = sample_rows
+        self.stride = max(1, stride)
+        # длина самого длинного значения по колонкам и число учтённых строк (для выборки)
+        self.lengths: List[int] = []
+        self.rows_seen = 0
+
+    def observe_rows(self, rows: Sequence[Sequence[Any]]) -> None:
+        """A batch of rows; shorter rows are padded with empty cells."""
+        start = self.rows_seen
+        self.rows_seen += len(rows)
+        rows = self._sample(rows, start)
+        if rows:
+            self._measure(zip_longest(*rows))
+
+    def observe_columns(self, columns: Sequence[Sequence[Any]]) -> None:
+        """Whole columns of one length (a RowTable's), left to right."""
+        if not columns:
+            return
+        start = self.rows_seen
+        self.rows_seen += len(columns[0])
+        self._measure(self._sample(column, start) for column in columns)
+
+    def apply(self, ws: Any) -> None:
+        """Set the widths on the sheet: longest value + 2, capped by max_width."""
+        for idx, length in enumerate(self.lengths, start=1):
+            width = length + 2
+            ws.column_dimensions[get_column_letter(idx)].width = min(width, self.max_width) if self.max_width else width
+
+    def _sample(self, values: Sequence[Any], start: int) -> Sequence[Any]:
+        """Rows (or a column's values) of the sample; start is the row number of values[0]."""
+        if self.mode == WIDTH_EXACT:
+            return values
+        head = values[:max(0, self.sample_rows - start)]
+        first = max(start, self.sample_rows)
+        first += -first % self.stride
+        return list(head) + list(values[first - start::self.stride])
+
+    def _measure(self, columns: Iterable[Sequence[Any]]) -> None:
+        lengths = self.lengths
+        # колонка шире этого предела уже получит max_width
+        full = self.max_width - 2 if self.max_width else None
+        for idx, column in enumerate(columns):
+            if idx == len(lengths):
+                lengths.append(0)
+            elif full is not None and lengths[idx] >= full:
+                continue
+            longest = max(map(len, map(str, filter(_is_value, column))), default=0)
+            if longest > lengths[idx]:
+                lengths[idx] = longest
+
+
+def batched(rows: Iterable[Sequence[Any]], size: int = WIDTH_BATCH_ROWS) -> Iterator[List[Sequence[Any]]]:
+    batch: List[Sequence[Any]] = []
+    for values in rows:
+        batch.append(values)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def union_columns(records: Iterable[Dict[str, Any]]) -> List[str]:
+    """Keys of all records in order of first appearance (what pd.DataFrame(records).columns gives)."""
+    columns: Dict[str, None] = {}
+    for record in records:
+        for key in record:
+            columns.setdefault(key, None)
+    return list(columns)
+
+
+class SheetWriter:
+    """
+    Пакетная запись в обычный (не write_only) лист: строки добавляются целиком через
+    ws.append, оформление — общими именованными стилями вместо Font/PatternFill на ячейку.
+    Количество колонок не ограничено (никаких chr(64 + idx)).
+
+    С widths ширины колонок считаются по мере записи строк, autosize() их применяет.
+    """
+
+    def __init__(self, ws: Worksheet, widths: Optional[ColumnWidths] = None) -> None:
+        self.ws = ws
+        self.workbook = ws.parent
+        self.widths = widths
+
+    def append(self, values: Sequence[Any], style: Optional[str] = None) -> None:
+        self.ws.append(values)
+        if self.widths is not None:
+            self.widths.observe_rows([values])
+        if style is not None:
+            self.style_row(self.ws.max_row, style, len(values))
+
+    def append_rows(self, rows: Iterable[Sequence[Any]]) -> None:
+        append = self.ws.append
+        if self.widths is None:
+            for values in rows:
+                append(values)
+            return
+
+        for batch in batched(rows):
+            for values in batch:
+                append(values)
+            self.widths.observe_rows(batch)
+
+    def append_records(self, records: Iterable[Dict[str, Any]], columns: Sequence[str]) -> None:
+        self.append_rows([record.get(c) for c in columns] for record in records)
+
+    def append_header(self, columns: Sequence[str], color: str = "BDD7EE") -> None:
+        self.append(columns, header_style(color))
+
+    def append_table(self, table: RowTable, header_color: str = "BDD7EE") -> List[str]:
+        """Header plus all rows of the table, in the table's column order; returns the columns."""
+        columns = table.column_names
+        self.append_header(columns, header_color)
+
+        append = self.ws.append
+        for values in table.rows(columns):
+            append(values)
+        if self.widths is not None:
+            # таблица уже по колонкам: измеряются сами списки колонок
+            self.widths.observe_columns([table.column(c) for c in columns])
+        return columns
+
+    def skip_rows(self, count: int) -> None:
+        for _ in range(count):
+            self.ws.append([])
+
+    def style_row(self, row_idx: int, style: str, width: int) -> None:
+        """Apply a named style to the first `width` cells of a row."""
+        ensure_named_style(self.workbook, style)
+        for row in self.ws.iter_rows(min_row=row_idx, max_row=row_idx, max_col=width):
+            for cell in row:
+                cell.style = style
+
+    def set_auto_filter(self) -> None:
+        self.ws.auto_filter.ref = self.ws.dimensions
+
+    def autosize(self) -> None:
+        """Column widths from the rows written so far (needs widths)."""
+        self.widths.apply(self.ws)
+
+
+def autosize_columns(ws: Worksheet, max_width: Optional[int] = None) -> None:
+    """
+    Set each column width to its longest value + 2 (capped by max_width), reading every cell
+    of the finished sheet; SheetWriter(ws, ColumnWidths(...)) gets the same widths while writing.
+    """
+    for column_cells in ws.columns:
+        max_length = 0
+        column = column_cells[0].column_letter
+        for cell in column_cells:
+            value = cell.value
+            if value is None:
+                continue
+            max_length = max(max_length, len(str(value)))
+        width = max_length + 2
+        ws.column_dimensions[column].width = min(width, max_width) if max_width else width
+
+
+class StreamingSheetWriter:
+    """
+    Лист книги openpyxl в режиме write_only: строки уходят в файл сразу после append.
+
+    openpyxl пишет ширины колонок до первой строки, поэтому первые width_sample_rows
+    строк буферизуются, по ним (и по заголовку) считается ширина (ColumnWidths в режиме
+    approximate), после чего буфер сбрасывается и остальные строки пишутся напрямую.
+    Точный режим здесь невозможен: он требует держать в памяти весь лист.
+    """
+
+    def __init__(self, workbook: Workbook, title: str, columns: Sequence[str], header_color: str,
+                 max_width: int = 60, width_sample_rows: int = 1000, index: Optional[int] = None) -> None:
+        # index — место листа в книге (None — в конец); write_only лист можно вставить перед уже записанными
+        self.ws = workbook.create_sheet(title, index)
+        self.columns = list(columns)
+        self.max_width = max_width
+        self.width_sample_rows = width_sample_rows
+        self.rows_written = 0
+
+        self._widths = ColumnWidths(WIDTH_APPROXIMATE, max_width=max_width, sample_rows=width_sample_rows + 1)
+        self._buffer: Optional[List[tuple]] = []
+
+        self._header_font = Font(bold=True)
+        self._link_font = Font(color="0563C1", underline="single")
+        self._header_fill = solid_fill(header_color)
+        self._header_alignment = Alignment(horizontal="center")
+
+    @property
+    def row_count(self) -> int:
+        """Data rows accepted so far (written or still in the width sample)."""
+        return self.rows_written + len(self._buffer or ())
+
+    def append(self, values: Sequence[Any], fill: Optional[PatternFill] = None, link: Optional[str] = None) -> None:
+        """link: the first cell links to this place in the workbook (e.g. "'Statements_2'!A1")."""
+        if self._buffer is None:
+            self._write(values, fill, link)
+            return
+
+        self._buffer.append((values, fill, link))
+        if len(self._buffer) >= self.width_sample_rows:
+            self._flush()
+
+    def write_message(self, text: str) -> None:
+        """Single cell sheet for empty datasets (same as ws["A1"] = text)."""
+        self._buffer = None
+        self.ws.column_dimensions["A"].width = min(len(text) + 2, self.max_width)
+        self.ws.append([text])
+
+    def close(self) -> None:
+        """Flush the width sample and set the auto filter; call before workbook.save()."""
+        if self._buffer is not None:
+            self._flush()
+        if self.rows_written:
+            last_col = get_column_letter(len(self.columns))
+            self.ws.auto_filter.ref = f"A1:{last_col}{self.rows_written + 1}"
+
+    def _flush(self) -> None:
+        self._widths.observe_rows([self.columns])
+        self._widths.observe_rows([values for values, _, _ in self._buffer])
+        self._widths.apply(self.ws)
+
+        header = []
+        for name in self.columns:
+            cell = WriteOnlyCell(self.ws, value=name)
+            cell.font = self._header_font
+            cell.fill = self._header_fill
+            cell.alignment = self._header_alignment
+            header.append(cell)
+        self.ws.append(header)
+
+        buffered, self._buffer = self._buffer, None
+        for values, fill, link in buffered:
+            self._write(values, fill, link)
+
+    def _write(self, values: Sequence[Any], fill: Optional[PatternFill], link: Optional[str] = None) -> None:
+        if fill is not None:
+            row = []
+            for value in values:
+                cell = WriteOnlyCell(self.ws, value=value)
+                cell.fill = fill
+                row.append(cell)
+            values = row
+        if link is not None:
+            values = list(values)
+            cell = values[0] if fill is not None else WriteOnlyCell(self.ws, value=values[0])
+            cell.hyperlink = Hyperlink(ref="", location=link)
+            cell.font = self._link_font
+            values[0] = cell
+        self.ws.append(values)
+        self.rows_written += 1
@@ -0,0 +1,94 @@
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterable, List, Mapping, NamedTuple, Optional, Sequence
+
+# пустой объект для отсутствующих вложенных блоков ("balance": null и т.п.)
+_EMPTY: Mapping[str, Any] = MappingProxyType({})
+
+
+def na_if_none(v: Any) -> Any:
+    """Replace only None with N/A (amounts: empty string is kept)."""
+    return "N/A" if v is None else v
+
+
+def na_if_blank(v: Any) -> Any:
+    """Replace None/empty string with N/A, keep numbers as-is."""
+    if v is None or (isinstance(v, str) and v.strip() == ""):
+        return "N/A"
+    return v
+
+
+# Стандартные нормализации подставляются в сгенерированный код выражением, без вызова функции
+_INLINE = {
+    na_if_none: '("N/A" if (v := {expr}) is None else v)',
+    na_if_blank: '("N/A" if (v := {expr}) is None or (isinstance(v, str) and v.strip() == "") else v)',
+}
+
+
+class Field(NamedTuple):
+    """Колонка строки отчёта: имя, путь в объекте API ("balance.cashBack"), нормализация и значение по умолчанию."""
+
+    name: str
+    source: str
+    normalize: Optional[Callable[[Any], Any]] = None
+    default: Any = None
+
+
+class RecordExtractor:
+    """
+    Строит строки отчёта из объектов API по схеме полей.
+
+    Схема компилируется один раз в функцию с литералом словаря (как namedtuple/dataclasses
+    генерируют свой код): каждое поле читается одним .get, вложенные блоки достаются один
+    раз на объект. Поля уровня страницы передаются готовым словарём base и идут первыми.
+    """
+
+    def __init__(self, fields: Sequence[Field]) -> None:
+        self.fields = tuple(fields)
+        self.names = [field.name for field in self.fields]
+        self._extract = _compile(self.fields)
+
+    def __call__(self, source: Mapping[str, Any], base: Mapping[str, Any] = _EMPTY) -> Dict[str, Any]:
+        return self._extract(source, base)
+
+    def many(self, sources: Iterable[Mapping[str, Any]], base: Mapping[str, Any] = _EMPTY) -> List[Dict[str, Any]]:
+        extract = self._extract
+        return [extract(source, base) for source in sources]
+
+
+def _compile(fields: Sequence[Field]) -> Callable[[Mapping[str, Any], Mapping[str, Any]], Dict[str, Any]]:
+    namespace: Dict[str, Any] = {"_EMPTY": _EMPTY}
+    lines = ["def extract(src, base):"]
+    parents: Dict[tuple, str] = {(): "src"}
+    items = []
+
+    for i, field in enumerate(fields):
+        *path, key = field.source.split(".")
+
+        # вложенный блок: одна переменная на путь, общая для всех его полей
+        for depth in range(1, len(path) + 1):
+            prefix = tuple(path[:depth])
+            if prefix not in parents:
+                parents[prefix] = f"p{len(parents)}"
+                lines.append(f"    {parents[prefix]} = {parents[prefix[:-1]]}.get({prefix[-1]!r}) or _EMPTY")
+
+        if field.default is None:
+            expr = f"{parents[tuple(path)]}.get({key!r})"
+        else:
+            namespace[f"d{i}"] = field.default
+            expr = f"{parents[tuple(path)]}.get({key!r}, d{i})"
+
+        if field.normalize in _INLINE:
+            expr = _INLINE[field.normalize].format(expr=expr)
+        elif field.normalize is not None:
+            namespace[f"n{i}"] = field.normalize
+            expr = f"n{i}({expr})"
+
+        items.append(f"        {field.name!r}: {expr},")
+
+    lines.append("    return {")
+    lines.append("        **base,")
+    lines.extend(items)
+    lines.append("    }")
+
+    exec("\n".join(lines), namespace)
+    return namespace["extract"]
@@ -0,0 +1,212 @@
+"""
+Потоковый разбор больших JSON-ответов: массив операций читается из сокета по одному элементу,
+без тела ответа в памяти и без промежуточной строки, как у response.json().
+
+С ijson (необязательная зависимость) в памяти одновременно только текущий элемент и то, что
+вызывающий код из него оставил. Без ijson StreamedArray разбирает ответ json.load и отдаёт тем же
+интерфейсом (бенчмарки, тесты), но клиенты streaming_json не включают — см. streaming_supported().
+AsyncStreamedArray — то же для тела ответа aiohttp (banks_api.async_fetch).
+"""
+import json
+import logging
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+import requests
+
+try:
+    import ijson
+except ImportError:  # без ijson — обычный json, результат тот же
+    ijson = None
+
+_PARSE_ERRORS = (ValueError,) if ijson is None else (ValueError, ijson.JSONError)
+
+# размер кусков, которыми тело ответа читается из сокета
+CHUNK_SIZE = 64 * 1024
+
+
+class _ChunkReader:
+    """File-like view of response.iter_content() that counts the (decompressed) bytes read."""
+
+    def __init__(self, response: requests.Response, chunk_size: int = CHUNK_SIZE) -> None:
+        self._chunks = response.iter_content(chunk_size)
+        self.bytes_read = 0
+
+    def read(self, size: int = -1) -> bytes:
+        if size == 0:
+            # ijson читает 0 байт, чтобы узнать тип потока (bytes или str)
+            return b""
+        if size is None or size < 0:
+            data = b"".join(self._chunks)
+        else:
+            data = next(self._chunks, b"")
+        self.bytes_read += len(data)
+        return data
+
+
+class _AsyncChunkReader:
+    """Async file-like view of aiohttp's response.content that counts the bytes read."""
+
+    def __init__(self, content: Any) -> None:
+        self._content = content
+        self.bytes_read = 0
+
+    async def read(self, size: int = -1) -> bytes:
+        if size == 0:
+            return b""
+        data = await self._content.read(-1 if size is None else size)
+        self.bytes_read += len(data)
+        return data
+
+
+# ещё нет готового элемента массива
+_MORE = object()
+
+
+class _ArraySplitter:
+    """ijson events of a document split into the items of the array at path and the rest of the document."""
+
+    def __init__(self, path: str) -> None:
+        self.item_prefix = f"{path}.item"
+        self._rest = ijson.ObjectBuilder()
+        self._item: Optional[ijson.ObjectBuilder] = None
+        self._depth = 0
+
+    @property
+    def rest(self) -> Any:
+        return getattr(self._rest, "value", None)
+
+    def feed(self, prefix: str, event: str, value: Any) -> Any:
+        """The item the event completes, or _MORE."""
+        item = self._item
+        if item is not None:
+            item.event(event, value)
+            if event in ("start_map", "start_array"):
+                self._depth += 1
+            elif event in ("end_map", "end_array"):
+                self._depth -= 1
+                if self._depth == 0:
+                    self._item = None
+                    return item.value
+            return _MORE
+
+        if prefix == self.item_prefix:
+            if event not in ("start_map", "start_array"):
+                return value
+            self._item = ijson.ObjectBuilder()
+            self._item.event(event, value)
+            self._depth = 1
+            return _MORE
+
+        # всё, кроме элементов массива (сам массив остаётся пустым)
+        self._rest.event(event, value)
+        return _MORE
+
+
+class StreamedArray:
+    """
+    Элементы массива path ("responseData.operation") JSON-ответа по одному.
+
+    Итерировать можно один раз; после этого в rest — остальной документ, где на месте
+    массива пустой список (keep_rest=False — rest не собирается, зато элементы строит
+    C-бэкенд ijson целиком, заметно быстрее). Ошибка разбора — requests.JSONDecodeError,
+    как у response.json().
+    """
+
+    def __init__(self, fp: Any, path: str, keep_rest: bool = True) -> None:
+        self._fp = fp
+        self.path = path
+        self.keep_rest = keep_rest
+        self.rest: Any = None
+
+    @property
+    def bytes_read(self) -> int:
+        return getattr(self._fp, "bytes_read", 0)
+
+    def __iter__(self) -> Iterator[Any]:
+        try:
+            if ijson is None:
+                yield from self._iter_loaded()
+            else:
+                yield from self._iter_events()
+        except _PARSE_ERRORS as e:
+            raise requests.JSONDecodeError(str(e), "", 0) from e
+
+    def _iter_events(self) -> Iterator[Any]:
+        if not self.keep_rest:
+            yield from ijson.items(self._fp, f"{self.path}.item", use_float=True)
+            return
+
+        splitter = _ArraySplitter(self.path)
+        for prefix, event, value in ijson.parse(self._fp, use_float=True):
+            item = splitter.feed(prefix, event, value)
+            if item is not _MORE:
+                yield item
+        self.rest = splitter.rest
+
+    def _iter_loaded(self) -> Iterator[Any]:
+        self.rest = json.load(self._fp)
+        yield from _take_items(self.rest, self.path)
+
+
+class AsyncStreamedArray(StreamedArray):
+    """StreamedArray of an aiohttp response body (response.content): async for item in array."""
+
+    def __init__(self, content: Any, path: str, keep_rest: bool = True) -> None:
+        super().__init__(_AsyncChunkReader(content), path, keep_rest)
+
+    async def __aiter__(self) -> AsyncIterator[Any]:
+        try:
+            if ijson is None:
+                self.rest = json.loads(await self._fp.read())
+                for item in _take_items(self.rest, self.path):
+                    yield item
+            elif not self.keep_rest:
+                async for item in ijson.items_async(self._fp, f"{self.path}.item", use_float=True):
+                    yield item
+            else:
+                splitter = _ArraySplitter(self.path)
+                async for prefix, event, value in ijson.parse_async(self._fp, use_float=True):
+                    item = splitter.feed(prefix, event, value)
+                    if item is not _MORE:
+                        yield item
+                self.rest = splitter.rest
+        except _PARSE_ERRORS as e:
+            raise requests.JSONDecodeError(str(e), "", 0) from e
+
+
+def _take_items(document: Any, path: str) -> Iterator[Any]:
+    """Items of the array at path of a parsed document, one at a time; the array is left empty."""
+    container, key = _parent(document, path)
+    if container is None or not isinstance(container.get(key), list):
+        return
+
+    items: List[Any] = container[key]
+    container[key] = []
+    # элементы отдаются по одному и сразу отпускаются
+    items.reverse()
+    while items:
+        yield items.pop()
+
+
+def _parent(document: Any, path: str):
+    """The dict holding the last key of path and that key; (None, key) when the path is missing."""
+    *parents, key = path.split(".")
+    for name in parents:
+        document = document.get(name) if isinstance(document, dict) else None
+    return (document, key) if isinstance(document, dict) else (None, key)
+
+
+def streaming_supported(requested: bool) -> bool:
+    """
+    streaming_json as a client can honour it: without ijson the fallback reads the whole body
+    anyway, so streaming is turned off with a warning instead of silently costing the same.
+    """
+    if requested and ijson is None:
+        logging.warning("Streaming JSON needs ijson (pip install ijson); reading whole responses instead")
+        return False
+    return requested
+
+
+def stream_array(response: requests.Response, path: str, keep_rest: bool = True) -> StreamedArray:
+    """Parse the array at path of a response requested with stream=True, one item at a time."""
+    return StreamedArray(_ChunkReader(response), path, keep_rest)
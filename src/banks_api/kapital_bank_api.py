@@ -1,41 +1,155 @@
 import logging
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
 from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
 
-import pandas as pd
 import requests
 from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment
-from openpyxl.utils.dataframe import dataframe_to_rows
+
+from banks_api.api_logger import log_payload
+from banks_api.json_stream import stream_array, streaming_supported
+from banks_api.metrics import NULL_METRICS, finish_run
+from banks_api.progress import (
+    ACCOUNT_DONE, ACCOUNTS_TOTAL, BYTES_DOWNLOADED, PAGE_FETCHED, ROWS_WRITTEN, ProgressReporter, ensure_progress,
+)
+from banks_api.rate_limiter import RateLimiter
+from banks_api.report_sinks import EXCEL_MAX_ROWS, SHARD_BY, check_format, make_sink, shard_key
+from banks_api.retry_policy import RetryPolicy
+from banks_api.token_manager import TokenManager
+from banks_api.transport import HttpTransport
+from banks_api.excel_writer import (
+    CARD_VALUE_STYLE, SECTION_TITLE_STYLE, WIDTH_EXACT, WIDTH_MODES, ColumnWidths, SheetWriter, union_columns,
+)
+
+if TYPE_CHECKING:
+    from db.metrics_store import MetricsStore
+    from db.response_cache import ResponseCache
+    from db.transaction_store import TransactionStore
+
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+              " (KHTML, like Gecko) Chrome/102.0.5005.49 Safari/537.36")
+
+# Формат дат, который вводит пользователь (DD-MM-YYYY) и формат периодов выписки по картам
+INPUT_DATE_FORMAT = "%d-%m-%Y"
+PERIOD_DATE_FORMAT = "%Y-%m-%d"
+
+# Поля с датой операции в statementList / operation (первое распознанное)
+OPERATION_DATE_FIELDS = ("operationDate", "trnDate", "transactionDate", "valueDate", "postingDate", "date")
+
+# колонки счёта при делении листов по счёту (shard_by): информация аккаунта в Accounts_Statements, карта
+SHARD_ACCOUNT_COLUMNS = ("account_accountNumber", "account_custAcNo", "account_ibanAcNo", "accountNumber")
+
+
+def _record_rows(records: List[Dict[str, Any]]) -> Tuple[List[str], Iterator[List[Any]]]:
+    """Columns of all records (in order of appearance) and the records as value rows."""
+    columns = union_columns(records)
+    return columns, ([record.get(c) for c in columns] for record in records)
+
+
+class KapitalRun:
+    """
+    Данные одной выгрузки (аккаунты, выписки, карты). Создаётся в process_data и
+    очищается после записи отчёта, чтобы долгоживущий клиент не накапливал данные.
+    """
+
+    def __init__(self, date_from: str, date_to: str, sync: bool = False, force_refresh: bool = False,
+                 cache_fingerprint: str = "", progress: Optional[ProgressReporter] = None,
+                 output_dir: Optional[Path] = None, report_format: str = "xlsx") -> None:
+        self.date_from = date_from
+        self.date_to = date_to
+        self.sync = sync
+        self.force_refresh = force_refresh
+        self.cache_fingerprint = cache_fingerprint
+        self.progress = ensure_progress(progress)
+        # каталог отчёта этой выгрузки (None — excel_path клиента)
+        self.output_dir = output_dir
+        # формат отчёта этой выгрузки (banks_api.report_sinks.SINKS)
+        self.report_format = report_format
+
+        self.accounts: list = []
+        self.statements_dataset: list = []
+        self.cards: list = []
+        self.cards_statements: list = []
+
+    def release(self) -> None:
+        self.accounts = []
+        self.statements_dataset = []
+        self.cards = []
+        self.cards_statements = []
+
+
+class CardStatementsPlan(NamedTuple):
+    """Запросы выписки одной карты: запрошенные дни, дни к загрузке и их периоды по 90 дней."""
+
+    account_number: str
+    day_from: date
+    day_to: date
+    fetch_from: date
+    fetch_to: date
+    periods: List[Dict[str, str]]
+    use_store: bool
 
 
 class KapitalBankAPI:
     """Клиент для работы с API Kapital Bank и сохранения отчёта в Excel (Accounts, Statements, POS Operations)"""
 
-    def __init__(self, excel_path: Path):
+    def __init__(self, excel_path: Path, cache: Optional["ResponseCache"] = None,
+                 store: Optional["TransactionStore"] = None, max_workers: int = 4,
+                 transport: Optional[HttpTransport] = None, retry_policy: Optional[RetryPolicy] = None,
+                 rate_limiter: Optional[RateLimiter] = None, use_asyncio: bool = False,
+                 streaming_json: bool = False, metrics_store: Optional["MetricsStore"] = None,
+                 report_format: str = "xlsx", sheet_rows: Optional[int] = None, shard_by: Optional[str] = None,
+                 column_widths: str = WIDTH_EXACT):
 
         self.excel_path = excel_path
+        # сколько выписок по картам (карта x период) запрашивается одновременно
+        self.max_workers = max(1, max_workers)
+        # локальное хранилище операций для инкрементальной синхронизации (process_data(sync=True))
+        self.store = store
+        # кэш списков аккаунтов и карт между выгрузками (None — всегда запрашивать API)
+        self.cache = cache
+        # итоги выгрузок (задержки, объёмы, время записи) для анализа трендов; None — метрики не собираются
+        self.metrics_store = metrics_store
+        # формат отчёта по умолчанию (banks_api.report_sinks.SINKS); xlsx — прежние листы с секциями аккаунтов
+        self.report_format = report_format
+        check_format(report_format)
+        # строк данных на листе Excel (None — предел Excel); больше — плоские листы Accounts_Statements_2, ...
+        self.sheet_rows = sheet_rows
+        # "account" / "month": выписки на отдельных листах по счёту или месяцу, с листом Index
+        if shard_by is not None and shard_by not in SHARD_BY:
+            raise ValueError(f"Unknown shard mode: {shard_by} (expected one of {', '.join(SHARD_BY)})")
+        self.shard_by = shard_by
+        # ширины колонок _prepare_excel: exact — по всем значениям, approximate — по выборке строк
+        if column_widths not in WIDTH_MODES:
+            raise ValueError(f"Unknown column width mode: {column_widths} (expected one of {', '.join(WIDTH_MODES)})")
+        self.column_widths = column_widths
 
         self.base_url = "https://my.birbank.business/api/b2b"
-        self.clientId = ""
-        self.refreshToken = ""
-        self.token = ""
-        self.accounts = []
-        self.statements_dataset = []
-        self.cards_statements = []
-        self.cards = []
-
-        self.session = requests.Session()
+        self.refresh_path = "/refresh"
+
+        # токены переиспользуются между выгрузками и обновляются по refresh-токену
+        self.tokens = TokenManager()
+        self._credentials = ("", "")
+
+        # между выгрузками живут только сессия (пул соединений) и токены;
+        # данные каждой выгрузки — в KapitalRun
+        self.transport = transport or HttpTransport()
+        # повторы 429/5xx/таймаутов и размыкатель — общие с Pasha, если политика передана снаружи
+        self.retry_policy = retry_policy or RetryPolicy()
+        # лимиты запросов по эндпоинтам (общие для всех потоков; настраиваются в db/bank.db)
+        self.rate_limiter = rate_limiter or RateLimiter()
+        # выгрузка через asyncio (banks_api.async_fetch, нужен aiohttp) вместо пула потоков
+        self.use_asyncio = use_asyncio
+        # большие массивы выписок (statementList, operation) разбираются из сокета по одному (нужен ijson)
+        self.streaming_json = streaming_supported(streaming_json)
+        self.session = self.transport.session()
 
     def _authenticate(self, username: str, password: str):
         try:
-            response = self.session.post(
-                f"{self.base_url}/login",
-                json={"username": username, "password": password},
-                headers={"User-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-                         " (KHTML, like Gecko) Chrome/102.0.5005.49 Safari/537.36"},
-                timeout=30,
-            )
+            response = self._post(f"{self.base_url}/login", "login",
+                                  json={"username": username, "password": password},
+                                  headers={"User-agent": USER_AGENT})
             response.raise_for_status()
             logging.info("Authentication request sent successfully.")
         except requests.RequestException as e:
@@ -58,13 +172,7 @@ class KapitalBankAPI:
         token = response_data.get("jwttoken")
 
         if client_id and refresh_token and token:
-            self.clientId = client_id
-            self.refreshToken = refresh_token
-            self.token = token
-
-            self.session.headers.update({"Authorization": f"Bearer {self.token}"})
-            self.session.headers["User-agent"] = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-                                                  " (KHTML, like Gecko) Chrome/102.0.5005.49 Safari/537.36")
+            self._apply_tokens(username, token, refresh_token, client_id)
 
             logging.info("User authenticated successfully!")
             return True
@@ -72,63 +180,255 @@ class KapitalBankAPI:
             logging.warning("Authentication tokens missing in response.")
             return False
 
-    def _get_accounts(self):
+    def _refresh(self) -> bool:
+        """Exchange the refresh token for a new access token (no login round-trip)."""
+        try:
+            response = self._post(f"{self.base_url}{self.refresh_path}", "refresh",
+                                  json={"refreshToken": self.tokens.refresh_token},
+                                  headers={"User-agent": USER_AGENT})
+            response.raise_for_status()
+            response_data = response.json().get("responseData") or {}
+        except (requests.RequestException, ValueError) as e:
+            logging.warning(f"Token refresh failed: {e}")
+            return False
+
+        token = response_data.get("jwttoken")
+        if not token:
+            logging.warning("Token refresh response has no access token.")
+            return False
+
+        self._apply_tokens(self.tokens.username, token, response_data.get("jwtrefreshtoken") or "")
+        logging.info("Access token refreshed.")
+        return True
+
+    def _apply_tokens(self, username: str, token: str, refresh_token: str, client_id: str = "") -> None:
+        self.tokens.store(username, token, refresh_token, str(client_id) if client_id else "")
+        self.session.headers.update({"Authorization": f"Bearer {token}"})
+        self.session.headers["User-agent"] = USER_AGENT
+
+    def ensure_authenticated(self, username: str, password: str) -> bool:
+        """Reuse a valid token, else refresh it, and log in only when refreshing fails."""
+        with self.tokens.lock:
+            self._credentials = (username, password)
+
+            if self.tokens.access_valid(username):
+                logging.info("Reusing access token.")
+                return True
+
+            if self.tokens.can_refresh(username) and self._refresh():
+                return True
+
+            self.tokens.clear()
+            return self._authenticate(username, password)
+
+    def _reauthenticate(self, stale_token: str) -> bool:
+        """Called on 401: refresh (or log in again) unless another thread already did."""
+        with self.tokens.lock:
+            if self.tokens.access_token and self.tokens.access_token != stale_token:
+                return True
+
+            if self.tokens.refresh_token and self._refresh():
+                return True
+
+            username, password = self._credentials
+            self.tokens.clear()
+            return bool(username) and self._authenticate(username, password)
+
+    def _post(self, url: str, endpoint: str, **kwargs) -> requests.Response:
+        def send() -> requests.Response:
+            self.rate_limiter.acquire("kapital", endpoint)
+            return self.session.post(url, **kwargs)
+
+        return self.retry_policy.send(send, url)
+
+    def _get(self, url: str, progress: Optional[ProgressReporter] = None, endpoint: str = "*",
+             stream: bool = False) -> requests.Response:
+        metrics = progress.metrics if progress is not None else NULL_METRICS
+
+        def send() -> requests.Response:
+            self.rate_limiter.acquire("kapital", endpoint, progress)
+            return metrics.timed_request(endpoint, lambda: self.session.get(url, stream=stream))
+
+        token = self.tokens.access_token
+        response = self.retry_policy.send(send, url, progress)
+        if response.status_code == 401 and self._reauthenticate(token):
+            response.close()
+            response = self.retry_policy.send(send, url, progress)
+        if stream:
+            # тело ошибки не читается — соединение возвращается в пул сразу;
+            # байты успешного ответа считает _read_json
+            if not response.ok:
+                response.close()
+        elif progress is not None:
+            progress.emit(BYTES_DOWNLOADED, len(response.content))
+        return response
+
+    def _read_json(self, response: requests.Response, array_path: str,
+                   progress: Optional[ProgressReporter] = None) -> Any:
+        """
+        response.json(); with streaming_json the array at array_path is parsed item by item and only
+        the parts the report and the store read are kept: accountInfo and the array itself.
+        """
+        if not self.streaming_json:
+            return response.json()
+
+        with response:
+            document = stream_array(response, array_path)
+            statements = list(document)
+        if progress is not None:
+            progress.emit(BYTES_DOWNLOADED, document.bytes_read)
+        return self._statements_document(document.rest, statements)
+
+    @staticmethod
+    def _statements_document(rest: Any, statements: list) -> dict:
+        """Account statements response of a streamed parse: accountInfo of rest and the streamed statementList."""
+        operations = rest.get("responseData", {}).get("operations", {}) if isinstance(rest, dict) else {}
+        return {"responseData": {"operations": {"accountInfo": operations.get("accountInfo", {}),
+                                                "statementList": statements}}}
+
+    @staticmethod
+    def _read_array(response: requests.Response, array_path: str,
+                    progress: Optional[ProgressReporter] = None) -> list:
+        """Only the array at array_path of a streamed response, the rest of the document is skipped."""
+        with response:
+            items = stream_array(response, array_path, keep_rest=False)
+            values = list(items)
+        if progress is not None:
+            progress.emit(BYTES_DOWNLOADED, items.bytes_read)
+        return values
+
+    def _cached(self, run: KapitalRun, endpoint: str, fetch: Callable[[], Any]) -> Any:
+        if self.cache is None:
+            return fetch()
+        return self.cache.get_or_fetch("kapital", run.cache_fingerprint, endpoint, fetch,
+                                       force_refresh=run.force_refresh)
+
+    def _get_accounts(self, run: KapitalRun):
+        run.accounts = self._cached(run, "/accounts", lambda: self._fetch_accounts(run.progress))
+        run.progress.emit(ACCOUNTS_TOTAL, len(run.accounts))
+
+    def _fetch_accounts(self, progress: Optional[ProgressReporter] = None) -> list:
         try:
             logging.info("Getting accounts")
-            response = self.session.get(url=f"{self.base_url}/accounts")
+            response = self._get(f"{self.base_url}/accounts", progress, "accounts")
             response.raise_for_status()
             data = response.json()
-            self.accounts = data.get("responseData", {}).get("accountsList", [])
-            logging.info(f"Accounts retrieved successfully. Number of accounts: {len(self.accounts)}")
-            logging.info(self.accounts)
+            accounts = data.get("responseData", {}).get("accountsList", [])
+            log_payload("Accounts retrieved successfully", accounts)
+            return accounts
 
         except requests.RequestException as e:
             logging.error(f"Failed to get accounts: {e}")
-            self.accounts = []
+            return []
 
-    def _get_statements_for_accounts(self, date_from: str, date_to: str):
-        self._get_accounts()
+    def _get_statements_for_accounts(self, run: KapitalRun):
+        self._get_accounts(run)
+        date_from, date_to = run.date_from, run.date_to
 
         logging.info("Processing each account's statements:")
 
-        for account in self.accounts:
-            logging.info(f"Processing account: {account.get('custAcNo')}")
-
-            try:
-
-                response = self.session.get(f"{self.base_url}/v2/statement/account?fromDate={date_from}"
-                                            f"&toDate={date_to}&accountNumber={account.get('custAcNo')}")
+        for account in run.accounts:
+            run.progress.check_cancelled()
+            acc_no = account.get('custAcNo')
+            logging.info(f"Processing account: {acc_no}")
 
-                logging.info(f"Getting statements for account {account.get('custAcNo')}")
-                response.raise_for_status()
-                data = response.json()
-                logging.info(f"Statements retrieved successfully for account {account.get('custAcNo')}")
+            if run.sync and self.store is not None:
+                data = self._sync_account_statements(acc_no, date_from, date_to, run.progress)
+            else:
+                data = self._fetch_account_statements(acc_no, date_from, date_to, run.progress)
 
-                self.statements_dataset.append(data)
+            if data is not None:
+                run.statements_dataset.append(data)
+            run.progress.emit(ACCOUNT_DONE)
 
-            except requests.RequestException as e:
-                logging.error(f"Failed to get statements for account {account.get('custAcNo')}: {e}")
-
-
-    def _get_cards_data(self) -> list:
-
-        for account in self.accounts:
-            logging.info(f"Getting cards data for account: {account.get('custAcNo')}")
+    def _fetch_account_statements(self, acc_no: str, date_from: str, date_to: str,
+                                  progress: Optional[ProgressReporter] = None) -> Optional[dict]:
+        try:
 
-            try:
-                response = self.session.get(f"{self.base_url}/cards")
-                response.raise_for_status()
+            response = self._get(f"{self.base_url}/v2/statement/account?fromDate={date_from}"
+                                 f"&toDate={date_to}&accountNumber={acc_no}", progress, "account_statement",
+                                 stream=self.streaming_json)
 
-                logging.info(f"Cards data retrieved successfully for account {account.get('custAcNo')}")
+            logging.info(f"Getting statements for account {acc_no}")
+            response.raise_for_status()
+            data = self._read_json(response, "responseData.operations.statementList", progress)
+            logging.info(f"Statements retrieved successfully for account {acc_no}")
+            if progress is not None:
+                progress.emit(PAGE_FETCHED)
+            return data
 
-                cards_data = response.json().get("responseData", {}).get("cards", [])
+        except requests.RequestException as e:
+            logging.error(f"Failed to get statements for account {acc_no}: {e}")
+            return None
+
+    def _sync_account_statements(self, acc_no: str, date_from: str, date_to: str,
+                                 progress: Optional[ProgressReporter] = None) -> Optional[dict]:
+        """
+        Fetch only the days after the account's sync watermark, store them and return the
+        response with statementList replaced by the whole requested range from the store.
+        accountInfo is the one of the last fetched window.
+        """
+        window = self._account_sync_window(acc_no, date_from, date_to)
+        _, _, fetch_from, fetch_to = window
+
+        data = self._fetch_account_statements(acc_no, fetch_from.strftime(INPUT_DATE_FORMAT),
+                                              fetch_to.strftime(INPUT_DATE_FORMAT), progress)
+        return self._store_account_statements(acc_no, window, data)
+
+    def _account_sync_window(self, acc_no: str, date_from: str, date_to: str) -> Tuple[date, date, date, date]:
+        """Requested days and the days still to fetch: (day_from, day_to, fetch_from, fetch_to)."""
+        day_from = datetime.strptime(date_from, INPUT_DATE_FORMAT).date()
+        day_to = datetime.strptime(date_to, INPUT_DATE_FORMAT).date()
+
+        fetch_from, fetch_to = self.store.sync_window("kapital", "account", acc_no, day_from, day_to)
+        logging.info(f"Account {acc_no}: syncing {fetch_from} - {fetch_to}")
+        return day_from, day_to, fetch_from, fetch_to
+
+    def _store_account_statements(self, acc_no: str, window: Tuple[date, date, date, date],
+                                  data: Optional[dict]) -> Optional[dict]:
+        if data is None:
+            return None
+
+        day_from, day_to, fetch_from, fetch_to = window
+        operations = data.setdefault("responseData", {}).setdefault("operations", {})
+        self.store.save("kapital", "account", acc_no, operations.get("statementList") or [],
+                        date_fields=OPERATION_DATE_FIELDS, fallback_date=fetch_to)
+        self.store.mark_synced("kapital", "account", acc_no, fetch_from, fetch_to)
+
+        operations["statementList"] = self.store.load("kapital", "account", acc_no, day_from, day_to)
+        return data
+
+    def _get_cards_data(self, run: KapitalRun) -> list:
+        """GET /cards does not depend on the account, so it is requested once per run."""
+        logging.info("Getting cards data")
+
+        return self._add_cards(run, self._cached(run, "/cards", lambda: self._fetch_cards(run.progress)))
+
+    @staticmethod
+    def _add_cards(run: KapitalRun, cards: list) -> list:
+        """One card per card account: statements are requested by account number."""
+        seen = set()
+        for card in cards:
+            account_number = card.get("accountNumber")
+            if account_number in seen:
+                continue
+            seen.add(account_number)
+            run.cards.append(card)
+
+        return run.cards
+
+    def _fetch_cards(self, progress: Optional[ProgressReporter] = None) -> list:
+        try:
+            response = self._get(f"{self.base_url}/cards", progress, "cards")
+            response.raise_for_status()
 
-                self.cards.extend(cards_data)
+            logging.info("Cards data retrieved successfully")
 
-            except requests.RequestException as e:
-                logging.error(f"Failed to get cards data for account {account.get('custAcNo')}: {e}")
+            return response.json().get("responseData", {}).get("cards", [])
 
-        return self.cards
+        except requests.RequestException as e:
+            logging.error(f"Failed to get cards data: {e}")
+            return []
 
     def _calculate_90_days_period(self, start_date, end_date) -> list[dict[str, str]]:
 
@@ -167,291 +467,328 @@ class KapitalBankAPI:
 
 
 
-    def _get_cards_statements(self, from_date: str, to_date: str):
-
-        cards_data = self._get_cards_data()
-        logging.info(f"Cards data retrieved successfully. Number of cards: {len(cards_data)}")
-        logging.info(cards_data)
+    def _get_cards_statements(self, run: KapitalRun):
 
-        date_parts = from_date.split("-")
-        date_parts_2 = to_date.split("-")
-
-        new_from_date = f"{date_parts[2]}-{date_parts[1]}-{date_parts[0]}"
-        new_to_date = f"{date_parts_2[2]}-{date_parts_2[1]}-{date_parts_2[0]}"
-
-        date_objects = self._calculate_90_days_period(new_from_date, new_to_date)
+        cards_data = self._get_cards_data(run)
+        log_payload("Cards data retrieved successfully", cards_data)
 
         if not cards_data:
             logging.warning("No cards found to get statements for.")
             return
 
-        if not date_objects:
-            logging.warning("No periods found to get statements for.")
-            return
-
+        # все запросы (карта x период) идут через общий пул, результаты собираются в исходном порядке
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            planned = [
+                (plan, [executor.submit(self._fetch_card_statements, plan.account_number, period, run.progress)
+                        for period in plan.periods])
+                for plan in self._plan_card_statements(run, cards_data)
+            ]
 
-        for card in cards_data:
-            logging.info(f"Getting cards statements for card account: {card.get('accountNumber')}")
-
-            for period in date_objects:
-
-                logging.info(f"Getting cards statements for period: {period.get('start')} - {period.get('end')}")
+            for plan, futures in planned:
+                self._add_card_statements(run, plan, [future.result() for future in futures])
 
-                try:
-                    response = self.session.get(f"{self.base_url}/v2/statement/card?fromDate={period.get('start')}"
-                                                f"&toDate={period.get("end")}&accountNumber={card.get('accountNumber')}")
+        log_payload("Cards statements retrieved successfully", run.cards_statements)
 
-                    response.raise_for_status()
-                    data = response.json()
+    def _plan_card_statements(self, run: KapitalRun, cards_data: list) -> List["CardStatementsPlan"]:
+        """Card accounts with the days to fetch (after the sync watermark) split into request periods."""
+        day_from = datetime.strptime(run.date_from, INPUT_DATE_FORMAT).date()
+        day_to = datetime.strptime(run.date_to, INPUT_DATE_FORMAT).date()
+        use_store = run.sync and self.store is not None
 
-                    dataset = data.get("responseData", {}).get("operation", [])
-
-                    if not dataset:
-                        logging.warning(f"No statements found for account {card.get('accountNumber')}")
-                        continue
-                    else:
-                        logging.info(f"Cards statements retrieved successfully for account {card.get('accountNumber')}")
+        plans = []
+        for card in cards_data:
+            account_number = card.get('accountNumber')
+            logging.info(f"Getting cards statements for card account: {account_number}")
+
+            if use_store:
+                fetch_from, fetch_to = self.store.sync_window("kapital", "card", account_number, day_from, day_to)
+            else:
+                fetch_from, fetch_to = day_from, day_to
+
+            date_objects = self._calculate_90_days_period(fetch_from.strftime(PERIOD_DATE_FORMAT),
+                                                          fetch_to.strftime(PERIOD_DATE_FORMAT))
+            if not date_objects:
+                logging.warning("No periods found to get statements for.")
+                continue
+
+            plans.append(CardStatementsPlan(account_number, day_from, day_to, fetch_from, fetch_to, date_objects,
+                                            use_store))
+        return plans
+
+    def _add_card_statements(self, run: KapitalRun, plan: "CardStatementsPlan", datasets: List[Optional[list]]) -> None:
+        """Merge the periods of one card account (None — the request failed) and sync them through the store."""
+        operations = []
+        complete = True
+        for dataset in datasets:
+            if dataset is None:
+                complete = False
+            else:
+                operations.extend(dataset)
+
+        if plan.use_store:
+            account_number = plan.account_number
+            self.store.save("kapital", "card", account_number, operations,
+                            date_fields=OPERATION_DATE_FIELDS, fallback_date=plan.fetch_to)
+            if complete:
+                self.store.mark_synced("kapital", "card", account_number, plan.fetch_from, plan.fetch_to)
+            operations = self.store.load("kapital", "card", account_number, plan.day_from, plan.day_to)
+
+        run.cards_statements.extend(operations)
+
+    def _fetch_card_statements(self, account_number: str, period: dict,
+                               progress: Optional[ProgressReporter] = None) -> Optional[list]:
+        """Operations of one card account for one period; None when the request failed."""
+        progress = ensure_progress(progress)
+        progress.check_cancelled()
+        logging.info(f"Getting cards statements for period: {period.get('start')} - {period.get('end')}")
 
-                    self.cards_statements.extend(dataset)
+        try:
+            response = self._get(f"{self.base_url}/v2/statement/card?fromDate={period.get('start')}"
+                                 f"&toDate={period.get('end')}&accountNumber={account_number}", progress,
+                                 "card_statement", stream=self.streaming_json)
 
-                except requests.RequestException as e:
-                    logging.error(f"Failed to get cards statements for card account {card.get('accountNumber')}: {e}")
+            response.raise_for_status()
+            if self.streaming_json:
+                dataset = self._read_array(response, "responseData.operation", progress)
+            else:
+                dataset = response.json().get("responseData", {}).get("operation", [])
+            progress.emit(PAGE_FETCHED)
 
-        logging.info(f"Cards statements retrieved successfully. Number of statements: {len(self.cards_statements)}")
-        logging.info(self.cards_statements)
+            if not dataset:
+                logging.warning(f"No statements found for account {account_number}")
+                return []
 
-    def _prepare_excel(self):
-        accounts_table = []
+            logging.info(f"Cards statements retrieved successfully for account {account_number}")
+            return dataset
 
-        if self.accounts:
-            for account in self.accounts:
-                accounts_table.append({
-                    "Branch Code": account.get("branchCode", ""),
-                    "Customer Account No": account.get("custAcNo", ""),
-                    "IBAN Account No": account.get("ibanAcNo", ""),
-                    "Currency": account.get("ccy", ""),
-                    "Status": account.get("status", ""),
-                    "Planned Amount": account.get("plannedAmt", ""),
-                    "Current Amount": account.get("currAmt", ""),
-                    "Hold": account.get("hold", ""),
-                })
+        except requests.RequestException as e:
+            logging.error(f"Failed to get cards statements for card account {account_number}: {e}")
+            return None
+
+    @staticmethod
+    def _accounts_table(run: KapitalRun) -> List[Dict[str, Any]]:
+        return [{
+            "Branch Code": account.get("branchCode", ""),
+            "Customer Account No": account.get("custAcNo", ""),
+            "IBAN Account No": account.get("ibanAcNo", ""),
+            "Currency": account.get("ccy", ""),
+            "Status": account.get("status", ""),
+            "Planned Amount": account.get("plannedAmt", ""),
+            "Current Amount": account.get("currAmt", ""),
+            "Hold": account.get("hold", ""),
+        } for account in run.accounts]
+
+    @staticmethod
+    def _statement_rows(run: KapitalRun) -> Tuple[List[str], Iterator[List[Any]]]:
+        """
+        Accounts_Statements as flat rows: account info fields prefixed "account_", then the
+        statement fields; an account without statements gets a single row with only its info.
+        """
+        blocks = []
+        for dataset in run.statements_dataset:
+            operations = dataset.get("responseData", {}).get("operations", {})
+            account_info = operations.get("accountInfo", {})
+            if not account_info:
+                logging.warning("No account info found in dataset")
+                continue
+            blocks.append((account_info, operations.get("statementList", []) or []))
+
+        account_columns = union_columns(account_info for account_info, _ in blocks)
+        statement_columns = union_columns(statement for _, statements in blocks for statement in statements)
+
+        def rows() -> Iterator[List[Any]]:
+            for account_info, statements in blocks:
+                account_values = [account_info.get(c) for c in account_columns]
+                if not statements:
+                    yield account_values + [None] * len(statement_columns)
+                for statement in statements:
+                    yield account_values + [statement.get(c) for c in statement_columns]
+
+        return [f"account_{c}" for c in account_columns] + statement_columns, rows()
+
+    def _prepare_excel(self, run: KapitalRun):
+        metrics = run.progress.metrics
+        accounts_table = self._accounts_table(run)
+
+        rows_written = len(accounts_table) + len(run.cards) + len(run.cards_statements)
+        metrics.add("rows_normalized_total", len(accounts_table), sheet="Accounts")
+        metrics.add("rows_normalized_total", len(run.cards), sheet="Cards")
+        metrics.add("rows_normalized_total", len(run.cards_statements), sheet="Cards_Statements")
 
         wb = Workbook()
         ws_acc = wb.active
         ws_acc.title = "Accounts"
 
-        if accounts_table:
-            df_accounts = pd.DataFrame(accounts_table)
-            for r in dataframe_to_rows(df_accounts, index=False, header=True):
-                ws_acc.append(r)
-
-            for cell in ws_acc[1]:
-                cell.font = Font(bold=True)
-                cell.fill = PatternFill(start_color="BDD7EE", end_color="BDD7EE", fill_type="solid")
-                cell.alignment = Alignment(horizontal="center")
-
-            ws_acc.auto_filter.ref = ws_acc.dimensions
-            for column_cells in ws_acc.columns:
-                max_length = 0
-                column = column_cells[0].column_letter
-                for cell in column_cells:
+        with metrics.timer("excel_write_seconds_total", sheet="Accounts"):
+            if accounts_table:
+                writer = SheetWriter(ws_acc, ColumnWidths(self.column_widths))
+                columns = union_columns(accounts_table)
+                writer.append_header(columns)
+                writer.append_records(accounts_table, columns)
+                writer.set_auto_filter()
+                writer.autosize()
+                logging.info("Excel sheet prepared with account data.")
+
+            else:
+                ws_acc["A1"] = "No accounts found"
+                logging.warning("No accounts found to write to Excel.")
+
+        if run.statements_dataset:
+            with metrics.timer("excel_write_seconds_total", sheet="Accounts_Statements"):
+                statements_sheet = wb.create_sheet("Accounts_Statements")
+                writer = SheetWriter(statements_sheet, ColumnWidths(self.column_widths, max_width=50))
+
+                for dataset in run.statements_dataset:
                     try:
-                        cell_value = str(cell.value)
-                    except Exception:
-                        cell_value = ""
-                    max_length = max(max_length, len(cell_value))
-                adjusted_width = (max_length + 2)
-                ws_acc.column_dimensions[column].width = adjusted_width
-            logging.info("Excel sheet prepared with account data.")
 
-        else:
-            ws_acc["A1"] = "No accounts found"
-            logging.warning("No accounts found to write to Excel.")
+                        account_info = dataset.get("responseData", {}).get("operations", {}).get("accountInfo", {})
+                        statements = dataset.get("responseData", {}).get("operations", {}).get("statementList", [])
 
-        date_suffix = datetime.now().strftime("%Y-%m-%d_%H-%M")
-        final_filename = f"{date_suffix}_kapital_report.xlsx"
+                        if not account_info:
+                            logging.warning("No account info found in dataset")
+                            continue
+
+                        # ===== ДОБАВЛЯЕМ ИНФОРМАЦИЮ АККАУНТА =====
+                        writer.append(["=== ACCOUNT INFO ==="], SECTION_TITLE_STYLE)
 
-        if self.excel_path:
-            final_filename = str(self.excel_path.joinpath(final_filename))
-            logging.log(msg="Final path: " + final_filename, level=logging.INFO)
+                        # Заголовки и значения информации аккаунта
+                        account_headers = list(account_info.keys())
+                        writer.append_header(account_headers)
+                        writer.append([account_info.get(header, "") for header in account_headers])
+                        writer.skip_rows(1)  # Пустая строка между аккаунтом и операциями
 
-        if self.statements_dataset:
-            statements_sheet = wb.create_sheet("Accounts_Statements")
-            current_row = 1
+                        # ===== ДОБАВЛЯЕМ ОПЕРАЦИИ =====
+                        if statements:
+                            writer.append(["=== STATEMENT LIST ==="], SECTION_TITLE_STYLE)
 
-            for dataset in self.statements_dataset:
-                try:
+                            statement_headers = union_columns(statements)
+                            writer.append_header(statement_headers)
+                            writer.append_records(statements, statement_headers)
+                            rows_written += len(statements)
+                            metrics.add("rows_normalized_total", len(statements), sheet="Accounts_Statements")
 
-                    account_info = dataset.get("responseData", {}).get("operations", {}).get("accountInfo", {})
-                    statements = dataset.get("responseData", {}).get("operations", {}).get("statementList", [])
+                            writer.skip_rows(2)  # Пустые строки между аккаунтами
 
-                    if not account_info:
-                        logging.warning("No account info found in dataset")
+                        logging.info(f"Added account info and {len(statements)} statements to Excel")
+
+                    except Exception as e:
+                        logging.error(f"Error processing dataset: {e}")
                         continue
 
-                    # ===== ДОБАВЛЯЕМ ИНФОРМАЦИЮ АККАУНТА =====
-                    statements_sheet[f"A{current_row}"] = "=== ACCOUNT INFO ==="
-                    statements_sheet[f"A{current_row}"].font = Font(bold=True, size=12, color="000000")
-                    statements_sheet[f"A{current_row}"].fill = PatternFill(start_color="366092", end_color="366092",
-                                                                           fill_type="solid")
-                    current_row += 1
-
-                    # Заголовки для информации аккаунта
-                    account_headers = list(account_info.keys())
-                    for idx, header in enumerate(account_headers, start=1):
-                        col_letter = chr(64 + idx)  # A, B, C, ...
-                        statements_sheet[f"{col_letter}{current_row}"] = header
-                        statements_sheet[f"{col_letter}{current_row}"].font = Font(bold=True)
-                        statements_sheet[f"{col_letter}{current_row}"].fill = PatternFill(start_color="BDD7EE",
-                                                                                          end_color="BDD7EE",
-                                                                                          fill_type="solid")
-                    current_row += 1
-
-                    # Значения информации аккаунта
-                    for idx, header in enumerate(account_headers, start=1):
-                        col_letter = chr(64 + idx)
-                        statements_sheet[f"{col_letter}{current_row}"] = account_info.get(header, "")
-                    current_row += 2  # Пустая строка между аккаунтом и операциями
-
-                    # ===== ДОБАВЛЯЕМ ОПЕРАЦИИ =====
-                    if statements:
-                        statements_sheet[f"A{current_row}"] = "=== STATEMENT LIST ==="
-                        statements_sheet[f"A{current_row}"].font = Font(bold=True, size=12, color="000000")
-                        statements_sheet[f"A{current_row}"].fill = PatternFill(start_color="366092", end_color="366092",
-                                                                               fill_type="solid")
-                        current_row += 1
-
-                        df_statements = pd.DataFrame(statements)
-
-                        # Заголовки операций
-                        statement_headers = list(df_statements.columns)
-                        for idx, header in enumerate(statement_headers, start=1):
-                            col_letter = chr(64 + idx)
-                            statements_sheet[f"{col_letter}{current_row}"] = header
-                            statements_sheet[f"{col_letter}{current_row}"].font = Font(bold=True)
-                            statements_sheet[f"{col_letter}{current_row}"].fill = PatternFill(start_color="BDD7EE",
-                                                                                              end_color="BDD7EE",
-                                                                                              fill_type="solid")
-                        current_row += 1
-
-                        # Значения операций
-                        for _, row in df_statements.iterrows():
-                            for idx, header in enumerate(statement_headers, start=1):
-                                col_letter = chr(64 + idx)
-                                statements_sheet[f"{col_letter}{current_row}"] = row[header]
-                            current_row += 1
-
-                        current_row += 2  # Пустые строки между аккаунтами
-
-                    logging.info(f"Added account info and {len(statements)} statements to Excel")
-
-                except Exception as e:
-                    logging.error(f"Error processing dataset: {e}")
-                    continue
-
-            # Авторазмер колонок в листе Statements
-            for column_cells in statements_sheet.columns:
-                max_length = 0
-                column = column_cells[0].column_letter
-                for cell in column_cells:
-                    try:
-                        cell_value = str(cell.value)
-                    except Exception:
-                        cell_value = ""
-                    max_length = max(max_length, len(cell_value))
-                adjusted_width = min(max_length + 2, 50)
-                statements_sheet.column_dimensions[column].width = adjusted_width
-
-        if self.cards:
-            cards_sheet = wb.create_sheet("Cards")
-            counter = 1
-
-            # Заголовки (первая строка)
-            for idx, card_header in enumerate(self.cards[0].keys(), start=1):
-                col_letter = chr(64 + idx)  # A, B, C, ...
-                cards_sheet[f"{col_letter}1"] = card_header
-                cards_sheet[f"{col_letter}1"].font = Font(bold=True)
-                cards_sheet[f"{col_letter}1"].fill = PatternFill(start_color="BDD7EE", end_color="BDD7EE",
-                                                                 fill_type="solid")
-
-            counter += 1  # увеличить строку после заголовков один раз
-
-            # Данные карт (начиная со второй строки)
-            for card in self.cards:
-                for val_id, card_val in enumerate(card.values(), start=1):
-                    letter = chr(64 + val_id)
-                    cards_sheet[f"{letter}{counter}"] = card_val
-                    cards_sheet[f"{letter}{counter}"].font = Font(size=12, color="000000")
-
-                counter += 1
-
-            # Авторазмер колонок
-            for column_cells in cards_sheet.columns:
-                max_length = 0
-                column = column_cells[0].column_letter
-                for cell in column_cells:
-                    try:
-                        cell_value = str(cell.value)
-                    except Exception:
-                        cell_value = ""
-                    max_length = max(max_length, len(cell_value))
-                adjusted_width = min(max_length + 2, 50)
-                cards_sheet.column_dimensions[column].width = adjusted_width
-
-            logging.info(f"Cards sheet created with {len(self.cards)} cards")
-
-        if self.cards_statements:
-            cards_statements_sheet = wb.create_sheet("Cards_Statements")
-
-            # Заголовки из ключей первого словаря
-            headers = list(self.cards_statements[0].keys())
-            for col_idx, header in enumerate(headers, start=1):
-                col_letter = chr(64 + col_idx)
-                cell = cards_statements_sheet[f"{col_letter}1"]
-                cell.value = header
-                cell.font = Font(bold=True)
-                cell.fill = PatternFill(start_color="BDD7EE", end_color="BDD7EE", fill_type="solid")
-                cell.alignment = Alignment(horizontal="center")
-
-            # Данные операций
-            for row_idx, operation in enumerate(self.cards_statements, start=2):
-                for col_idx, header in enumerate(headers, start=1):
-                    col_letter = chr(64 + col_idx)
-                    val = operation.get(header, "")
-                    cell = cards_statements_sheet[f"{col_letter}{row_idx}"]
-                    cell.value = val
-                    cell.font = Font(size=11, color="000000")
-
-            # Авторазмер колонок
-            for column_cells in cards_statements_sheet.columns:
-                max_length = 0
-                column = column_cells[0].column_letter
-                for cell in column_cells:
-                    try:
-                        cell_value = str(cell.value)
-                    except Exception:
-                        cell_value = ""
-                    max_length = max(max_length, len(cell_value))
-                adjusted_width = min(max_length + 2, 50)
-                cards_statements_sheet.column_dimensions[column].width = adjusted_width
+                # Авторазмер колонок в листе Statements
+                writer.autosize()
+
+        if run.cards:
+            with metrics.timer("excel_write_seconds_total", sheet="Cards"):
+                cards_sheet = wb.create_sheet("Cards")
+                writer = SheetWriter(cards_sheet, ColumnWidths(self.column_widths, max_width=50))
+
+                # Заголовки (первая строка) по ключам первой карты
+                headers = list(run.cards[0].keys())
+                writer.append_header(headers)
+
+                # Данные карт (начиная со второй строки)
+                for card in run.cards:
+                    writer.append(list(card.values()), CARD_VALUE_STYLE)
 
-            logging.info(f"Card Statements sheet created with {len(self.cards_statements)} operations")
+                writer.autosize()
+
+                logging.info(f"Cards sheet created with {len(run.cards)} cards")
+
+        if run.cards_statements:
+            with metrics.timer("excel_write_seconds_total", sheet="Cards_Statements"):
+                cards_statements_sheet = wb.create_sheet("Cards_Statements")
+                writer = SheetWriter(cards_statements_sheet, ColumnWidths(self.column_widths, max_width=50))
+
+                # Заголовки из ключей первого словаря
+                headers = list(run.cards_statements[0].keys())
+                writer.append_header(headers)
+
+                # Данные операций (шрифт по умолчанию, отдельный стиль на ячейку не нужен)
+                writer.append_records(run.cards_statements, headers)
+
+                writer.autosize()
+
+                logging.info(f"Card Statements sheet created with {len(run.cards_statements)} operations")
 
         date_suffix = datetime.now().strftime("%Y-%m-%d_%H-%M")
         final_filename = f"{date_suffix}_kapital_report.xlsx"
 
-        if self.excel_path:
-            final_filename = str(self.excel_path.joinpath(final_filename))
+        excel_path = run.output_dir or self.excel_path
+        if excel_path:
+            final_filename = str(Path(excel_path).joinpath(final_filename))
             logging.info("Final path: " + final_filename)
 
-        wb.save(final_filename)
+        with metrics.timer("excel_write_seconds_total", sheet="(save)"):
+            wb.save(final_filename)
         logging.info(f"Excel file saved as {final_filename}")
+        run.progress.emit(ROWS_WRITTEN, rows_written)
 
         return True
 
-    def process_data(self, date_from: str, date_to: str, username: str, password: str):
-        #аутентифицировать перед запросами
-        self._authenticate(username, password)
+    def _exceeds_sheet(self, run: KapitalRun) -> bool:
+        """True when a _prepare_excel sheet wouldn't fit sheet_rows rows (it can't split sheets)."""
+        budget = self.sheet_rows or EXCEL_MAX_ROWS - 1
+        # лист Accounts_Statements: операции плюс до 7 строк секций на каждый аккаунт
+        statement_rows = sum(
+            len(dataset.get("responseData", {}).get("operations", {}).get("statementList", []) or []) + 7
+            for dataset in run.statements_dataset
+        )
+        if max(statement_rows, len(run.cards_statements), len(run.accounts)) <= budget:
+            return False
+        logging.info(f"More than {budget} rows in a sheet, writing flat tables in sheets of {budget} rows")
+        return True
+
+    def _save_report(self, run: KapitalRun) -> bool:
+        """
+        Report through banks_api.report_sinks: the same tables as flat records, one row per record.
+        Used for non-xlsx formats and for xlsx reports that must be split into several sheets.
+        """
+        metrics = run.progress.metrics
+        accounts_table = self._accounts_table(run)
+        statement_columns, statement_rows = self._statement_rows(run)
+
+        tables = [
+            ("Accounts", *_record_rows(accounts_table), "No accounts found"),
+            ("Accounts_Statements", statement_columns, statement_rows, "No statements found"),
+            ("Cards", *_record_rows(run.cards), "No cards found"),
+            ("Cards_Statements", *_record_rows(run.cards_statements), "No card statements found"),
+        ]
+        # по счёту / месяцу делятся только выписки
+        shard_keys = {name: shard_key(self.shard_by, columns, SHARD_ACCOUNT_COLUMNS, OPERATION_DATE_FIELDS)
+                      for name, columns, _, _ in tables if name.endswith("_Statements")}
+
+        date_suffix = datetime.now().strftime("%Y-%m-%d_%H-%M")
+        final_filename = str(Path(run.output_dir or self.excel_path or "").joinpath(f"{date_suffix}_kapital_report"))
+
+        rows_written = 0
+        sink = make_sink(run.report_format, final_filename, sheet_rows=self.sheet_rows)
+        try:
+            for name, columns, rows, empty_message in tables:
+                with metrics.timer("excel_write_seconds_total", sheet=name):
+                    count = sink.write_table(name, columns, rows, empty_message=empty_message,
+                                             shard_key=shard_keys.get(name))
+                metrics.add("rows_normalized_total", count, sheet=name)
+                rows_written += count
+        finally:
+            with metrics.timer("excel_write_seconds_total", sheet="(save)"):
+                final_filename = sink.close()
+
+        logging.info(f"Report saved as {final_filename}")
+        run.progress.emit(ROWS_WRITTEN, rows_written)
+        return True
+
+    def process_data(self, date_from: str, date_to: str, username: str, password: str,
+                     force_refresh: bool = False, sync: bool = False,
+                     progress: Optional[ProgressReporter] = None, output_dir: Optional[Path] = None,
+                     report_format: Optional[str] = None):
+        report_format = report_format or self.report_format
+        check_format(report_format)
+
+        #аутентифицировать перед запросами (токен прошлой выгрузки переиспользуется)
+        if not self.ensure_authenticated(username, password):
+            logging.error("Authentication failed, export aborted.")
+            return False
 
         logging.info(f"Process data called with date_from={date_from} and date_to={date_to}")
 
@@ -459,6 +796,30 @@ class KapitalBankAPI:
             logging.error("Date range is not valid. Please check your input.")
             return False
 
-        self._get_statements_for_accounts(date_from, date_to)
-        self._get_cards_statements(date_from, date_to)
-        return self._prepare_excel()
+        run = KapitalRun(
+            date_from, date_to, sync=sync, force_refresh=force_refresh,
+            cache_fingerprint=self.cache.fingerprint(username) if self.cache is not None else "",
+            progress=progress, output_dir=output_dir, report_format=report_format,
+        )
+        run.progress.start_deadline(self.retry_policy.export_deadline)
+        if self.metrics_store is not None:
+            run.progress.start_metrics("kapital")
+
+        ok = False
+        try:
+            if self.use_asyncio:
+                from banks_api.async_fetch import AsyncKapitalFetcher, run_sync
+
+                run_sync(AsyncKapitalFetcher(self).fetch_all(run))
+            else:
+                self._get_statements_for_accounts(run)
+                self._get_cards_statements(run)
+            run.progress.check_cancelled()
+            if run.report_format == "xlsx" and not self.shard_by and not self._exceeds_sheet(run):
+                ok = self._prepare_excel(run)
+            else:
+                ok = self._save_report(run)
+            return ok
+        finally:
+            finish_run(run.progress.metrics, ok, self.metrics_store)
+            run.release()
@@ -0,0 +1,300 @@
+"""
+Метрики одной выгрузки: задержки запросов по эндпоинтам (гистограммы), число запросов и ошибок,
+полученные байты, повторы, ожидание ограничителя, строки и время записи листов Excel.
+
+RunMetrics передаётся через ProgressReporter.metrics; по умолчанию там NULL_METRICS, все вызовы
+которого ничего не делают, так что выключенные метрики почти ничего не стоят.
+"""
+import bisect
+import contextlib
+import datetime
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+if TYPE_CHECKING:
+    from db.metrics_store import MetricsStore
+
+T = TypeVar("T")
+
+# границы корзин гистограммы задержек, секунд (последняя корзина — +Inf)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# префикс имён метрик в формате Prometheus
+PROMETHEUS_PREFIX = "bank_export_"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Счётчики по корзинам LATENCY_BUCKETS, сумма, количество и максимум наблюдений."""
+
+    __slots__ = ("counts", "sum", "count", "max")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (the maximum for the +Inf bucket)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class RunMetrics:
+    """
+    Счётчики и гистограммы одной выгрузки одного банка. Потокобезопасны: пишутся из рабочих
+    потоков клиента и из цикла asyncio.
+
+    labels добавляются ко всем метрикам в формате Prometheus (например, период выгрузки),
+    чтобы метрики нескольких выгрузок одного банка не совпадали.
+    """
+
+    enabled = True
+
+    def __init__(self, bank: str, labels: Optional[Dict[str, str]] = None) -> None:
+        self.bank = bank
+        self.labels = dict(labels or {})
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.ok: Optional[bool] = None
+
+        self._lock = threading.Lock()
+        # (имя, метки) -> значение; имена — как в Prometheus, с суффиксом _total
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        # эндпоинт -> гистограмма задержек
+        self.latency: Dict[str, Histogram] = {}
+
+    def add(self, name: str, value: float = 1, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe_request(self, endpoint: str, status: str, seconds: float) -> None:
+        key = ("requests_total", (("endpoint", endpoint), ("status", status)))
+        with self._lock:
+            histogram = self.latency.get(endpoint)
+            if histogram is None:
+                histogram = self.latency[endpoint] = Histogram()
+            histogram.observe(seconds)
+            self.counters[key] = self.counters.get(key, 0) + 1
+
+    def timed_request(self, endpoint: str, send: Callable[[], T]) -> T:
+        """
+        Call send() and record its latency and status under endpoint.
+
+        For stream=True responses the latency is the time to the response headers.
+        """
+        start = time.perf_counter()
+        try:
+            response = send()
+        except Exception:
+            self.observe_request(endpoint, "error", time.perf_counter() - start)
+            raise
+        self.observe_request(endpoint, str(response.status_code), time.perf_counter() - start)
+        return response
+
+    async def timed_request_async(self, endpoint: str, send: Callable[[], Awaitable[T]]) -> T:
+        """timed_request() for a coroutine send."""
+        start = time.perf_counter()
+        try:
+            response = await send()
+        except Exception:
+            self.observe_request(endpoint, "error", time.perf_counter() - start)
+            raise
+        self.observe_request(endpoint, str(response.status_code), time.perf_counter() - start)
+        return response
+
+    @contextlib.contextmanager
+    def timer(self, name: str, **labels: str) -> Iterator[None]:
+        """Add the seconds spent in the block to the counter name (e.g. excel_write_seconds_total)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start, **labels)
+
+    def finish(self, ok: bool) -> None:
+        self.ok = ok
+        self.duration = time.perf_counter() - self._started
+
+    def counter(self, name: str) -> float:
+        """Sum of the counter over all its labels."""
+        with self._lock:
+            return sum(value for (key, _), value in self.counters.items() if key == name)
+
+    def summary(self) -> Dict[str, Any]:
+        """Plain dict of the run (logged as JSON and kept in db/metrics.db)."""
+        with self._lock:
+            counters = dict(self.counters)
+            requests: Dict[str, Dict[str, Any]] = {}
+            for endpoint, histogram in sorted(self.latency.items()):
+                requests[endpoint] = {
+                    "count": histogram.count,
+                    "avg_ms": round(1000 * histogram.sum / histogram.count, 1),
+                    "p50_ms": round(1000 * histogram.quantile(0.5), 1),
+                    "p95_ms": round(1000 * histogram.quantile(0.95), 1),
+                    "max_ms": round(1000 * histogram.max, 1),
+                    "statuses": {},
+                }
+
+        totals: Dict[str, Any] = {}
+        for (name, labels), value in sorted(counters.items()):
+            if name == "requests_total":
+                label = dict(labels)
+                requests[label["endpoint"]]["statuses"][label["status"]] = int(value)
+                continue
+            if labels:
+                # счётчики с одной меткой (лист, ...) — словарём по её значениям
+                totals.setdefault(name, {})[labels[0][1]] = _rounded(value)
+            else:
+                totals[name] = _rounded(value)
+
+        return {
+            "bank": self.bank,
+            "labels": self.labels,
+            "started_at": datetime.datetime.fromtimestamp(self.started_at).astimezone().isoformat(timespec="seconds"),
+            "duration_s": round(self.duration, 3) if self.duration is not None else None,
+            "ok": self.ok,
+            "requests": requests,
+            "counters": totals,
+        }
+
+    def describe(self) -> str:
+        """One line for the log: requests, latency, bytes, retries, waits, rows and Excel time."""
+        with self._lock:
+            histograms = list(self.latency.values())
+        requests = sum(h.count for h in histograms)
+        slowest = max((h.quantile(0.95) for h in histograms), default=0.0)
+        duration = self.duration if self.duration is not None else time.perf_counter() - self._started
+
+        return (f"{requests} requests (slowest endpoint p95 {slowest:.2f}s), "
+                f"{self.counter('bytes_received_total') / 2 ** 20:.1f} MB, "
+                f"{self.counter('retries_total'):.0f} retries, "
+                f"rate limit wait {self.counter('rate_limit_wait_seconds_total'):.1f}s, "
+                f"{self.counter('rows_normalized_total'):.0f} rows normalized, "
+                f"Excel {self.counter('excel_write_seconds_total'):.1f}s, total {duration:.1f}s")
+
+
+class NullMetrics(RunMetrics):
+    """Выключенные метрики: те же методы, ничего не записывают."""
+
+    enabled = False
+
+    def __init__(self) -> None:
+        super().__init__("")
+
+    def add(self, name: str, value: float = 1, **labels: str) -> None:
+        pass
+
+    def observe_request(self, endpoint: str, status: str, seconds: float) -> None:
+        pass
+
+    def timed_request(self, endpoint: str, send: Callable[[], T]) -> T:
+        return send()
+
+    async def timed_request_async(self, endpoint: str, send: Callable[[], Awaitable[T]]) -> T:
+        return await send()
+
+    def timer(self, name: str, **labels: str) -> contextlib.AbstractContextManager:
+        return _NULL_TIMER
+
+    def finish(self, ok: bool) -> None:
+        pass
+
+
+_NULL_TIMER = contextlib.nullcontext()
+
+NULL_METRICS = NullMetrics()
+
+
+def _rounded(value: float) -> float:
+    return round(value, 3) if isinstance(value, float) else value
+
+
+def finish_run(metrics: RunMetrics, ok: bool, store: Optional["MetricsStore"] = None) -> None:
+    """Close the run's metrics: log the summary and keep it in the store (a store failure is only logged)."""
+    if not metrics.enabled:
+        return
+
+    metrics.finish(ok)
+    logging.info(f"{metrics.bank} export metrics: {metrics.describe()}", extra={"metrics": metrics.summary()})
+
+    if store is not None:
+        try:
+            store.save(metrics.summary())
+        except Exception as e:
+            logging.warning(f"Metrics store write failed: {e}")
+
+
+def prometheus_text(runs: Iterable[RunMetrics]) -> str:
+    """Metrics of the runs in the Prometheus text exposition format (e.g. for the node_exporter textfile collector)."""
+    # семейство -> (тип, строки); у каждого семейства одна строка TYPE на все выгрузки
+    families: Dict[str, Tuple[str, List[str]]] = {}
+
+    def sample(family: str, kind: str, labels: Dict[str, str], value: float, suffix: str = "") -> None:
+        lines = families.setdefault(family, (kind, []))[1]
+        lines.append(f"{PROMETHEUS_PREFIX}{family}{suffix}{_prometheus_labels(labels)} {_prometheus_value(value)}")
+
+    for run in runs:
+        if not run.enabled:
+            continue
+        base = {"bank": run.bank, **run.labels}
+
+        with run._lock:
+            counters = dict(run.counters)
+            latency = dict(run.latency)
+
+        for (name, labels), value in sorted(counters.items()):
+            sample(name, "counter", {**base, **dict(labels)}, value)
+
+        for endpoint, histogram in sorted(latency.items()):
+            labels = {**base, "endpoint": endpoint}
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), histogram.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                sample("request_duration_seconds", "histogram", {**labels, "le": le}, cumulative, "_bucket")
+            sample("request_duration_seconds", "histogram", labels, histogram.sum, "_sum")
+            sample("request_duration_seconds", "histogram", labels, histogram.count, "_count")
+
+        if run.duration is not None:
+            sample("run_duration_seconds", "gauge", base, run.duration)
+            sample("run_success", "gauge", base, 1 if run.ok else 0)
+        sample("run_start_time_seconds", "gauge", base, run.started_at)
+
+    text = []
+    for family, (kind, lines) in families.items():
+        text.append(f"# TYPE {PROMETHEUS_PREFIX}{family} {kind}")
+        text.extend(lines)
+    return "\n".join(text) + "\n" if text else ""
+
+
+def _prometheus_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+               for value in labels.values())
+    return "{" + ",".join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + "}"
+
+
+def _prometheus_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
@@ -1,149 +1,398 @@
-import time
+import itertools
+from collections import deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
 
 import requests
-from typing import Dict, Any, List, Optional
-import pandas as pd
+from typing import (
+    TYPE_CHECKING, Callable, Deque, Dict, Any, Iterable, Iterator, List, Optional, Sequence, Tuple, TypeVar, Union,
+)
 from openpyxl import Workbook
-from openpyxl.utils.dataframe import dataframe_to_rows
-from openpyxl.styles import Font, PatternFill, Alignment
-from datetime import datetime
+from datetime import date, datetime
 from pathlib import Path
 import logging
 
-from banks_api.api_logger import setup_api_logger
+from banks_api.api_logger import log_payload, setup_api_logger
+from banks_api.excel_writer import SUMMARY_ROW_STYLE, WIDTH_EXACT, WIDTH_MODES, ColumnWidths, SheetWriter
+from banks_api.field_mapping import Field, RecordExtractor, na_if_blank, na_if_none
+from banks_api.json_stream import stream_array, streaming_supported
+from banks_api.metrics import NULL_METRICS, RunMetrics, finish_run
+from banks_api.progress import (
+    ACCOUNT_DONE, ACCOUNTS_TOTAL, BYTES_DOWNLOADED, PAGE_FETCHED, ROWS_WRITTEN, ProgressReporter, ensure_progress,
+)
+from banks_api.rate_limiter import RateLimiter
+from banks_api.report_sinks import EXCEL_MAX_ROWS, SHARD_BY, check_format, make_sink, shard_key
+from banks_api.retry_policy import CircuitOpenError, RetryPolicy
+from banks_api.row_table import RowTable
+from banks_api.transport import HttpTransport
+from db.transaction_store import dedup_key
+
+if TYPE_CHECKING:
+    from db.metrics_store import MetricsStore
+    from db.response_cache import ResponseCache
+    from db.transaction_store import TransactionStore
+
+
+def _operation_fields(row: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value for key, value in row.items() if key not in STATEMENT_PAGE_FIELDS}
+
+
+def _is_placeholder(row: Dict[str, Any]) -> bool:
+    """Row of a page without operations (_gather_statements_rows), not an operation."""
+    return all(row.get(name) == "N/A" for name in STATEMENT_OPERATION_EXTRACTOR.names)
+
+
+T = TypeVar("T")
+
+
+def _prefetched(submit: Callable[[str], "Future[T]"], keys: Iterable[str], ahead: int) -> Iterator[T]:
+    """
+    Results of submit(key) (a started fetch) of each key in order, with at most `ahead` keys
+    fetched before the consumer asks for them.
+    """
+    keys = iter(keys)
+    pending: Deque[Future] = deque(submit(key) for key in itertools.islice(keys, ahead))
+    try:
+        while pending:
+            result = pending.popleft().result()
+            pending.extend(submit(key) for key in itertools.islice(keys, 1))
+            yield result
+    finally:
+        # потребитель остановился (ошибка записи, отмена) — ещё не начатые загрузки не нужны
+        for future in pending:
+            future.cancel()
 
 
 def _normalize_value(v: Any) -> Any:
     """Replace None/empty string with N/A, keep numbers as-is."""
-    if v is None:
-        return "N/A"
-    if isinstance(v, str) and v.strip() == "":
-        return "N/A"
-    return v
+    return na_if_blank(v)
+
+
+# Фиксированный порядок колонок листов (нужен потоковой записи, где нет DataFrame)
+ACCOUNT_COLUMNS = [
+    "accountNo", "iban", "customerNo", "currency", "availableBalance", "blockedAmount", "currentBalance",
+    "todayOpeningBalance", "todayIncome", "todayOutcome", "accountOpenDate", "accountStatus", "branchCode",
+    "branchName", "bankCode", "accountCategory", "hasPos", "hasCard", "hasCredit", "tin", "creditIsAllowed",
+    "debitIsAllowed", "accountType",
+]
+
+STATEMENT_COLUMNS = [
+    "accountNo",
+    "operationDate", "transactionDate", "transactionNo", "transactionType",
+    "transactionDescription",
+    "amountInTransactionCurrency", "transactionCurrency",
+    "amountInAccountCurrency", "amountInTransactionCurrencyAzn", "transactionFXRate",
+    "openingBalance_op", "closingBalance_op", "openingBalance", "closingBalance",
+    "availableOpeningBalance", "availableClosingBalance",
+    "counterPartyName", "counterPartyId", "counterPartyTin",
+    "cardNo", "sourceSystem", "message", "page_current", "page_total",
+    # not in the preferred order, kept in the order _gather_statements_rows produces them
+    "openingAvlBalance", "closingAvlBalance", "afterOperationBalance", "afterOperationAvlBalance",
+    "counterPartyPin",
+]
+
+POS_COLUMNS = [
+    "rowType", "accountNo", "terminalId", "terminalAddress",
+    "opening_amountToReceive", "opening_transactionAmount", "opening_transactionCurrency",
+    "opening_cashBack", "opening_transactionFee",
+    "closing_amountToReceive", "closing_transactionAmount", "closing_transactionCurrency",
+    "closing_cashBack", "closing_transactionFee",
+    "postingDate", "transactionDate", "transactionTime", "cardName", "cardNumber", "cardType",
+    "approvalCode", "description", "processingType", "referenceNumber", "taksitCount",
+    "balance_amountToReceive", "balance_cashBack", "balance_transactionAmount",
+    "balance_transactionCurrency", "balance_transactionFee",
+]
+
+# колонки ключа при делении листов по счёту / месяцу (shard_by); сводки POS без даты идут с операциями
+SHARD_ACCOUNT_COLUMNS = ("accountNo",)
+STATEMENT_DATE_COLUMNS = ("operationDate", "transactionDate")
+POS_DATE_COLUMNS = ("transactionDate", "postingDate")
+
+
+# Схемы строк выписки и POS: колонка, путь в ответе API, нормализация
+STATEMENT_PAGE_EXTRACTOR = RecordExtractor([
+    Field("openingBalance", "openingBalance", default=0),
+    Field("closingBalance", "closingBalance", default=0),
+    Field("availableOpeningBalance", "availableOpeningBalance", default=0),
+    Field("availableClosingBalance", "availableClosingBalance", default=0),
+    Field("message", "message", na_if_blank),
+    Field("page_current", "pagination.currentPage", na_if_none),
+    Field("page_total", "pagination.totalPages", na_if_none),
+])
+
+# поля страницы относятся к окну, в котором строка загружена (балансы его начала и конца, номер страницы),
+# а не к операции: в локальное хранилище они не сохраняются
+STATEMENT_PAGE_FIELDS = frozenset(STATEMENT_PAGE_EXTRACTOR.names)
+
+STATEMENT_OPERATION_EXTRACTOR = RecordExtractor([
+    Field("operationDate", "operationDate", na_if_blank),
+    Field("transactionDate", "transactionDate", na_if_blank),
+    Field("transactionNo", "transactionNo", na_if_blank),
+    Field("transactionType", "transactionType", na_if_blank),
+    Field("transactionDescription", "transactionDescription", na_if_blank),
+    Field("transactionCurrency", "transactionCurrency", na_if_blank),
+    Field("amountInTransactionCurrency", "amountInTransactionCurrency", na_if_none),
+    Field("amountInAccountCurrency", "amountInAccountCurrency", na_if_none),
+    Field("amountInTransactionCurrencyAzn", "amountInTransactionCurrencyAzn", na_if_none),
+    Field("transactionFXRate", "transactionFXRate", na_if_none),
+    Field("openingBalance_op", "openingBalance", na_if_none),
+    Field("closingBalance_op", "closingBalance", na_if_none),
+    Field("openingAvlBalance", "openingAvlBalance", na_if_none),
+    Field("closingAvlBalance", "closingAvlBalance", na_if_none),
+    Field("afterOperationBalance", "afterOperationBalance", na_if_none),
+    Field("afterOperationAvlBalance", "afterOperationAvlBalance", na_if_none),
+    Field("counterPartyName", "counterPartyName", na_if_blank),
+    Field("counterPartyId", "counterPartyId", na_if_blank),
+    Field("counterPartyTin", "counterPartyTin", na_if_blank),
+    Field("counterPartyPin", "counterPartyPin", na_if_blank),
+    Field("cardNo", "cardNo", na_if_blank),
+    Field("sourceSystem", "sourceSystem", na_if_blank),
+])
+
+POS_SUMMARY_EXTRACTOR = RecordExtractor([
+    Field("terminalId", "terminalInfo.id", na_if_blank),
+    Field("terminalAddress", "terminalInfo.address", na_if_blank),
+    *(Field(f"{side}_{name}", f"{side}Balance.{name}", na_if_blank)
+      for side in ("opening", "closing")
+      for name in ("amountToReceive", "transactionAmount", "transactionCurrency", "cashBack", "transactionFee")),
+])
+
+POS_OPERATION_EXTRACTOR = RecordExtractor([
+    *(Field(name, name, na_if_blank)
+      for name in ("postingDate", "transactionDate", "transactionTime", "cardName", "cardNumber", "cardType",
+                   "approvalCode", "description", "processingType", "referenceNumber", "taksitCount")),
+    *(Field(f"balance_{name}", f"balance.{name}", na_if_blank)
+      for name in ("amountToReceive", "cashBack", "transactionAmount", "transactionCurrency", "transactionFee")),
+])
+
+
+def _as_table(rows: Union[RowTable, Iterable[Dict[str, Any]]], schema: Sequence[str]) -> RowTable:
+    return rows if isinstance(rows, RowTable) else RowTable.from_records(rows, schema)
+
+
+def _is_pos_summary(values: Sequence[Any]) -> bool:
+    """POS row values: Summary rows are highlighted light grey, Operation rows left white."""
+    return str(values[0]).lower().startswith("summary")
+
+
+def _is_empty_period(statements_obj: Dict[str, Any]) -> bool:
+    message = statements_obj.get("message") or ""
+    return "there is no operations for the period" in message.lower()
+
+
+class StatementsPagination:
+    """Состояние постраничной выгрузки выписки одного аккаунта (вместо счётчиков на экземпляре клиента)"""
+
+    def __init__(self, account_id: str, date_from: str, date_to: str) -> None:
+        self.account_id = account_id
+        self.date_from = date_from
+        self.date_to = date_to
+        self.total_pages = 0
+        self.pages: Dict[int, Dict[str, Any]] = {}
+
+    def add_page(self, page_number: int, statements_obj: Dict[str, Any]) -> None:
+        self.pages[page_number] = statements_obj
+        if page_number == 1:
+            self.total_pages = statements_obj.get("pagination", {}).get("totalPages") or 0
+
+    def remaining_pages(self) -> range:
+        """Pages still to fetch once the first page told us totalPages."""
+        if _is_empty_period(self.pages.get(1, {})):
+            return range(0)
+        return range(2, self.total_pages + 1)
+
+    def ordered_pages(self) -> List[Dict[str, Any]]:
+        return [self.pages[number] for number in sorted(self.pages)]
+
+    @property
+    def complete(self) -> bool:
+        """False when a page came back empty (_make_request returns {} on failure)."""
+        return all(page.get("pagination") or _is_empty_period(page) for page in self.pages.values())
 
 
 class PashaBankAPI:
     """Клиент для работы с API Pasha Bank и сохранения отчёта в Excel (Accounts, Statements, POS Operations)"""
 
-    def __init__(self, excel_path: Path) -> None:
+    def __init__(self, excel_path: Path, max_workers: int = 4, page_workers: int = 4,
+                 streaming_export: bool = False,
+                 cache: Optional["ResponseCache"] = None, store: Optional["TransactionStore"] = None,
+                 transport: Optional[HttpTransport] = None, retry_policy: Optional[RetryPolicy] = None,
+                 rate_limiter: Optional[RateLimiter] = None, use_asyncio: bool = False,
+                 streaming_json: bool = False, metrics_store: Optional["MetricsStore"] = None,
+                 report_format: str = "xlsx", sheet_rows: Optional[int] = None,
+                 shard_by: Optional[str] = None, column_widths: str = WIDTH_EXACT) -> None:
 
         self.excel_path = excel_path
+        # локальное хранилище операций для инкрементальной синхронизации (process_data(sync=True))
+        self.store = store
+        # кэш списка аккаунтов между выгрузками (None — всегда запрашивать API)
+        self.cache = cache
+        # итоги выгрузок (задержки, объёмы, время записи) для анализа трендов; None — метрики не собираются
+        self.metrics_store = metrics_store
+        # write_only книга: строки не держатся в памяти целиком
+        self.streaming_export = streaming_export
+        # формат отчёта по умолчанию (banks_api.report_sinks.SINKS); не-xlsx форматы всегда пишутся потоком
+        self.report_format = report_format
+        check_format(report_format)
+        # строк данных на листе Excel (None — предел Excel); длинные листы продолжаются на Statements_2, ...
+        self.sheet_rows = sheet_rows
+        # "account" / "month": выписки и POS на отдельных листах по счёту или месяцу, с листом Index
+        if shard_by is not None and shard_by not in SHARD_BY:
+            raise ValueError(f"Unknown shard mode: {shard_by} (expected one of {', '.join(SHARD_BY)})")
+        self.shard_by = shard_by
+        # ширины колонок save_report: exact — по всем значениям, approximate — по выборке строк
+        # (потоковая запись всегда считает по первым строкам листа)
+        if column_widths not in WIDTH_MODES:
+            raise ValueError(f"Unknown column width mode: {column_widths} (expected one of {', '.join(WIDTH_MODES)})")
+        self.column_widths = column_widths
+        # операции страницы выписки разбираются из сокета по одной (нужен ijson)
+        self.streaming_json = streaming_supported(streaming_json)
         self.config_jwt = ""
         self.config_key = ""
 
-        self.page_max_count = 0
-        self.current_page = 0
+        # сколько аккаунтов обрабатывается одновременно
+        self.max_workers = max(1, max_workers)
+        # сколько страниц выписки запрашивается одновременно (общий пул на все аккаунты)
+        self.page_workers = max(1, page_workers)
+        # лимиты запросов по эндпоинтам (общие для всех потоков; настраиваются в db/bank.db)
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.retry_policy = retry_policy or RetryPolicy()
+        # выгрузка через asyncio (banks_api.async_fetch, нужен aiohttp) вместо пулов потоков
+        self.use_asyncio = use_asyncio
 
         self.base_url = "https://openapi.pashabank.digital"
         self.accounts_list_path = "/api/v1/accounts"
         self.pos_operations = "/api/v1/accounts/{accountId}/statements/pos"
         self.stmt_path = "/api/v1/accounts/{accountId}/current/paginated"
 
-        self.session = requests.Session()
+        # пул соединений (keep-alive, таймауты) может быть общим с другими клиентами
+        self.transport = transport or HttpTransport()
+        self.session = self.transport.session()
         self._setup_session()
 
 
-    def save_report(self, accounts_table: List[Dict[str, Any]],
-                    statements_rows: List[Dict[str, Any]],
-                    pos_rows: List[Dict[str, Any]],
-                    filename="report.xlsx"):
+    def save_report(self, accounts_table: Union[RowTable, List[Dict[str, Any]]],
+                    statements_rows: Union[RowTable, List[Dict[str, Any]]],
+                    pos_rows: Union[RowTable, List[Dict[str, Any]]],
+                    filename="report.xlsx", output_dir: Optional[Path] = None,
+                    metrics: RunMetrics = NULL_METRICS):
+        accounts = _as_table(accounts_table, ACCOUNT_COLUMNS)
+        statements = _as_table(statements_rows, STATEMENT_COLUMNS)
+        pos = _as_table(pos_rows, POS_COLUMNS)
+
         wb = Workbook()
 
-        # Accounts sheet
+        # Accounts sheet (ширины колонок считаются по ходу записи, см. ColumnWidths)
         ws_acc = wb.active
         ws_acc.title = "Accounts"
-        if accounts_table:
-            df_accounts = pd.DataFrame(accounts_table)
-            for r in dataframe_to_rows(df_accounts, index=False, header=True):
-                ws_acc.append(r)
-            for cell in ws_acc[1]:
-                cell.font = Font(bold=True)
-                cell.fill = PatternFill(start_color="BDD7EE", end_color="BDD7EE", fill_type="solid")
-                cell.alignment = Alignment(horizontal="center")
-            ws_acc.auto_filter.ref = ws_acc.dimensions
-        else:
-            ws_acc["A1"] = "No accounts found"
-
-        # Statements sheet
+        acc_writer = SheetWriter(ws_acc, ColumnWidths(self.column_widths, max_width=60))
+        with metrics.timer("excel_write_seconds_total", sheet="Accounts"):
+            if len(accounts):
+                self._write_table(acc_writer, accounts, "BDD7EE")
+            else:
+                acc_writer.append(["No accounts found"])
+
+        # Statements sheet (колонки в порядке STATEMENT_COLUMNS)
         ws_stmt = wb.create_sheet("Statements")
-        if statements_rows:
-            df_stmt = pd.DataFrame(statements_rows)
-            preferred_order = [
-                "accountNo",
-                "operationDate", "transactionDate", "transactionNo", "transactionType",
-                "transactionDescription",
-                "amountInTransactionCurrency", "transactionCurrency",
-                "amountInAccountCurrency", "amountInTransactionCurrencyAzn", "transactionFXRate",
-                "openingBalance_op", "closingBalance_op", "openingBalance", "closingBalance",
-                "availableOpeningBalance", "availableClosingBalance",
-                "counterPartyName", "counterPartyId", "counterPartyTin",
-                "cardNo", "sourceSystem", "message", "page_current", "page_total"
-            ]
-            cols = [c for c in preferred_order if c in df_stmt.columns] + [c for c in df_stmt.columns if
-                                                                           c not in preferred_order]
-            df_stmt = df_stmt[cols]
-            for r in dataframe_to_rows(df_stmt, index=False, header=True):
-                ws_stmt.append(r)
-            for cell in ws_stmt[1]:
-                cell.font = Font(bold=True)
-                cell.fill = PatternFill(start_color="FCD5B4", end_color="FCD5B4", fill_type="solid")
-                cell.alignment = Alignment(horizontal="center")
-            ws_stmt.auto_filter.ref = ws_stmt.dimensions
-        else:
-            ws_stmt["A1"] = "No statements found"
+        stmt_writer = SheetWriter(ws_stmt, ColumnWidths(self.column_widths, max_width=60))
+        with metrics.timer("excel_write_seconds_total", sheet="Statements"):
+            if len(statements):
+                self._write_table(stmt_writer, statements, "FCD5B4")
+            else:
+                stmt_writer.append(["No statements found"])
 
         # POS sheet (hybrid B1: summary row then operation rows)
         ws_pos = wb.create_sheet("POS Operations")
-        if pos_rows:
-            df_pos = pd.DataFrame(pos_rows)
-            # prefer 'rowType' first
-            cols = ["rowType"] + [c for c in df_pos.columns if c != "rowType"]
-            df_pos = df_pos[cols]
-            for r in dataframe_to_rows(df_pos, index=False, header=True):
-                ws_pos.append(r)
-            # style header
-            for cell in ws_pos[1]:
-                cell.font = Font(bold=True)
-                cell.fill = PatternFill(start_color="C6E0B4", end_color="C6E0B4", fill_type="solid")
-                cell.alignment = Alignment(horizontal="center")
-            ws_pos.auto_filter.ref = ws_pos.dimensions
-            # color rows: Summary rows light grey, Operation rows white
-            for i, row in enumerate(ws_pos.iter_rows(min_row=2, max_row=ws_pos.max_row), start=2):
-                row_type_cell = ws_pos.cell(row=i, column=1)  # rowType in col A
-                if str(row_type_cell.value).lower().startswith("summary"):
-                    fill = PatternFill(start_color="EEECE1", end_color="EEECE1", fill_type="solid")
-                    for cell in row:
-                        cell.fill = fill
-                # operations left as default
-        else:
-            ws_pos["A1"] = "No POS operations found"
+        pos_writer = SheetWriter(ws_pos, ColumnWidths(self.column_widths, max_width=60))
+        with metrics.timer("excel_write_seconds_total", sheet="POS Operations"):
+            if len(pos):
+                cols = self._write_table(pos_writer, pos, "C6E0B4")
+                # color rows: Summary rows light grey, Operation rows white
+                width = len(cols)
+                for i, row_type in enumerate(pos.column("rowType"), start=2):
+                    if str(row_type).lower().startswith("summary"):
+                        pos_writer.style_row(i, SUMMARY_ROW_STYLE, width)
+                    # operations left as default
+            else:
+                pos_writer.append(["No POS operations found"])
 
         # auto column width
-        for sheet in [ws_acc, ws_stmt, ws_pos]:
-            for col in sheet.columns:
-                max_len = 0
-                try:
-                    col_letter = col[0].column_letter
-                except Exception:
-                    continue
-                for cell in col:
-                    try:
-                        val = "" if cell.value is None else str(cell.value)
-                        if len(val) > max_len:
-                            max_len = len(val)
-                    except Exception:
-                        pass
-                sheet.column_dimensions[col_letter].width = min(max_len + 2, 60)
+        for writer in [acc_writer, stmt_writer, pos_writer]:
+            with metrics.timer("excel_write_seconds_total", sheet=writer.ws.title):
+                writer.autosize()
+
+        final_filename = self._final_filename(filename, output_dir)
+
+        with metrics.timer("excel_write_seconds_total", sheet="(save)"):
+            wb.save(final_filename)
+        logging.log(msg=f"✅ Excel saved as: {final_filename}", level=logging.INFO)
+        return final_filename
+
+    @staticmethod
+    def _write_table(writer: SheetWriter, table: RowTable, header_color: str) -> List[str]:
+        columns = writer.append_table(table, header_color)
+        writer.set_auto_filter()
+        return columns
+
+    def save_report_streaming(self, accounts_table: Iterable[Dict[str, Any]],
+                              statements_rows: Iterable[Dict[str, Any]],
+                              pos_rows: Iterable[Dict[str, Any]],
+                              filename="report.xlsx", output_dir: Optional[Path] = None,
+                              metrics: RunMetrics = NULL_METRICS):
+        """
+        Same sheets as save_report, but rows are consumed from iterables straight into a
+        write_only workbook, so the whole sheet never sits in memory.
+        """
+        return self.save_report_to("xlsx", accounts_table, statements_rows, pos_rows, filename, output_dir, metrics)
+
+    def save_report_to(self, report_format: str, accounts_table: Iterable[Dict[str, Any]],
+                       statements_rows: Iterable[Dict[str, Any]],
+                       pos_rows: Iterable[Dict[str, Any]],
+                       filename="report.xlsx", output_dir: Optional[Path] = None,
+                       metrics: RunMetrics = NULL_METRICS) -> str:
+        """
+        Stream the three tables into a report sink (banks_api.report_sinks: xlsx, csv, parquet, sqlite).
+
+        filename's extension is replaced by the format's own; returns the report path. In xlsx,
+        tables over sheet_rows rows or split by shard_by continue on numbered sheets.
+        """
+        tables = [
+            ("Accounts", ACCOUNT_COLUMNS, accounts_table, "BDD7EE", "No accounts found", None),
+            ("Statements", STATEMENT_COLUMNS, statements_rows, "FCD5B4", "No statements found",
+             shard_key(self.shard_by, STATEMENT_COLUMNS, SHARD_ACCOUNT_COLUMNS, STATEMENT_DATE_COLUMNS)),
+            ("POS Operations", POS_COLUMNS, pos_rows, "C6E0B4", "No POS operations found",
+             shard_key(self.shard_by, POS_COLUMNS, SHARD_ACCOUNT_COLUMNS, POS_DATE_COLUMNS)),
+        ]
+
+        sink = make_sink(report_format, str(Path(self._final_filename(filename, output_dir)).with_suffix("")),
+                         sheet_rows=self.sheet_rows)
+        try:
+            for name, columns, rows, header_color, empty_message, key in tables:
+                # время таблицы включает и получение строк из итераторов
+                with metrics.timer("excel_write_seconds_total", sheet=name):
+                    sink.write_table(name, columns, ([row.get(c) for c in columns] for row in rows),
+                                     header_color=header_color,
+                                     highlight=_is_pos_summary if columns is POS_COLUMNS else None,
+                                     empty_message=empty_message, shard_key=key)
+        except BaseException:
+            # строки могут идти прямо из загрузки: отменённая или упавшая выгрузка не оставляет неполный отчёт
+            sink.discard()
+            raise
+
+        with metrics.timer("excel_write_seconds_total", sheet="(save)"):
+            final_filename = sink.close()
+
+        logging.log(msg=f"✅ Report saved as: {final_filename}", level=logging.INFO)
+        return final_filename
 
+    def _final_filename(self, filename: str, output_dir: Optional[Path] = None) -> str:
         date_suffix = datetime.now().strftime("%Y-%m-%d_%H-%M")
         final_filename = f"{date_suffix}_{filename}"
 
-        if self.excel_path:
-            final_filename = str(self.excel_path.joinpath(final_filename))
+        excel_path = output_dir or self.excel_path
+        if excel_path:
+            final_filename = str(Path(excel_path).joinpath(final_filename))
             logging.log(msg="Final path: " + final_filename, level=logging.INFO)
 
-        wb.save(final_filename)
-        logging.log(msg=f"✅ Excel saved as: {final_filename}", level=logging.INFO)
         return final_filename
 
     def _setup_session(self):
@@ -159,185 +408,107 @@ class PashaBankAPI:
         self.session.headers["Content-Type"] = "application/json"
 
     def _gather_statements_rows(self, account_id: str, statements_obj: Dict[str, Any]) -> List[Dict[str, Any]]:
-        ops = statements_obj.get("operations", []) or []
-        rows = []
+        # поля страницы (балансы, пагинация) считаются один раз и копируются в каждую операцию
+        page = STATEMENT_PAGE_EXTRACTOR(statements_obj, {"accountNo": account_id})
 
-        #set max page count
-
-        summary = {
-            "accountNo": account_id,
-            "openingBalance": statements_obj.get("openingBalance", 0),
-            "closingBalance": statements_obj.get("closingBalance", 0),
-            "availableOpeningBalance": statements_obj.get("availableOpeningBalance", 0),
-            "availableClosingBalance": statements_obj.get("availableClosingBalance", 0),
-            "message": _normalize_value(statements_obj.get("message", "")),
-            "page_current": statements_obj.get("pagination", {}).get("currentPage"),
-            "page_total": statements_obj.get("pagination", {}).get("totalPages"),
-        }
+        # потоковый разбор: поля операций уже извлечены, остаётся добавить поля страницы
+        operation_rows = statements_obj.get("operation_rows")
+        if operation_rows:
+            return [{**page, **row} for row in operation_rows]
 
+        ops = statements_obj.get("operations", []) or []
         if not ops:
-            r = {**summary}
-            op_fields = [
-                "operationDate", "transactionDate", "transactionNo", "transactionType",
-                "transactionDescription", "transactionCurrency", "amountInTransactionCurrency",
-                "amountInAccountCurrency", "amountInTransactionCurrencyAzn", "transactionFXRate",
-                "openingBalance_op", "closingBalance_op", "openingAvlBalance", "closingAvlBalance",
-                "afterOperationBalance", "afterOperationAvlBalance",
-                "counterPartyName", "counterPartyId", "counterPartyTin", "counterPartyPin",
-                "cardNo", "sourceSystem"
-            ]
-            for f in op_fields:
-                r[f] = "N/A"
-            # normalize numeric page values
-            r["page_current"] = r.get("page_current") if r.get("page_current") is not None else "N/A"
-            r["page_total"] = r.get("page_total") if r.get("page_total") is not None else "N/A"
-            rows.append(r)
-            return rows
-
-        for op in ops:
-            r = {
-                "accountNo": account_id,
-                "openingBalance": statements_obj.get("openingBalance", 0),
-                "closingBalance": statements_obj.get("closingBalance", 0),
-                "availableOpeningBalance": statements_obj.get("availableOpeningBalance", 0),
-                "availableClosingBalance": statements_obj.get("availableClosingBalance", 0),
-                "message": _normalize_value(statements_obj.get("message", "")),
-                "page_current": statements_obj.get("pagination", {}).get("currentPage"),
-                "page_total": statements_obj.get("pagination", {}).get("totalPages"),
-                # operation fields
-                "operationDate": _normalize_value(op.get("operationDate")),
-                "transactionDate": _normalize_value(op.get("transactionDate")),
-                "transactionNo": _normalize_value(op.get("transactionNo")),
-                "transactionType": _normalize_value(op.get("transactionType")),
-                "transactionDescription": _normalize_value(op.get("transactionDescription")),
-                "transactionCurrency": _normalize_value(op.get("transactionCurrency")),
-                "amountInTransactionCurrency": op.get("amountInTransactionCurrency") if op.get(
-                    "amountInTransactionCurrency") is not None else "N/A",
-                "amountInAccountCurrency": op.get("amountInAccountCurrency") if op.get(
-                    "amountInAccountCurrency") is not None else "N/A",
-                "amountInTransactionCurrencyAzn": op.get("amountInTransactionCurrencyAzn") if op.get(
-                    "amountInTransactionCurrencyAzn") is not None else "N/A",
-                "transactionFXRate": op.get("transactionFXRate") if op.get("transactionFXRate") is not None else "N/A",
-                "openingBalance_op": op.get("openingBalance") if op.get("openingBalance") is not None else "N/A",
-                "closingBalance_op": op.get("closingBalance") if op.get("closingBalance") is not None else "N/A",
-                "openingAvlBalance": op.get("openingAvlBalance") if op.get("openingAvlBalance") is not None else "N/A",
-                "closingAvlBalance": op.get("closingAvlBalance") if op.get("closingAvlBalance") is not None else "N/A",
-                "afterOperationBalance": op.get("afterOperationBalance") if op.get(
-                    "afterOperationBalance") is not None else "N/A",
-                "afterOperationAvlBalance": op.get("afterOperationAvlBalance") if op.get(
-                    "afterOperationAvlBalance") is not None else "N/A",
-                "counterPartyName": _normalize_value(op.get("counterPartyName")),
-                "counterPartyId": _normalize_value(op.get("counterPartyId")),
-                "counterPartyTin": _normalize_value(op.get("counterPartyTin")),
-                "counterPartyPin": _normalize_value(op.get("counterPartyPin")),
-                "cardNo": _normalize_value(op.get("cardNo")),
-                "sourceSystem": _normalize_value(op.get("sourceSystem"))
-            }
-            # normalize page numbers
-            r["page_current"] = r.get("page_current") if r.get("page_current") is not None else "N/A"
-            r["page_total"] = r.get("page_total") if r.get("page_total") is not None else "N/A"
-            rows.append(r)
-        return rows
+            # страница без операций (или не загрузилась): одна строка-заглушка с полями страницы
+            return [{**page, **dict.fromkeys(STATEMENT_OPERATION_EXTRACTOR.names, "N/A")}]
+
+        return STATEMENT_OPERATION_EXTRACTOR.many(ops, page)
 
     def _gather_pos_rows(self, account_id: str, pos_blocks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
         Build hybrid (B1) rows for POS sheet.
         For each posStatement block produce a 'Summary' row, then its operations as 'Operation' rows.
         """
+        account_no = _normalize_value(account_id)
         rows: List[Dict[str, Any]] = []
         for block in pos_blocks:
-            # summary info (opening/closing balances are objects)
-            opening = block.get("openingBalance", {}) or {}
-            closing = block.get("closingBalance", {}) or {}
-            terminal = block.get("terminalInfo", {}) or {}
-
-            summary_row = {
-                "rowType": "Summary",
-                "accountNo": account_id,
-                "terminalId": _normalize_value(terminal.get("id")),
-                "terminalAddress": _normalize_value(terminal.get("address")),
-                "opening_amountToReceive": opening.get("amountToReceive", "N/A"),
-                "opening_transactionAmount": opening.get("transactionAmount", "N/A"),
-                "opening_transactionCurrency": _normalize_value(opening.get("transactionCurrency")),
-                "opening_cashBack": opening.get("cashBack", "N/A"),
-                "opening_transactionFee": opening.get("transactionFee", "N/A"),
-                "closing_amountToReceive": closing.get("amountToReceive", "N/A"),
-                "closing_transactionAmount": closing.get("transactionAmount", "N/A"),
-                "closing_transactionCurrency": _normalize_value(closing.get("transactionCurrency")),
-                "closing_cashBack": closing.get("cashBack", "N/A"),
-                "closing_transactionFee": closing.get("transactionFee", "N/A"),
-            }
-            # normalize string empties / None
-            summary_row = {k: _normalize_value(v) for k, v in summary_row.items()}
+            summary_row = POS_SUMMARY_EXTRACTOR(block, {"rowType": "Summary", "accountNo": account_no})
             rows.append(summary_row)
 
-            # operations list
-            ops = block.get("posOperationEntityList", []) or []
-            for op in ops:
-                balance = op.get("balance", {}) or {}
-                op_row = {
-                    "rowType": "Operation",
-                    "accountNo": account_id,
-                    "terminalId": _normalize_value(terminal.get("id")),
-                    "postingDate": _normalize_value(op.get("postingDate")),
-                    "transactionDate": _normalize_value(op.get("transactionDate")),
-                    "transactionTime": _normalize_value(op.get("transactionTime")),
-                    "cardName": _normalize_value(op.get("cardName")),
-                    "cardNumber": _normalize_value(op.get("cardNumber")),
-                    "cardType": _normalize_value(op.get("cardType")),
-                    "approvalCode": _normalize_value(op.get("approvalCode")),
-                    "description": _normalize_value(op.get("description")),
-                    "processingType": _normalize_value(op.get("processingType")),
-                    "referenceNumber": _normalize_value(op.get("referenceNumber")),
-                    "taksitCount": _normalize_value(op.get("taksitCount")),
-                    # balance fields
-                    "balance_amountToReceive": balance.get("amountToReceive", "N/A"),
-                    "balance_cashBack": balance.get("cashBack", "N/A"),
-                    "balance_transactionAmount": balance.get("transactionAmount", "N/A"),
-                    "balance_transactionCurrency": _normalize_value(balance.get("transactionCurrency")),
-                    "balance_transactionFee": balance.get("transactionFee", "N/A"),
-                }
-                op_row = {k: _normalize_value(v) for k, v in op_row.items()}
-                rows.append(op_row)
+            operation_base = {"rowType": "Operation", "accountNo": account_no, "terminalId": summary_row["terminalId"]}
+            rows.extend(POS_OPERATION_EXTRACTOR.many(block.get("posOperationEntityList", []) or [], operation_base))
         return rows
 
-    def _make_request(self, url: str, method: str = "GET", params: Dict = None, retries: int = 3) -> Dict:
-
-        for retry in range(1, retries + 1):
-            try:
-                if method.upper() == "POST":
-                    resp = self.session.post(url, json=params, timeout=30)
-                else:
-                    resp = self.session.get(url, params=params, timeout=30)
-                resp.raise_for_status()
-                try:
-                    return resp.json()
-                except ValueError:
-                    logging.log(msg="⚠️ Response is not JSON", level=logging.INFO)
-                    return {}
-
-            except (requests.Timeout, requests.ConnectionError) as e:
-
-                if retry < retries:
-                    logging.warning(f"⏳ Timeout/Connection error (attempt {retry}/{retries}): {e}")
-                    time.sleep(2)
-                    continue
-                else:
-                    logging.error(f"❌ Failed after {retries} attempts: {url}")
-                    return {}
-
-            except requests.RequestException as e:
-                logging.log(msg=f"❌ Ошибка запроса: {e} -> {url}", level=logging.INFO)
-                return {}
-
-        return {}
+    def _send_request(self, url: str, method: str = "GET", params: Dict = None, retries: Optional[int] = None,
+                      progress: Optional[ProgressReporter] = None, endpoint: str = "*",
+                      stream: bool = False) -> Optional[requests.Response]:
+        """Successful response, or None after logging the failure."""
+        metrics = progress.metrics if progress is not None else NULL_METRICS
+
+        def request() -> requests.Response:
+            if method.upper() == "POST":
+                return self.session.post(url, json=params, stream=stream)
+            return self.session.get(url, params=params, stream=stream)
+
+        def send() -> requests.Response:
+            self.rate_limiter.acquire("pasha", endpoint, progress)
+            return metrics.timed_request(endpoint, request)
+
+        resp = None
+        try:
+            # повторы 429/5xx/таймаутов с паузой и Retry-After — в общей политике
+            resp = self.retry_policy.send(send, url, progress, max_attempts=retries)
+            resp.raise_for_status()
+        except CircuitOpenError as e:
+            logging.error(f"❌ {e} -> {url}")
+        except (requests.Timeout, requests.ConnectionError) as e:
+            logging.error(f"❌ Failed after retries: {e} -> {url}")
+        except requests.RequestException as e:
+            logging.log(msg=f"❌ Ошибка запроса: {e} -> {url}", level=logging.INFO)
+        else:
+            return resp
+
+        if resp is not None:
+            # непрочитанный потоковый ответ держит соединение пула
+            resp.close()
+        return None
+
+    def _make_request(self, url: str, method: str = "GET", params: Dict = None, retries: Optional[int] = None,
+                      progress: Optional[ProgressReporter] = None, endpoint: str = "*") -> Dict:
+        resp = self._send_request(url, method, params, retries, progress, endpoint)
+        if resp is None:
+            return {}
+
+        if progress is not None:
+            progress.emit(BYTES_DOWNLOADED, len(resp.content))
+        try:
+            return resp.json()
+        except ValueError:
+            logging.log(msg="⚠️ Response is not JSON", level=logging.INFO)
+            return {}
 
     # ---------- Accounts ----------
-    def _load_accounts(self) -> List[Dict[str, Any]]:
+    def _load_accounts(self, force_refresh: bool = False,
+                       progress: Optional[ProgressReporter] = None) -> List[Dict[str, Any]]:
+        if self.cache is None:
+            return self._fetch_accounts(progress)
+
+        return self.cache.get_or_fetch(
+            "pasha",
+            self.cache.fingerprint(self.config_jwt, self.config_key),
+            self.accounts_list_path,
+            lambda: self._fetch_accounts(progress),
+            force_refresh=force_refresh,
+        )
+
+    def _fetch_accounts(self, progress: Optional[ProgressReporter] = None) -> List[Dict[str, Any]]:
         base_url = self.base_url
         accounts_path = self.accounts_list_path
         url = f"{base_url}{accounts_path}"
-        response = self._make_request(url, "GET", {"accountType": "CURRENT"})
+        return self._accounts_list(self._make_request(url, "GET", {"accountType": "CURRENT"}, progress=progress,
+                                                      endpoint="accounts"))
+
+    @staticmethod
+    def _accounts_list(response: Any) -> List[Dict[str, Any]]:
         if isinstance(response, dict):
             if "accounts" in response and isinstance(response["accounts"], list):
 
@@ -352,29 +523,69 @@ class PashaBankAPI:
             return []
 
     # ---------- Statements ----------
-    def get_current_statements(self, account_id: str, date_from:str, date_to:str) -> Dict[str, Any]:
+    def get_current_statements(self, account_id: str, date_from: str, date_to: str,
+                               page_number: int = 1, progress: Optional[ProgressReporter] = None) -> Dict[str, Any]:
+        progress = ensure_progress(progress)
+        progress.check_cancelled()
+
         base_url = self.base_url
         path = self.stmt_path
         path = path.replace("{accountId}", account_id)
         url = f"{base_url}{path}"
 
-        self.current_page += 1
-
         params = {
-            "pageNumber": self.current_page,
+            "pageNumber": page_number,
             "fromDate": date_from,
             "toDate": date_to
         }
 
-        resp = self._make_request(url, "POST", params) or {}
-        logging.log(msg=f"Current request: {resp}", level=logging.INFO)
-
-        if self.page_max_count == 0:
-            logging.log(msg="Resetting max page count ...", level=logging.INFO)
-            self.page_max_count = resp.get("paginationMetaData", {}).get("totalPages") or 0
+        if self.streaming_json:
+            statements_obj = self._stream_statements_page(url, params, progress)
+        else:
+            statements_obj = self._statements_page(
+                self._make_request(url, "POST", params, progress=progress, endpoint="statements") or {})
+        self._log_statements_page(account_id, page_number, statements_obj)
+        progress.emit(PAGE_FETCHED)
 
-        time.sleep(0.5)
+        return statements_obj
 
+    def _stream_statements_page(self, url: str, params: Dict[str, Any],
+                                progress: ProgressReporter) -> Dict[str, Any]:
+        """
+        Statements page parsed from the socket: each operation becomes its row fields as soon as
+        it is read (operation_rows), the raw operations and the response body are never kept.
+        """
+        resp = self._send_request(url, "POST", params, progress=progress, endpoint="statements", stream=True)
+        if resp is None:
+            return self._statements_page({})
+
+        operations = stream_array(resp, "operations")
+        try:
+            operation_rows = STATEMENT_OPERATION_EXTRACTOR.many(operations)
+        except ValueError:
+            logging.log(msg="⚠️ Response is not JSON", level=logging.INFO)
+            return self._statements_page({})
+        except requests.RequestException as e:
+            logging.error(f"❌ Response read failed: {e} -> {url}")
+            return self._statements_page({})
+        finally:
+            resp.close()
+
+        progress.emit(BYTES_DOWNLOADED, operations.bytes_read)
+        statements_obj = self._statements_page(operations.rest if isinstance(operations.rest, dict) else {})
+        statements_obj["operation_rows"] = operation_rows
+        return statements_obj
+
+    @staticmethod
+    def _log_statements_page(account_id: str, page_number: int, statements_obj: Dict[str, Any]) -> None:
+        # только сводка: ответ целиком в логе — это вторая копия страницы в памяти
+        operations = statements_obj.get("operation_rows") or statements_obj.get("operations") or []
+        logging.log(msg=f"Statements {account_id} page {page_number}: {len(operations)} operations, "
+                        f"message: {statements_obj.get('message') or '-'}", level=logging.INFO,
+                    extra={"account": account_id, "page": page_number, "operations": len(operations)})
+
+    @staticmethod
+    def _statements_page(resp: Dict[str, Any]) -> Dict[str, Any]:
         return {
             "operations": resp.get("operations", []),
             "openingBalance": resp.get("openingBalance", 0),
@@ -386,7 +597,8 @@ class PashaBankAPI:
         }
 
     # ---------- POS operations with cursor-based pagination ----------
-    def get_pos_operations(self, account_id: str) -> List[Dict[str, Any]]:
+    def get_pos_operations(self, account_id: str, progress: Optional[ProgressReporter] = None) -> List[Dict[str, Any]]:
+        progress = ensure_progress(progress)
         pos_operations_path = self.pos_operations
         pos_operations_path = pos_operations_path.replace("{accountId}", account_id)
 
@@ -397,24 +609,30 @@ class PashaBankAPI:
         fetch_all = True  # per earlier decision P2: fetch all pages
 
         while True:
+            progress.check_cancelled()
             params = {}
             if cursor:
                 params["cursorToken"] = cursor
             # GET request with optional cursorToken
-            resp = self._make_request(url, "GET", params) or {}
-            data = resp.get("data", {}) or {}
-            blocks = data.get("posStatementList", []) or []
+            resp = self._make_request(url, "GET", params, progress=progress, endpoint="pos") or {}
+            progress.emit(PAGE_FETCHED)
+            blocks, cursor = self._pos_page(resp)
             if blocks:
                 all_blocks.extend(blocks)
 
-            page_resp = resp.get("pageResponse", {}) or {}
-            cursor = page_resp.get("cursorToken")
             # break if no cursor or fetch_all disabled
             if not cursor or not fetch_all:
                 break
 
         return all_blocks
 
+    @staticmethod
+    def _pos_page(resp: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """POS blocks of one page and the cursor of the next one (None on the last page)."""
+        data = resp.get("data", {}) or {}
+        page_resp = resp.get("pageResponse", {}) or {}
+        return data.get("posStatementList", []) or [], page_resp.get("cursorToken")
+
     # ---------- Utilities & normalization ----------
 
     def _gather_accounts_table(self, accounts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
@@ -448,58 +666,326 @@ class PashaBankAPI:
             rows.append(row)
         return rows
 
-    def process_data(self, date_from:str, date_to:str, jwt: str, api_key: str):
+    def fetch_statements(self, acc_no: str, date_from: str, date_to: str,
+                         page_executor: Optional[Executor] = None,
+                         progress: Optional[ProgressReporter] = None) -> StatementsPagination:
+        """
+        Fetch page 1, then pages 2..totalPages at once through page_executor
+        (sequentially when no executor is given).
+        """
+        pagination = StatementsPagination(acc_no, date_from, date_to)
+        pagination.add_page(1, self.get_current_statements(acc_no, date_from, date_to, 1, progress))
+        logging.log(msg=f"Account {acc_no}: total pages {pagination.total_pages}", level=logging.INFO)
+
+        remaining = pagination.remaining_pages()
+        if page_executor is None:
+            pages = (self.get_current_statements(acc_no, date_from, date_to, number, progress)
+                     for number in remaining)
+        else:
+            pages = page_executor.map(
+                lambda number: self.get_current_statements(acc_no, date_from, date_to, number, progress),
+                remaining,
+            )
 
-        #Создать сессию перед запросами
-        self.config_jwt = jwt
-        self.config_key = api_key
+        for number, statements_obj in zip(remaining, pages):
+            pagination.add_page(number, statements_obj)
 
-        self._setup_session()
+        return pagination
 
-        logging.log(msg="Загрузка списка аккаунтов ...", level=logging.INFO)
-        accounts = self._load_accounts()
-        if not accounts:
-            logging.log(msg="Нет аккаунтов, прекращаю.", level=logging.INFO)
-            return False
+    def _statements_rows(self, acc_no: str, date_from: str, date_to: str,
+                         page_executor: Optional[Executor] = None,
+                         progress: Optional[ProgressReporter] = None) -> Tuple[List[Dict[str, Any]], bool]:
+        """Statement rows of one account and whether every page was fetched successfully."""
+        return self._pagination_rows(self.fetch_statements(acc_no, date_from, date_to, page_executor, progress))
 
-        logging.info(msg=f"Current accounts: {accounts}")
+    def _pagination_rows(self, pagination: StatementsPagination) -> Tuple[List[Dict[str, Any]], bool]:
+        statements_rows: List[Dict[str, Any]] = []
+        acc_no = pagination.account_id
 
-        accounts_table = self._gather_accounts_table(accounts=accounts)
+        for statements_obj in pagination.ordered_pages():
+            if _is_empty_period(statements_obj):
+                logging.log(msg="No statements found for this account.", level=logging.INFO)
+                continue
 
-        # collect statements and pos rows
-        all_statements_rows: List[Dict[str, Any]] = []
-        all_pos_rows: List[Dict[str, Any]] = []
+            statements_rows.extend(self._gather_statements_rows(account_id=acc_no, statements_obj=statements_obj))
 
-        for acc in accounts:
-            acc_no = acc.get("accountNo")
-            logging.log(msg="\n" + "=" * 40, level=logging.INFO)
-            logging.log(msg=f"Processing account: {acc_no}", level=logging.INFO)
-            logging.log(msg="=" * 40, level=logging.INFO)
-            logging.log(msg=f"Date range: {date_from} - {date_to}", level=logging.INFO)
-            logging.log(msg=f"Current page: {self.current_page} / {self.page_max_count}", level=logging.INFO)
+        return statements_rows, pagination.complete
 
+    def _sync_statements(self, acc_no: str, date_from: str, date_to: str,
+                         page_executor: Optional[Executor] = None,
+                         progress: Optional[ProgressReporter] = None) -> List[Dict[str, Any]]:
+        """
+        Fetch only the days after the account's sync watermark into the local store,
+        then read the whole requested range back from the store.
+        """
+        window = self._sync_window(acc_no, date_from, date_to)
+        _, _, fetch_from, fetch_to = window
+
+        rows, complete = self._statements_rows(acc_no, fetch_from.isoformat(), fetch_to.isoformat(),
+                                               page_executor, progress)
+        return self._store_synced(acc_no, window, rows, complete)
+
+    def _sync_window(self, acc_no: str, date_from: str, date_to: str) -> Tuple[date, date, date, date]:
+        """Requested days and the days still to fetch: (day_from, day_to, fetch_from, fetch_to)."""
+        day_from = datetime.strptime(date_from, "%Y-%m-%d").date()
+        day_to = datetime.strptime(date_to, "%Y-%m-%d").date()
+
+        fetch_from, fetch_to = self.store.sync_window("pasha", "statements", acc_no, day_from, day_to)
+        logging.log(msg=f"Account {acc_no}: syncing {fetch_from} - {fetch_to}", level=logging.INFO)
+        return day_from, day_to, fetch_from, fetch_to
+
+    def _store_synced(self, acc_no: str, window: Tuple[date, date, date, date],
+                      rows: List[Dict[str, Any]], complete: bool) -> List[Dict[str, Any]]:
+        """
+        Save the fetched operations, move the watermark if nothing failed, and read the requested days back.
+
+        Only operation fields are stored. The page fields (openingBalance, closingBalance,
+        availableOpening/ClosingBalance, message, page_current, page_total) in the sync report are
+        those of this fetch, [fetch_from, fetch_to]; rows loaded from earlier syncs have them N/A,
+        so the report never mixes balances of different sync windows.
+
+        Placeholder rows of pages without operations are not stored (they would stay as ghost
+        operations); the report gets them only when the requested days have no operations at all.
+        """
+        day_from, day_to, fetch_from, fetch_to = window
+        placeholders = [row for row in rows if _is_placeholder(row)]
+        operations = [_operation_fields(row) for row in rows if not _is_placeholder(row)]
+        self.store.save("pasha", "statements", acc_no, operations,
+                        date_fields=("operationDate", "transactionDate"), fallback_date=fetch_to)
+        if complete:
+            self.store.mark_synced("pasha", "statements", acc_no, fetch_from, fetch_to)
+        else:
+            logging.warning(f"Account {acc_no}: some pages failed, sync watermark not moved")
+
+        fetched_pages = {dedup_key(_operation_fields(row)): {f: row[f] for f in STATEMENT_PAGE_FIELDS if f in row}
+                         for row in rows if not _is_placeholder(row)}
+        no_page = dict.fromkeys(STATEMENT_PAGE_FIELDS, "N/A")
+
+        loaded = []
+        for record in self.store.load("pasha", "statements", acc_no, day_from, day_to):
+            # строки, сохранённые до этого изменения, ещё несут поля страницы своего окна (и бывают заглушками)
+            operation = _operation_fields(record)
+            if not _is_placeholder(operation):
+                loaded.append({**operation, **fetched_pages.get(dedup_key(operation), no_page)})
+        return loaded or placeholders
+
+    @staticmethod
+    def _log_account(acc_no: str, date_from: str, date_to: str) -> None:
+        logging.log(msg="\n" + "=" * 40, level=logging.INFO)
+        logging.log(msg=f"Processing account: {acc_no}", level=logging.INFO)
+        logging.log(msg="=" * 40, level=logging.INFO)
+        logging.log(msg=f"Date range: {date_from} - {date_to}", level=logging.INFO)
+
+    def _fetch_account(self, acc_no: str, date_from: str, date_to: str,
+                       page_executor: Optional[Executor] = None, sync: bool = False,
+                       progress: Optional[ProgressReporter] = None) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Fetch statements and POS rows of one account."""
+        progress = ensure_progress(progress)
+        statements_rows = self._fetch_account_statements(acc_no, date_from, date_to, page_executor, sync, progress)
+        pos_rows = self._fetch_account_pos(acc_no, progress)
+
+        self._count_rows(progress, statements_rows, pos_rows)
+        progress.emit(ACCOUNT_DONE)
+
+        return statements_rows, pos_rows
+
+    def _fetch_account_statements(self, acc_no: str, date_from: str, date_to: str, page_executor: Optional[Executor],
+                                  sync: bool, progress: ProgressReporter) -> List[Dict[str, Any]]:
+        progress.check_cancelled()
+        self._log_account(acc_no, date_from, date_to)
+
+        if sync and self.store is not None:
+            return self._sync_statements(acc_no, date_from, date_to, page_executor, progress)
+        statements_rows, _ = self._statements_rows(acc_no, date_from, date_to, page_executor, progress)
+        return statements_rows
+
+    def _fetch_account_pos(self, acc_no: str, progress: ProgressReporter) -> List[Dict[str, Any]]:
+        # POS blocks (with pagination)
+        return self._gather_pos_rows(acc_no, self.get_pos_operations(acc_no, progress))
+
+    @staticmethod
+    def _count_rows(progress: ProgressReporter, statements_rows: List[Dict[str, Any]],
+                    pos_rows: List[Dict[str, Any]]) -> None:
+        progress.metrics.add("rows_normalized_total", len(statements_rows), sheet="Statements")
+        progress.metrics.add("rows_normalized_total", len(pos_rows), sheet="POS Operations")
+
+    def _fetch_all(self, date_from: str, date_to: str, force_refresh: bool = False, sync: bool = False,
+                   progress: Optional[ProgressReporter] = None) -> Tuple[List[Dict[str, Any]], List[tuple]]:
+        """Accounts and (statement rows, POS rows) of each of them, in the accounts' order."""
+        progress = ensure_progress(progress)
+
+        accounts = self._accounts_to_fetch(lambda: self._load_accounts(force_refresh, progress), progress)
+        if not accounts:
+            return [], []
+
+        # аккаунты обрабатываются параллельно, map сохраняет исходный порядок аккаунтов;
+        # страницы выписок идут через отдельный пул, чтобы задачи аккаунтов не ждали сами себя
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor, \
+                ThreadPoolExecutor(max_workers=self.page_workers) as page_executor:
+            results = list(executor.map(
+                lambda acc: self._fetch_account(acc.get("accountNo"), date_from, date_to, page_executor, sync,
+                                                progress),
+                accounts,
+            ))
+
+        return accounts, results
+
+    @staticmethod
+    def _accounts_to_fetch(load: Callable[[], List[Dict[str, Any]]],
+                           progress: ProgressReporter) -> List[Dict[str, Any]]:
+        logging.log(msg="Загрузка списка аккаунтов ...", level=logging.INFO)
+        accounts = load()
+        if accounts:
+            log_payload("Current accounts", accounts)
+            progress.emit(ACCOUNTS_TOTAL, len(accounts))
+        return accounts
+
+    def _exceeds_sheet(self, results: List[Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]) -> bool:
+        """True when statements or POS rows don't fit one sheet (save_report can't split them)."""
+        budget = self.sheet_rows or EXCEL_MAX_ROWS - 1
+        statements = sum(len(stmt_rows) for stmt_rows, _ in results)
+        pos = sum(len(pos_rows) for _, pos_rows in results)
+        if max(statements, pos) <= budget:
+            return False
+        logging.log(msg=f"More than {budget} rows in a sheet, writing the report in sheets of {budget} rows",
+                    level=logging.INFO)
+        return True
+
+    def process_data(self, date_from:str, date_to:str, jwt: str, api_key: str, force_refresh: bool = False,
+                     sync: bool = False, progress: Optional[ProgressReporter] = None,
+                     output_dir: Optional[Path] = None, report_format: Optional[str] = None):
+        progress = ensure_progress(progress)
+        report_format = report_format or self.report_format
+        check_format(report_format)
+        progress.start_deadline(self.retry_policy.export_deadline)
+        if self.metrics_store is not None:
+            progress.start_metrics("pasha")
+
+        ok = False
+        try:
+            ok = self._export(date_from, date_to, jwt, api_key, force_refresh, sync, progress, output_dir,
+                              report_format)
+            return ok
+        finally:
+            finish_run(progress.metrics, ok, self.metrics_store)
+
+    def _export(self, date_from: str, date_to: str, jwt: str, api_key: str, force_refresh: bool, sync: bool,
+                progress: ProgressReporter, output_dir: Optional[Path], report_format: str) -> bool:
+        #Создать сессию перед запросами
+        self.config_jwt = jwt
+        self.config_key = api_key
 
-            # Statements
-            while self.current_page < self.page_max_count:
-                statements_obj = self.get_current_statements(acc_no, date_from, date_to)
+        self._setup_session()
 
-                if (statements_obj.get("message") is not None and
-                        "there is no operations for the period" in statements_obj.get("message").lower()):
+        if self.streaming_export or report_format != "xlsx" or self.shard_by:
+            return self._stream_export(date_from, date_to, force_refresh, sync, progress, output_dir, report_format)
 
-                    logging.log(msg="No statements found for this account.", level=logging.INFO)
-                    continue
+        if self.use_asyncio:
+            from banks_api.async_fetch import AsyncPashaFetcher, run_sync
 
-                stmt_rows = self._gather_statements_rows(account_id=acc_no, statements_obj=statements_obj)
-                all_statements_rows.extend(stmt_rows)
+            accounts, results = run_sync(AsyncPashaFetcher(self).fetch_all(date_from, date_to, force_refresh, sync,
+                                                                           progress))
+        else:
+            accounts, results = self._fetch_all(date_from, date_to, force_refresh, sync, progress)
 
-            # POS blocks (with pagination)
-            pos_blocks = self.get_pos_operations(acc_no)
-            pos_rows = self._gather_pos_rows(acc_no, pos_blocks)
-            all_pos_rows.extend(pos_rows)
+        if not accounts:
+            logging.log(msg="Нет аккаунтов, прекращаю.", level=logging.INFO)
+            return False
 
-            self.current_page = 0
-            self.page_max_count = 0
+        accounts_table = self._gather_accounts_table(accounts=accounts)
+        progress.metrics.add("rows_normalized_total", len(accounts_table), sheet="Accounts")
+
+        progress.check_cancelled()
+        logging.log(msg=f"\nSaving {report_format} report ...", level=logging.INFO)
+
+        if self.streaming_export or report_format != "xlsx" or self.shard_by or self._exceeds_sheet(results):
+            self.save_report_to(
+                report_format,
+                accounts_table,
+                itertools.chain.from_iterable(stmt_rows for stmt_rows, _ in results),
+                itertools.chain.from_iterable(pos_rows for _, pos_rows in results),
+                filename="pasha_report.xlsx",
+                output_dir=output_dir,
+                metrics=progress.metrics,
+            )
+            progress.emit(ROWS_WRITTEN, len(accounts_table) + sum(len(a) + len(b) for a, b in results))
+            return True
+
+        # строки складываются в колоночные таблицы; словари аккаунта освобождаются сразу после переноса
+        statements = RowTable(STATEMENT_COLUMNS)
+        pos = RowTable(POS_COLUMNS)
+        for i, (stmt_rows, pos_rows) in enumerate(results):
+            statements.extend(stmt_rows)
+            pos.extend(pos_rows)
+            results[i] = None
+
+        self.save_report(accounts_table, statements, pos, filename="pasha_report.xlsx", output_dir=output_dir,
+                         metrics=progress.metrics)
+        progress.emit(ROWS_WRITTEN, len(accounts_table) + len(statements) + len(pos))
+        return True
+
+    def _stream_export(self, date_from: str, date_to: str, force_refresh: bool, sync: bool,
+                       progress: ProgressReporter, output_dir: Optional[Path], report_format: str) -> bool:
+        """
+        Streamed report (streaming_export, shard_by, non-xlsx formats) pulled by the sink: the statements of
+        each account, then its POS operations, are fetched at most max_workers accounts ahead of the writer,
+        so only those accounts' rows are in memory, never the whole export.
+        """
+        if self.use_asyncio:
+            from banks_api.async_fetch import AsyncPashaFetcher
+
+            # цикл событий загрузчика — в своём потоке, отчёт пишется здесь
+            fetcher = AsyncPashaFetcher(self)
+            with fetcher.in_background() as submit:
+                return self._write_streamed(
+                    lambda: submit(fetcher.load_accounts(force_refresh, progress)).result(),
+                    lambda acc_no: submit(fetcher.fetch_account_statements(acc_no, date_from, date_to, sync,
+                                                                           progress)),
+                    lambda acc_no: submit(fetcher.fetch_account_pos(acc_no, progress)),
+                    progress, output_dir, report_format,
+                )
+
+        # как в _fetch_all: страницы выписок — в отдельном пуле, чтобы задачи аккаунтов не ждали сами себя
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor, \
+                ThreadPoolExecutor(max_workers=self.page_workers) as page_executor:
+            return self._write_streamed(
+                lambda: self._load_accounts(force_refresh, progress),
+                lambda acc_no: executor.submit(self._fetch_account_statements, acc_no, date_from, date_to,
+                                               page_executor, sync, progress),
+                lambda acc_no: executor.submit(self._fetch_account_pos, acc_no, progress),
+                progress, output_dir, report_format,
+            )
+
+    def _write_streamed(self, load_accounts: Callable[[], List[Dict[str, Any]]],
+                        submit_statements: Callable[[str], "Future[List[Dict[str, Any]]]"],
+                        submit_pos: Callable[[str], "Future[List[Dict[str, Any]]]"],
+                        progress: ProgressReporter, output_dir: Optional[Path], report_format: str) -> bool:
+        accounts = self._accounts_to_fetch(load_accounts, progress)
+        if not accounts:
+            logging.log(msg="Нет аккаунтов, прекращаю.", level=logging.INFO)
+            return False
 
-        logging.log(msg="\nSaving report to Excel ...", level=logging.INFO)
-        self.save_report(accounts_table, all_statements_rows, all_pos_rows, filename="pasha_report.xlsx")
-        return True
\ No newline at end of file
+        accounts_table = self._gather_accounts_table(accounts=accounts)
+        progress.metrics.add("rows_normalized_total", len(accounts_table), sheet="Accounts")
+        account_numbers = [acc.get("accountNo") for acc in accounts]
+        rows_written = len(accounts_table)
+
+        def rows(batches: Iterable[List[Dict[str, Any]]], sheet: str, last: bool) -> Iterator[Dict[str, Any]]:
+            nonlocal rows_written
+            for batch in batches:
+                progress.metrics.add("rows_normalized_total", len(batch), sheet=sheet)
+                rows_written += len(batch)
+                if last:
+                    # POS — последняя загрузка аккаунта
+                    progress.emit(ACCOUNT_DONE)
+                yield from batch
+
+        logging.log(msg=f"\nStreaming {report_format} report ...", level=logging.INFO)
+        self.save_report_to(report_format, accounts_table,
+                            rows(_prefetched(submit_statements, account_numbers, self.max_workers), "Statements",
+                                 False),
+                            rows(_prefetched(submit_pos, account_numbers, self.max_workers), "POS Operations", True),
+                            filename="pasha_report.xlsx", output_dir=output_dir, metrics=progress.metrics)
+
+        progress.emit(ROWS_WRITTEN, rows_written)
+        return True
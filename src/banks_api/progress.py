@@ -0,0 +1,95 @@
+import threading
+import time
+from typing import Callable, Optional
+
+from banks_api.metrics import NULL_METRICS, RunMetrics
+
+# Виды событий прогресса
+ACCOUNTS_TOTAL = "accounts_total"
+ACCOUNT_DONE = "account_done"
+PAGE_FETCHED = "page_fetched"
+ROWS_WRITTEN = "rows_written"
+BYTES_DOWNLOADED = "bytes_downloaded"
+RATE_LIMIT_WAIT = "rate_limit_wait"
+RETRY = "retry"
+STATUS = "status"
+
+# события, которые попадают в метрики выгрузки (banks_api.metrics), и имена их счётчиков
+METRIC_COUNTERS = {
+    ACCOUNT_DONE: "accounts_done_total",
+    PAGE_FETCHED: "pages_fetched_total",
+    ROWS_WRITTEN: "rows_written_total",
+    BYTES_DOWNLOADED: "bytes_received_total",
+    RATE_LIMIT_WAIT: "rate_limit_wait_seconds_total",
+    RETRY: "retries_total",
+}
+
+# как часто асинхронная пауза проверяет флаг отмены, секунд
+CANCEL_POLL_INTERVAL = 0.1
+
+
+class ExportCancelled(Exception):
+    """Raised inside an export when the user pressed Cancel."""
+
+
+class ProgressReporter:
+    """
+    Передаёт события прогресса выгрузки наружу (UI, CLI) и проверяет флаг отмены.
+    Вызывается из рабочих потоков клиента, callback должен быть потокобезопасным.
+    """
+
+    def __init__(self, callback: Optional[Callable[[str, object], None]] = None,
+                 cancel_event: Optional[threading.Event] = None, metrics: Optional[RunMetrics] = None) -> None:
+        self.callback = callback
+        self.cancel_event = cancel_event or threading.Event()
+        # time.monotonic(), после которого повторы запросов прекращаются (None — без срока)
+        self.deadline: Optional[float] = None
+        # метрики выгрузки (NULL_METRICS — выключены)
+        self.metrics = metrics or NULL_METRICS
+
+    def emit(self, kind: str, value: object = 1) -> None:
+        if self.callback is not None:
+            self.callback(kind, value)
+        if self.metrics.enabled and kind in METRIC_COUNTERS:
+            self.metrics.add(METRIC_COUNTERS[kind], value)
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def check_cancelled(self) -> None:
+        if self.cancel_event.is_set():
+            raise ExportCancelled()
+
+    def start_deadline(self, seconds: Optional[float]) -> None:
+        """Start the export's time budget (kept if the caller already set one)."""
+        if self.deadline is None and seconds is not None:
+            self.deadline = time.monotonic() + seconds
+
+    def start_metrics(self, bank: str) -> RunMetrics:
+        """Turn on the export's metrics (kept if the caller already passed its own)."""
+        if not self.metrics.enabled:
+            self.metrics = RunMetrics(bank)
+        return self.metrics
+
+    def time_left(self) -> Optional[float]:
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    async def sleep(self, seconds: float) -> None:
+        """asyncio counterpart of cancel_event.wait(seconds): Cancel ends the pause early and raises."""
+        import asyncio
+
+        until = time.monotonic() + seconds
+        while not self.cancel_event.is_set():
+            left = until - time.monotonic()
+            if left <= 0:
+                break
+            await asyncio.sleep(min(left, CANCEL_POLL_INTERVAL))
+        self.check_cancelled()
+
+
+def ensure_progress(progress: Optional[ProgressReporter]) -> ProgressReporter:
+    """No-op reporter when the caller does not track progress."""
+    return progress if progress is not None else ProgressReporter()
@@ -0,0 +1,101 @@
+import threading
+import time
+from typing import Dict, Mapping, Optional, Tuple
+
+from banks_api.progress import RATE_LIMIT_WAIT, ProgressReporter
+
+# Лимиты по умолчанию (запросов в секунду, размер пачки), если в db/bank.db нет своих.
+# "*" — лимит банка для эндпоинтов без отдельной настройки
+DEFAULT_RATE_LIMITS: Dict[Tuple[str, str], Tuple[float, int]] = {
+    ("pasha", "*"): (2.0, 2),
+    ("kapital", "*"): (10.0, 10),
+}
+
+
+class TokenBucket:
+    """
+    Ведро токенов: rate токенов в секунду, не больше burst про запас.
+
+    Токен резервируется сразу (баланс может уйти в минус), поэтому ожидающие потоки
+    и задачи выстраиваются в очередь без повторных проверок.
+    """
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take one token; returns how many seconds the caller must wait before using it."""
+        if self.rate <= 0:
+            return 0.0
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+class RateLimiter:
+    """
+    Ограничитель запросов по (банк, эндпоинт), общий для всех потоков и задач процесса.
+
+    Лимит ищется по (bank, endpoint), затем по (bank, "*"), затем в DEFAULT_RATE_LIMITS.
+    Время ожидания сообщается в ProgressReporter событием RATE_LIMIT_WAIT.
+    """
+
+    def __init__(self, limits: Optional[Mapping[Tuple[str, str], Tuple[float, int]]] = None) -> None:
+        self.limits = {**DEFAULT_RATE_LIMITS, **(limits or {})}
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, bank: str, endpoint: str) -> TokenBucket:
+        key = (bank, endpoint)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                # эндпоинты без своего лимита делят одно ведро банка
+                if key not in self.limits:
+                    key = (bank, "*")
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    rate, burst = self.limits.get(key, (0.0, 1))
+                    bucket = self._buckets[key] = TokenBucket(rate, burst)
+                self._buckets[(bank, endpoint)] = bucket
+            return bucket
+
+    def reserve(self, bank: str, endpoint: str) -> float:
+        return self.bucket(bank, endpoint).reserve()
+
+    def acquire(self, bank: str, endpoint: str, progress: Optional[ProgressReporter] = None) -> float:
+        """Block until a request to the endpoint is allowed; returns the seconds waited."""
+        delay = self.reserve(bank, endpoint)
+        if delay <= 0:
+            return 0.0
+
+        if progress is not None:
+            progress.emit(RATE_LIMIT_WAIT, delay)
+            progress.cancel_event.wait(delay)
+            progress.check_cancelled()
+        else:
+            time.sleep(delay)
+        return delay
+
+    async def acquire_async(self, bank: str, endpoint: str, progress: Optional[ProgressReporter] = None) -> float:
+        """acquire() for coroutines: the token is reserved the same way, the wait does not block the loop."""
+        delay = self.reserve(bank, endpoint)
+        if delay <= 0:
+            return 0.0
+
+        if progress is not None:
+            progress.emit(RATE_LIMIT_WAIT, delay)
+            await progress.sleep(delay)
+        else:
+            import asyncio
+
+            await asyncio.sleep(delay)
+        return delay
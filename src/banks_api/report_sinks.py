@@ -0,0 +1,499 @@
+"""
+Куда пишется отчёт выгрузки: набор именованных таблиц (Accounts, Statements, ...), строки
+которых поступают потоком. XLSX — один из вариантов; CSV, Parquet и SQLite не ограничены
+1 048 576 строками листа и читаются ETL напрямую, без разбора Excel.
+
+    with make_sink("parquet", "exports/2024-01-31_pasha_report") as sink:
+        sink.write_table("Statements", columns, rows)
+    # exports/2024-01-31_pasha_report/Statements.parquet
+
+В XLSX таблица, которая не помещается в лист (sheet_rows строк) или делится по ключу
+(shard_key: счёт, месяц), пишется на пронумерованные листы Statements_1, Statements_2, ...;
+первый лист книги (Index) перечисляет их.
+"""
+import csv
+import json
+import logging
+import os
+import re
+import shutil
+import sqlite3 as sql
+from abc import ABC, abstractmethod
+from datetime import date
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Type
+
+from openpyxl import Workbook
+
+from banks_api.excel_writer import StreamingSheetWriter, batched, solid_fill
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # без pyarrow недоступен только формат parquet
+    pa = None
+    pq = None
+
+# значения-заглушки отчёта ("N/A" пустых полей), в типизированных форматах это NULL
+NA_VALUES = frozenset(("N/A", ""))
+
+DEFAULT_HEADER_COLOR = "BDD7EE"
+
+# строк на листе Excel, вместе с заголовком
+EXCEL_MAX_ROWS = 1_048_576
+
+# режимы деления таблиц выписок на листы (кроме деления по числу строк)
+SHARD_BY = ("account", "month")
+
+# ключ шарда по значениям строки; None — строка идёт в шард следующей строки с ключом
+ShardKey = Callable[[Sequence[Any]], Optional[str]]
+
+_ISO_MONTH = re.compile(r"(\d{4})-(\d{2})-\d{2}")
+_DMY_MONTH = re.compile(r"\d{2}[-./](\d{2})[-./](\d{4})")
+
+
+class ReportSink(ABC):
+    """
+    Отчёт из именованных таблиц; таблицы пишутся по одной, строки — из итератора, без
+    накопления в памяти. Параметры оформления (header_color, highlight, empty_message) и
+    деление на листы (shard_key) используют только форматы, где они есть (XLSX).
+    """
+
+    extension = ""
+
+    def __init__(self, path: str) -> None:
+        # путь без расширения; у каждого формата своё (файл или каталог)
+        self.path = path + self.extension
+
+    @abstractmethod
+    def write_table(self, name: str, columns: Sequence[str], rows: Iterable[Sequence[Any]],
+                    header_color: str = DEFAULT_HEADER_COLOR,
+                    highlight: Optional[Callable[[Sequence[Any]], bool]] = None,
+                    empty_message: str = "", shard_key: Optional[ShardKey] = None) -> int:
+        """Write one table; returns the number of data rows written."""
+
+    def close(self) -> str:
+        """Finish the report; returns its path."""
+        return self.path
+
+    def discard(self) -> None:
+        """Drop an unfinished report (its rows stopped coming), so no truncated report is left behind."""
+        path = self.close()
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        elif os.path.exists(path):
+            os.remove(path)
+
+    def __enter__(self) -> "ReportSink":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class XlsxSink(ReportSink):
+    """
+    Книга write_only: каждая таблица — лист, строки уходят в файл сразу (StreamingSheetWriter).
+
+    Таблица длиннее sheet_rows строк продолжается на следующем листе; с shard_key у каждого
+    ключа свои листы (открыты одновременно, поэтому строки ключа не обязаны идти подряд).
+    """
+
+    extension = ".xlsx"
+
+    def __init__(self, path: str, max_width: int = 60, sheet_rows: int = EXCEL_MAX_ROWS - 1) -> None:
+        super().__init__(path)
+        self.max_width = max_width
+        # строк данных на листе (без заголовка), не больше предела Excel
+        self.sheet_rows = max(1, min(sheet_rows, EXCEL_MAX_ROWS - 1))
+        self.workbook = Workbook(write_only=True)
+        self._highlight_fill = solid_fill("EEECE1")
+        # (лист, таблица, ключ) таблиц, разбитых на несколько листов, — строки листа Index
+        self.shards: List[Tuple[StreamingSheetWriter, str, Optional[str]]] = []
+        self._saved = False
+
+    def write_table(self, name: str, columns: Sequence[str], rows: Iterable[Sequence[Any]],
+                    header_color: str = DEFAULT_HEADER_COLOR,
+                    highlight: Optional[Callable[[Sequence[Any]], bool]] = None,
+                    empty_message: str = "", shard_key: Optional[ShardKey] = None) -> int:
+        # листы таблицы в порядке создания и текущий (незаполненный) лист каждого ключа
+        sheets: List[Tuple[StreamingSheetWriter, Optional[str]]] = []
+        current: Dict[Optional[str], StreamingSheetWriter] = {}
+        # строки без ключа (сводка POS перед своими операциями) ждут следующую строку с ключом
+        pending: List[Sequence[Any]] = []
+        last_key: Optional[str] = None
+
+        def append(values: Sequence[Any], key: Optional[str]) -> None:
+            writer = current.get(key)
+            if writer is None or writer.row_count >= self.sheet_rows:
+                if writer is not None:
+                    writer.close()
+                title = name if not sheets else f"{name}_{len(sheets) + 1}"
+                writer = current[key] = StreamingSheetWriter(self.workbook, title, columns, header_color,
+                                                             max_width=self.max_width)
+                sheets.append((writer, key))
+            writer.append(values, self._highlight_fill if highlight is not None and highlight(values) else None)
+
+        for values in rows:
+            if shard_key is None:
+                append(values, None)
+                continue
+
+            key = shard_key(values)
+            if key is None:
+                pending.append(values)
+                continue
+            for waiting in pending:
+                append(waiting, key)
+            pending.clear()
+            append(values, key)
+            last_key = key
+
+        for waiting in pending:
+            append(waiting, last_key)
+
+        if not sheets:
+            writer = StreamingSheetWriter(self.workbook, name, columns, header_color, max_width=self.max_width)
+            writer.write_message(empty_message or f"No {name} found")
+            return 0
+
+        for writer in current.values():
+            writer.close()
+
+        if len(sheets) > 1 or shard_key is not None:
+            # первый лист получает номер, когда понятно, что листов несколько
+            sheets[0][0].ws.title = f"{name}_1"
+            self.shards.extend((writer, name, key) for writer, key in sheets)
+            logging.info(f"{name}: {sum(w.rows_written for w, _ in sheets)} rows split into {len(sheets)} sheets")
+
+        return sum(writer.rows_written for writer, _ in sheets)
+
+    def close(self) -> str:
+        if not self._saved:
+            if self.shards:
+                self._write_index()
+            self.workbook.save(self.path)
+            self._saved = True
+        return self.path
+
+    def _write_index(self) -> None:
+        """First sheet: every shard sheet (linked) with its table, key and row count."""
+        writer = StreamingSheetWriter(self.workbook, "Index", ["Sheet", "Table", "Key", "Rows"], DEFAULT_HEADER_COLOR,
+                                      max_width=self.max_width, index=0)
+        for shard, table, key in self.shards:
+            title = shard.ws.title
+            writer.append([title, table, key, shard.rows_written], link=f"'{title}'!A1")
+        writer.close()
+
+
+class CsvSink(ReportSink):
+    """Каталог с <таблица>.csv (UTF-8, разделитель ","); значения как в XLSX, None — пустое поле."""
+
+    def __init__(self, path: str) -> None:
+        super().__init__(path)
+        os.makedirs(self.path, exist_ok=True)
+
+    def write_table(self, name: str, columns: Sequence[str], rows: Iterable[Sequence[Any]],
+                    header_color: str = DEFAULT_HEADER_COLOR,
+                    highlight: Optional[Callable[[Sequence[Any]], bool]] = None,
+                    empty_message: str = "", shard_key: Optional[ShardKey] = None) -> int:
+        count = 0
+        with open(os.path.join(self.path, f"{_file_name(name)}.csv"), "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for values in rows:
+                writer.writerow(values)
+                count += 1
+        return count
+
+
+class ParquetSink(ReportSink):
+    """
+    Каталог с <таблица>.parquet (pyarrow, сжатие zstd), строки пишутся группами по batch_size.
+
+    Тип колонки определяется по первой группе (bool, int64, float64, иначе string);
+    заглушки "N/A" — NULL. Если значение следующей группы не помещается в тип колонки
+    (дробная сумма в колонке целых), колонка расширяется (int64 -> float64, иначе string),
+    а уже записанные строки переписываются в новую схему: значения не теряются.
+    """
+
+    extension = ""
+
+    def __init__(self, path: str, batch_size: int = 50_000, compression: str = "zstd") -> None:
+        if pa is None:
+            raise ImportError("parquet export needs pyarrow: pip install pyarrow")
+        super().__init__(path)
+        self.batch_size = batch_size
+        self.compression = compression
+        os.makedirs(self.path, exist_ok=True)
+
+    def write_table(self, name: str, columns: Sequence[str], rows: Iterable[Sequence[Any]],
+                    header_color: str = DEFAULT_HEADER_COLOR,
+                    highlight: Optional[Callable[[Sequence[Any]], bool]] = None,
+                    empty_message: str = "", shard_key: Optional[ShardKey] = None) -> int:
+        file_path = os.path.join(self.path, f"{_file_name(name)}.parquet")
+        writer = None
+        schema = None
+        count = 0
+        try:
+            for batch in batched(rows, self.batch_size):
+                values_by_column = list(zip(*batch))
+                if schema is None:
+                    schema = pa.schema([pa.field(column, _arrow_type(values))
+                                        for column, values in zip(columns, values_by_column)])
+                    writer = pq.ParquetWriter(file_path, schema, compression=self.compression)
+
+                widened = _widen_schema(schema, values_by_column)
+                if widened is not schema:
+                    logging.info(f"{name}: column types widened after {count} rows "
+                                 f"({_schema_changes(schema, widened)}), rewriting them")
+                    writer.close()
+                    # закрыт: если перезапись не удастся, finally не должен закрывать его второй раз
+                    writer = None
+                    writer = self._rewrite(file_path, widened)
+                    schema = widened
+
+                arrays = [_arrow_array(values, field.type) for values, field in zip(values_by_column, schema)]
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+                count += len(batch)
+
+            if writer is None:
+                # пустая таблица: файл с колонками без строк
+                schema = pa.schema([pa.field(column, pa.string()) for column in columns])
+                writer = pq.ParquetWriter(file_path, schema, compression=self.compression)
+                writer.write_table(schema.empty_table())
+        finally:
+            if writer is not None:
+                writer.close()
+        return count
+
+    def _rewrite(self, file_path: str, schema: "pa.Schema") -> "pq.ParquetWriter":
+        """Copy the rows written so far into a new file with the widened schema; the writer stays open."""
+        previous = file_path + ".part"
+        os.replace(file_path, previous)
+        writer = pq.ParquetWriter(file_path, schema, compression=self.compression)
+        try:
+            for record_batch in pq.ParquetFile(previous).iter_batches(batch_size=self.batch_size):
+                arrays = [_arrow_array(column.to_pylist(), field.type)
+                          for column, field in zip(record_batch.columns, schema)]
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+        except BaseException:
+            writer.close()
+            raise
+        os.remove(previous)
+        return writer
+
+
+class SqliteSink(ReportSink):
+    """Файл SQLite: каждая таблица отчёта — таблица с теми же колонками; заглушки "N/A" — NULL."""
+
+    extension = ".sqlite"
+
+    def __init__(self, path: str, batch_size: int = 10_000) -> None:
+        super().__init__(path)
+        self.batch_size = batch_size
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.connection = sql.connect(self.path)
+        # файл создаётся выгрузкой с нуля: журнал и fsync не нужны
+        self.connection.execute("PRAGMA journal_mode=OFF")
+        self.connection.execute("PRAGMA synchronous=OFF")
+
+    def write_table(self, name: str, columns: Sequence[str], rows: Iterable[Sequence[Any]],
+                    header_color: str = DEFAULT_HEADER_COLOR,
+                    highlight: Optional[Callable[[Sequence[Any]], bool]] = None,
+                    empty_message: str = "", shard_key: Optional[ShardKey] = None) -> int:
+        if not columns:
+            # нет ни одной записи (и колонок): SQLite не создаёт таблицу без колонок
+            return sum(1 for _ in rows)
+
+        table = _quote(name)
+        column_list = ", ".join(_quote(column) for column in columns)
+        insert = f"INSERT INTO {table} VALUES ({', '.join('?' * len(columns))})"
+
+        count = 0
+        with self.connection:
+            self.connection.execute(f"DROP TABLE IF EXISTS {table}")
+            self.connection.execute(f"CREATE TABLE {table} ({column_list})")
+            for batch in batched(rows, self.batch_size):
+                self.connection.executemany(insert, ([_sqlite_value(v) for v in values] for values in batch))
+                count += len(batch)
+        return count
+
+    def close(self) -> str:
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+        return self.path
+
+
+SINKS: Dict[str, Type[ReportSink]] = {
+    "xlsx": XlsxSink,
+    "csv": CsvSink,
+    "parquet": ParquetSink,
+    "sqlite": SqliteSink,
+}
+
+
+def check_format(report_format: str) -> Type[ReportSink]:
+    """Sink class of the format; fails before the export starts, not after all requests are done."""
+    try:
+        sink_class = SINKS[report_format]
+    except KeyError:
+        raise ValueError(f"Unknown report format: {report_format} (expected one of {', '.join(SINKS)})") from None
+    if sink_class is ParquetSink and pa is None:
+        raise ImportError("parquet export needs pyarrow: pip install pyarrow")
+    return sink_class
+
+
+def make_sink(report_format: str, path: str, sheet_rows: Optional[int] = None) -> ReportSink:
+    """
+    Sink of the format ("xlsx", "csv", "parquet", "sqlite") at path (without extension).
+
+    sheet_rows — data rows per sheet (xlsx only; None — Excel's limit).
+    """
+    sink_class = check_format(report_format)
+    logging.info(f"Writing {report_format} report to {path}{sink_class.extension}")
+    if sink_class is XlsxSink and sheet_rows:
+        return XlsxSink(path, sheet_rows=sheet_rows)
+    return sink_class(path)
+
+
+def shard_key(shard_by: Optional[str], columns: Sequence[str], account_columns: Sequence[str],
+              date_columns: Sequence[str]) -> Optional[ShardKey]:
+    """
+    Shard key of a table for shard_by ("account", "month", None): the first of account_columns
+    present in columns, or the month (YYYY-MM) of the first date_columns value that parses.
+    None when the table has no such column (it is then split by row count only).
+    """
+    if shard_by is None:
+        return None
+    if shard_by not in SHARD_BY:
+        raise ValueError(f"Unknown shard mode: {shard_by} (expected one of {', '.join(SHARD_BY)})")
+
+    if shard_by == "account":
+        index = next((columns.index(c) for c in account_columns if c in columns), None)
+        if index is None:
+            return None
+
+        def account_key(values: Sequence[Any]) -> Optional[str]:
+            value = values[index]
+            return None if value is None or (isinstance(value, str) and value in NA_VALUES) else str(value)
+
+        return account_key
+
+    indexes = [columns.index(c) for c in date_columns if c in columns]
+    if not indexes:
+        return None
+
+    def month_key(values: Sequence[Any]) -> Optional[str]:
+        for index in indexes:
+            month = _month(values[index])
+            if month is not None:
+                return month
+        return None
+
+    return month_key
+
+
+def _month(value: Any) -> Optional[str]:
+    """YYYY-MM of a date, an ISO date string or a DD-MM-YYYY / DD.MM.YYYY string."""
+    if isinstance(value, date):
+        return value.strftime("%Y-%m")
+    if isinstance(value, str):
+        match = _ISO_MONTH.match(value)
+        if match:
+            return f"{match[1]}-{match[2]}"
+        match = _DMY_MONTH.match(value)
+        if match:
+            return f"{match[2]}-{match[1]}"
+    return None
+
+
+def _file_name(name: str) -> str:
+    """Table name as a file name ("POS Operations" -> "POS_Operations")."""
+    return "".join(ch if ch.isalnum() or ch in "-_" else "_" for ch in name)
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _sqlite_value(value: Any) -> Any:
+    if value is None or isinstance(value, (int, float, bytes)):
+        return value
+    if isinstance(value, str):
+        return None if value in NA_VALUES else value
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False, default=str)
+    return str(value)
+
+
+def _arrow_type(values: Sequence[Any]) -> "pa.DataType":
+    """bool / int64 / float64 when every non-empty value is one, string otherwise."""
+    kinds = set()
+    for value in values:
+        if _is_null(value):
+            continue
+        if isinstance(value, bool):
+            kinds.add(bool)
+        elif isinstance(value, int):
+            kinds.add(int)
+        elif isinstance(value, float):
+            kinds.add(float)
+        else:
+            return pa.string()
+
+    if kinds == {bool}:
+        return pa.bool_()
+    if kinds == {int}:
+        return pa.int64()
+    if kinds and kinds <= {int, float}:
+        return pa.float64()
+    return pa.string()
+
+
+def _widen_schema(schema: "pa.Schema", values_by_column: Sequence[Sequence[Any]]) -> "pa.Schema":
+    """schema itself when every value fits its column, otherwise a schema with the columns widened."""
+    fields = list(schema)
+    for idx, (field, values) in enumerate(zip(schema, values_by_column)):
+        if not all(_fits(value, field.type) for value in values if not _is_null(value)):
+            fields[idx] = pa.field(field.name, _common_type(field.type, _arrow_type(values)))
+    return schema if fields == list(schema) else pa.schema(fields)
+
+
+def _common_type(current: "pa.DataType", other: "pa.DataType") -> "pa.DataType":
+    if current == other:
+        return current
+    if pa.types.is_integer(current) and pa.types.is_floating(other):
+        return pa.float64()
+    return pa.string()
+
+
+def _schema_changes(old: "pa.Schema", new: "pa.Schema") -> str:
+    return ", ".join(f"{a.name}: {a.type} -> {b.type}" for a, b in zip(old, new) if a.type != b.type)
+
+
+def _is_null(value: Any) -> bool:
+    return value is None or (isinstance(value, str) and value in NA_VALUES)
+
+
+def _arrow_array(values: Sequence[Any], arrow_type: "pa.DataType") -> "pa.Array":
+    if pa.types.is_string(arrow_type):
+        converted = [None if _is_null(value)
+                     else value if isinstance(value, str)
+                     else json.dumps(value, ensure_ascii=False, default=str) if isinstance(value, (dict, list))
+                     else str(value)
+                     for value in values]
+        return pa.array(converted, type=arrow_type)
+
+    converted = [None if _is_null(value) else value for value in values]
+    return pa.array(converted, type=arrow_type)
+
+
+def _fits(value: Any, arrow_type: "pa.DataType") -> bool:
+    if pa.types.is_string(arrow_type):
+        return True
+    if pa.types.is_boolean(arrow_type):
+        return isinstance(value, bool)
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return False
+    return pa.types.is_floating(arrow_type) or isinstance(value, int)
@@ -0,0 +1,248 @@
+import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Dict, Optional, Sequence
+from urllib.parse import urlsplit
+
+import requests
+
+from banks_api.progress import RETRY, ProgressReporter
+
+# 429 — банк жив, но просит подождать; 502/503/504 — временная недоступность
+RETRY_STATUSES = (429, 502, 503, 504)
+
+
+class CircuitOpenError(requests.RequestException):
+    """The bank's host failed too many times in a row; requests are refused until the cool-down ends."""
+
+
+def retry_after_seconds(response: Optional[requests.Response]) -> Optional[float]:
+    """Retry-After header as seconds (delta-seconds or HTTP date), None if absent or unreadable."""
+    if response is None:
+        return None
+
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+
+class CircuitBreaker:
+    """
+    Размыкатель по хостам: после failure_threshold неудач подряд хост «открыт» на reset_timeout
+    секунд и запросы к нему сразу отклоняются; затем пропускается один пробный запрос.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures: Dict[str, int] = {}
+        self._opened_at: Dict[str, float] = {}
+        self._probing: Dict[str, bool] = {}
+
+    def before_request(self, host: str) -> bool:
+        """Raise CircuitOpenError while the host is open; True when this request is the half-open probe."""
+        with self._lock:
+            opened_at = self._opened_at.get(host)
+            if opened_at is None:
+                return False
+
+            if time.monotonic() - opened_at < self.reset_timeout or self._probing.get(host):
+                raise CircuitOpenError(f"{host} is unavailable, not retrying for now")
+
+            # полуоткрытое состояние: один поток проверяет, ожил ли банк
+            self._probing[host] = True
+            return True
+
+    def record_success(self, host: str) -> None:
+        with self._lock:
+            if host in self._opened_at:
+                logging.info(f"Circuit closed for {host}")
+            self._failures.pop(host, None)
+            self._opened_at.pop(host, None)
+            self._probing.pop(host, None)
+
+    def record_failure(self, host: str) -> None:
+        with self._lock:
+            failures = self._failures.get(host, 0) + 1
+            self._failures[host] = failures
+            self._probing.pop(host, None)
+
+            if failures >= self.failure_threshold:
+                if host not in self._opened_at:
+                    logging.error(f"Circuit opened for {host} after {failures} failures in a row")
+                self._opened_at[host] = time.monotonic()
+
+    def release_probe(self, host: str) -> None:
+        """The probe ended without telling whether the bank is back (e.g. the export was cancelled)."""
+        with self._lock:
+            self._probing.pop(host, None)
+
+    def is_open(self, host: str) -> bool:
+        with self._lock:
+            return host in self._opened_at
+
+
+class RetryPolicy:
+    """
+    Общая политика повторов клиентов банков.
+
+    Повторяются таймауты, ошибки соединения и ответы retry_statuses: экспоненциальная пауза
+    с полным джиттером (не больше backoff_max), Retry-After сервера имеет приоритет.
+    Повторы прекращаются по max_attempts или когда истекает срок выгрузки (ProgressReporter.deadline).
+    """
+
+    def __init__(self, max_attempts: int = 4, backoff_base: float = 1.0, backoff_max: float = 30.0,
+                 retry_statuses: Sequence[int] = RETRY_STATUSES, export_deadline: Optional[float] = 30 * 60,
+                 breaker: Optional[CircuitBreaker] = None) -> None:
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_statuses = frozenset(retry_statuses)
+        # сколько секунд может длиться одна выгрузка, прежде чем повторы прекращаются
+        self.export_deadline = export_deadline
+        self.breaker = breaker or CircuitBreaker()
+
+    def backoff(self, attempt: int, response: Optional[requests.Response] = None) -> float:
+        retry_after = retry_after_seconds(response)
+        if retry_after is not None:
+            return retry_after
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+
+    def send(self, send: Callable[[], requests.Response], url: str,
+             progress: Optional[ProgressReporter] = None, max_attempts: Optional[int] = None) -> requests.Response:
+        """
+        Call send() until it returns a non-retryable response.
+
+        The last retryable response is returned as is (the caller decides via raise_for_status);
+        the last timeout/connection error is re-raised.
+        """
+        host = urlsplit(url).netloc
+        attempts = max_attempts or self.max_attempts
+
+        for attempt in range(1, attempts + 1):
+            probe = self.breaker.before_request(host)
+
+            response, error = None, None
+            try:
+                response = send()
+            except (requests.Timeout, requests.ConnectionError) as e:
+                error = e
+            except BaseException as e:
+                self._abandon(host, e, probe)
+                raise
+
+            if self._record(host, response):
+                return response
+
+            delay = self._next_delay(url, host, attempt, attempts, response, error, progress)
+            if delay is None:
+                if error is not None:
+                    raise error
+                return response
+
+            if response is not None:
+                # ответ с stream=True держит соединение пула, пока его не закрыть
+                response.close()
+
+            if progress is not None:
+                # Cancel прерывает ожидание сразу
+                progress.cancel_event.wait(delay)
+                progress.check_cancelled()
+            else:
+                time.sleep(delay)
+
+        raise AssertionError("unreachable")
+
+    async def send_async(self, send: Callable[[], Awaitable[requests.Response]], url: str,
+                         progress: Optional[ProgressReporter] = None,
+                         max_attempts: Optional[int] = None) -> requests.Response:
+        """send() for coroutines: same attempts, breaker and pauses, the pause does not block the loop."""
+        host = urlsplit(url).netloc
+        attempts = max_attempts or self.max_attempts
+
+        for attempt in range(1, attempts + 1):
+            probe = self.breaker.before_request(host)
+
+            response, error = None, None
+            try:
+                response = await send()
+            except (requests.Timeout, requests.ConnectionError) as e:
+                error = e
+            except BaseException as e:
+                self._abandon(host, e, probe)
+                raise
+
+            if self._record(host, response):
+                return response
+
+            delay = self._next_delay(url, host, attempt, attempts, response, error, progress)
+            if delay is None:
+                if error is not None:
+                    raise error
+                return response
+
+            if progress is not None:
+                await progress.sleep(delay)
+            else:
+                import asyncio
+
+                await asyncio.sleep(delay)
+
+        raise AssertionError("unreachable")
+
+    def _record(self, host: str, response: Optional[requests.Response]) -> bool:
+        """Feed the attempt's outcome to the breaker; True when the response is final (not retryable)."""
+        if response is None:
+            self.breaker.record_failure(host)
+            return False
+
+        if response.status_code not in self.retry_statuses:
+            self.breaker.record_success(host)
+            return True
+
+        # 429 — банк отвечает, размыкатель не трогаем
+        if response.status_code != 429:
+            self.breaker.record_failure(host)
+        return False
+
+    def _abandon(self, host: str, error: BaseException, probe: bool) -> None:
+        """
+        The attempt ended with an exception that is not retried. A network error (a response cut off
+        mid-body) is a failure for the breaker; anything else (Cancel, rate limiter, a bug) frees the
+        half-open probe, otherwise the host would stay open for good.
+        """
+        if isinstance(error, requests.RequestException):
+            self.breaker.record_failure(host)
+        elif probe:
+            self.breaker.release_probe(host)
+
+    def _next_delay(self, url: str, host: str, attempt: int, attempts: int,
+                    response: Optional[requests.Response], error: Optional[Exception],
+                    progress: Optional[ProgressReporter]) -> Optional[float]:
+        """Pause before the next attempt, or None when it is time to give up."""
+        reason = error or f"HTTP {response.status_code}"
+        delay = self.backoff(attempt, response)
+        time_left = progress.time_left() if progress is not None else None
+
+        if (attempt == attempts or (time_left is not None and delay > time_left)
+                or self.breaker.is_open(host)):
+            logging.error(f"Giving up on {url} after {attempt} attempt(s): {reason}")
+            return None
+
+        logging.warning(f"Retrying {url} in {delay:.1f}s (attempt {attempt}/{attempts}): {reason}")
+        if progress is not None:
+            progress.emit(RETRY)
+        return delay
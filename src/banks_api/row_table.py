@@ -0,0 +1,64 @@
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+
+class RowTable:
+    """
+    Колоночная таблица строк отчёта: по одному списку на колонку вместо словаря на строку.
+
+    Порядок колонок задаёт схема; колонки, которых нет в схеме, идут за ней в порядке
+    первого появления, колонки схемы без значений в лист не попадают (как у DataFrame).
+    Отсутствующее в записи поле хранится как None и пишется пустой ячейкой.
+    """
+
+    __slots__ = ("schema", "_columns", "_length")
+
+    def __init__(self, schema: Sequence[str] = ()) -> None:
+        self.schema = list(schema)
+        self._columns: Dict[str, List[Any]] = {}
+        self._length = 0
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict[str, Any]], schema: Sequence[str] = ()) -> "RowTable":
+        table = cls(schema)
+        table.extend(records)
+        return table
+
+    def __len__(self) -> int:
+        return self._length
+
+    def append(self, record: Dict[str, Any]) -> None:
+        length = self._length
+        columns = self._columns
+
+        for key, value in record.items():
+            column = columns.get(key)
+            if column is None:
+                column = columns[key] = [None] * length
+            column.append(value)
+
+        self._length = length + 1
+        if len(record) < len(columns):
+            for column in columns.values():
+                if len(column) == length:
+                    column.append(None)
+
+    def extend(self, records: Iterable[Dict[str, Any]]) -> None:
+        for record in records:
+            self.append(record)
+
+    @property
+    def column_names(self) -> List[str]:
+        present = self._columns
+        in_schema = set(self.schema)
+        return [c for c in self.schema if c in present] + [c for c in present if c not in in_schema]
+
+    def column(self, name: str) -> List[Any]:
+        column = self._columns.get(name)
+        return column if column is not None else [None] * self._length
+
+    def rows(self, columns: Optional[Sequence[str]] = None) -> Iterator[Tuple[Any, ...]]:
+        """Row tuples in column order (the schema order unless columns are given)."""
+        names = self.column_names if columns is None else columns
+        if not names:
+            return iter(())
+        return zip(*(self.column(name) for name in names))
@@ -0,0 +1,66 @@
+import base64
+import json
+import threading
+import time
+from typing import Optional
+
+
+def jwt_expiry(token: str) -> Optional[float]:
+    """Unix time of the JWT "exp" claim, None if the token is not a readable JWT."""
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        exp = json.loads(base64.urlsafe_b64decode(payload)).get("exp")
+        return float(exp) if exp is not None else None
+    except (IndexError, ValueError, AttributeError, TypeError):
+        return None
+
+
+class TokenManager:
+    """
+    Access/refresh токены и срок их действия, общие для всех выгрузок клиента.
+
+    Срок берётся из claim "exp" JWT; если токен не JWT — используются default_*_ttl.
+    Токен считается просроченным за refresh_margin секунд до истечения.
+    """
+
+    def __init__(self, refresh_margin: int = 60, default_access_ttl: int = 10 * 60,
+                 default_refresh_ttl: int = 24 * 60 * 60) -> None:
+        self.refresh_margin = refresh_margin
+        self.default_access_ttl = default_access_ttl
+        self.default_refresh_ttl = default_refresh_ttl
+
+        # выгрузки и потоки одного клиента обновляют токены по очереди
+        self.lock = threading.RLock()
+
+        self.username = ""
+        self.client_id = ""
+        self.access_token = ""
+        self.refresh_token = ""
+        self.access_expires_at = 0.0
+        self.refresh_expires_at = 0.0
+
+    def store(self, username: str, access_token: str, refresh_token: str, client_id: str = "") -> None:
+        now = time.time()
+        self.username = username
+        self.client_id = client_id or self.client_id
+        self.access_token = access_token
+        self.refresh_token = refresh_token or self.refresh_token
+        self.access_expires_at = jwt_expiry(access_token) or now + self.default_access_ttl
+        self.refresh_expires_at = jwt_expiry(self.refresh_token) or now + self.default_refresh_ttl
+
+    def access_valid(self, username: str) -> bool:
+        return (bool(self.access_token) and self.username == username
+                and time.time() < self.access_expires_at - self.refresh_margin)
+
+    def can_refresh(self, username: str) -> bool:
+        return (bool(self.refresh_token) and self.username == username
+                and time.time() < self.refresh_expires_at - self.refresh_margin)
+
+    def clear(self) -> None:
+        self.username = ""
+        self.client_id = ""
+        self.access_token = ""
+        self.refresh_token = ""
+        self.access_expires_at = 0.0
+        self.refresh_expires_at = 0.0
@@ -0,0 +1,100 @@
+import threading
+from typing import Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+
+# счётчики ожиданий всех пулов: += из рабочих потоков без блокировки теряет прибавления
+_waits_lock = threading.Lock()
+
+
+class _PoolStatsMixin:
+    """Считает ожидания свободного соединения (пул заполнен, pool_block=True)."""
+
+    num_waits = 0
+
+    def _get_conn(self, timeout=None):
+        # все соединения пула заняты другими потоками — этот поток будет ждать
+        if self.pool is not None and self.pool.empty():
+            with _waits_lock:
+                self.num_waits += 1
+        return super()._get_conn(timeout)
+
+
+class _StatsHTTPConnectionPool(_PoolStatsMixin, HTTPConnectionPool):
+    pass
+
+
+class _StatsHTTPSConnectionPool(_PoolStatsMixin, HTTPSConnectionPool):
+    pass
+
+
+class TransportAdapter(HTTPAdapter):
+    """HTTPAdapter с таймаутами по умолчанию и пулами, которые ведут статистику."""
+
+    def __init__(self, timeout: Tuple[float, float], **kwargs) -> None:
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        super().init_poolmanager(connections, maxsize, block, **pool_kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _StatsHTTPConnectionPool,
+            "https": _StatsHTTPSConnectionPool,
+        }
+
+    def send(self, request, timeout=None, **kwargs):
+        # запрос без явного таймаута получает (connect, read) транспорта, а не бесконечное ожидание
+        return super().send(request, timeout=self.timeout if timeout is None else timeout, **kwargs)
+
+
+class HttpTransport:
+    """
+    Общий HTTP-транспорт клиентов банков: один пул соединений на хост для всех сессий.
+
+    Сессии клиентов (у каждой свои заголовки авторизации) монтируют один и тот же адаптер,
+    поэтому keep-alive соединения переиспользуются между клиентами и выгрузками. pool_block=True:
+    при pool_maxsize занятых соединениях поток ждёт свободное, а не открывает лишний сокет.
+    """
+
+    def __init__(self, pool_connections: int = 10, pool_maxsize: int = 16,
+                 connect_timeout: float = 10.0, read_timeout: float = 30.0) -> None:
+        self.pool_maxsize = pool_maxsize
+        self.adapter = TransportAdapter(
+            timeout=(connect_timeout, read_timeout),
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=True,
+        )
+        self._lock = threading.Lock()
+
+    def session(self, headers: Optional[Dict[str, str]] = None) -> requests.Session:
+        session = requests.Session()
+        session.mount("https://", self.adapter)
+        session.mount("http://", self.adapter)
+        session.headers["Accept-Encoding"] = "gzip, deflate"
+        session.headers["Connection"] = "keep-alive"
+        if headers:
+            session.headers.update(headers)
+        return session
+
+    def pool_stats(self) -> Dict[str, Dict[str, int]]:
+        """Per host: connections opened, requests that reused a connection, waits for a free one, idle now."""
+        stats = {}
+        with self._lock:
+            pools = self.adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+
+                idle = sum(1 for conn in list(pool.pool.queue) if conn is not None) if pool.pool else 0
+                stats[f"{key.key_scheme}://{key.key_host}:{key.key_port}"] = {
+                    "opened": pool.num_connections,
+                    "reused": max(0, pool.num_requests - pool.num_connections),
+                    "waited": pool.num_waits,
+                    "idle": idle,
+                }
+        return stats
@@ -0,0 +1,249 @@
+"""
+Headless entry point: runs Pasha/Kapital exports without the Tk window (cron, servers).
+
+    python cli.py --bank pasha --from 2024-01-01 --to 2024-01-31
+    python cli.py --batch jobs.json --jobs 2 --sync
+    python cli.py --batch jobs.json --metrics --prometheus /var/lib/node_exporter/bank_export.prom
+    python cli.py --bank pasha --from 2024-01-01 --to 2024-12-31 --format parquet
+    python cli.py --bank pasha --from 2024-01-01 --to 2024-12-31 --shard-by month
+    python cli.py --bank kapital --from 01-01-2024 --to 31-12-2024 --column-widths approximate
+
+jobs.json is a list of {"bank": "pasha" | "kapital", "date_from": ..., "date_to": ..., "output": ...,
+"format": ...}; "output" and "format" (default --format) are optional. One client per bank is shared
+by all jobs, so the HTTP session, the access token and the response cache stay warm between date
+ranges. Exit code is 1 if any job failed.
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import db.db_utils as db
+from banks_api.api_logger import setup_api_logger
+from banks_api.excel_writer import WIDTH_EXACT, WIDTH_MODES
+from banks_api.kapital_bank_api import KapitalBankAPI
+from banks_api.metrics import RunMetrics, prometheus_text
+from banks_api.pasha_bank_api import PashaBankAPI
+from banks_api.progress import (
+    BYTES_DOWNLOADED, PAGE_FETCHED, RATE_LIMIT_WAIT, ROWS_WRITTEN, ExportCancelled, ProgressReporter,
+)
+from banks_api.rate_limiter import RateLimiter
+from banks_api.report_sinks import SHARD_BY, SINKS
+from banks_api.transport import HttpTransport
+from db.metrics_store import MetricsStore
+from db.response_cache import ResponseCache
+from db.settings import load_rate_limits
+from db.transaction_store import TransactionStore
+
+BANKS = ("pasha", "kapital")
+
+DEFAULT_OUTPUT_DIR = "exports"
+
+# учётные данные из окружения перекрывают сохранённые в db/bank.db
+CREDENTIAL_ENV = {
+    "pasha": ("PASHA_JWT", "PASHA_API_KEY"),
+    "kapital": ("KAPITAL_USERNAME", "KAPITAL_PASSWORD"),
+}
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Export bank statements (Excel, CSV, Parquet, SQLite) "
+                                                 "without the GUI.")
+    parser.add_argument("--batch", help="JSON file with a list of jobs")
+    parser.add_argument("--bank", choices=BANKS, help="bank of a single job")
+    parser.add_argument("--from", dest="date_from", help="start date (Pasha: YYYY-MM-DD, Kapital: DD-MM-YYYY)")
+    parser.add_argument("--to", dest="date_to", help="end date, same format as --from")
+    parser.add_argument("--output", help="output directory of a single job")
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR,
+                        help="root for jobs without an output; reports go to <root>/<bank>/<from>_<to>")
+    parser.add_argument("--jobs", type=int, default=1, help="how many jobs run at the same time")
+    parser.add_argument("--pool-size", type=int, default=16, help="max HTTP connections per host")
+    parser.add_argument("--refresh", action="store_true", help="ignore cached account/card lists")
+    parser.add_argument("--sync", action="store_true",
+                        help="incremental sync through the local store (Pasha page balances: only for the days "
+                             "fetched now, N/A on rows from earlier syncs)")
+    parser.add_argument("--asyncio", action="store_true",
+                        help="fetch through one asyncio event loop instead of thread pools (needs aiohttp)")
+    parser.add_argument("--stream-json", action="store_true",
+                        help="parse large statement responses from the socket item by item (needs ijson)")
+    parser.add_argument("--log-sample-rate", type=float, default=0.0,
+                        help="share (0..1) of payload log records that include a truncated preview")
+    parser.add_argument("--metrics", action="store_true",
+                        help="log a timing summary of each job and keep it in db/metrics.db")
+    parser.add_argument("--format", dest="report_format", choices=SINKS, default="xlsx",
+                        help="report format of jobs without their own: xlsx workbook, or csv / parquet "
+                             "(a directory with a file per table) / sqlite database, without the Excel row limit")
+    parser.add_argument("--sheet-rows", type=int,
+                        help="xlsx: data rows per sheet before a table continues on the next one "
+                             "(default: Excel's limit of 1048575)")
+    parser.add_argument("--shard-by", choices=SHARD_BY,
+                        help="xlsx: statements on separate sheets per account or month, listed on an Index sheet")
+    parser.add_argument("--column-widths", choices=WIDTH_MODES, default=WIDTH_EXACT,
+                        help="xlsx column widths from every value, or approximate: from a sample of the rows "
+                             "(write_only sheets are always sampled)")
+    parser.add_argument("--prometheus", metavar="FILE",
+                        help="write the jobs' metrics in Prometheus text format (implies timing collection)")
+    args = parser.parse_args(argv)
+
+    if bool(args.batch) == bool(args.bank):
+        parser.error("pass either --batch or --bank/--from/--to")
+    if args.bank and not (args.date_from and args.date_to):
+        parser.error("--bank needs --from and --to")
+    return args
+
+
+def load_jobs(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    if args.batch:
+        with open(args.batch, encoding="utf-8") as f:
+            jobs = json.load(f)
+    else:
+        jobs = [{"bank": args.bank, "date_from": args.date_from, "date_to": args.date_to, "output": args.output}]
+
+    for job in jobs:
+        if job.get("bank") not in BANKS or not job.get("date_from") or not job.get("date_to"):
+            raise ValueError(f"Invalid job: {job}")
+        job["format"] = job.get("format") or args.report_format
+        if job["format"] not in SINKS:
+            raise ValueError(f"Invalid job format: {job}")
+
+        # у каждого диапазона свой каталог: имена отчётов совпадают в пределах минуты
+        output = job.get("output") or os.path.join(args.output_dir, job["bank"],
+                                                   f"{job['date_from']}_{job['date_to']}")
+        job["output"] = Path(output)
+
+    return jobs
+
+
+def load_credentials() -> Dict[str, tuple]:
+    db.setup_connection_bank()
+    stored = {
+        "pasha": (db.JWT_TOKEN_PASHA, db.API_KEY_PASHA),
+        "kapital": (db.KAPITAL_USER, db.KAPITAL_PASS),
+    }
+    return {
+        bank: tuple(os.environ.get(env) or value for env, value in zip(CREDENTIAL_ENV[bank], stored[bank]))
+        for bank in BANKS
+    }
+
+
+def run_job(job: Dict[str, Any], clients: Dict[str, Any], credentials: Dict[str, tuple],
+            args: argparse.Namespace, cancel_event: threading.Event,
+            run_metrics: Optional[RunMetrics] = None) -> bool:
+    bank = job["bank"]
+    label = f"{bank} {job['date_from']}..{job['date_to']}"
+    job["output"].mkdir(parents=True, exist_ok=True)
+
+    # события прогресса приходят из рабочих потоков клиента
+    metrics: Dict[str, float] = {}
+    metrics_lock = threading.Lock()
+
+    def collect(kind: str, value: Any) -> None:
+        if isinstance(value, (int, float)):
+            with metrics_lock:
+                metrics[kind] = metrics.get(kind, 0) + value
+
+    try:
+        ok = clients[bank].process_data(
+            job["date_from"], job["date_to"], *credentials[bank],
+            force_refresh=args.refresh, sync=args.sync,
+            progress=ProgressReporter(collect, cancel_event, run_metrics), output_dir=job["output"],
+            report_format=job["format"],
+        )
+    except ExportCancelled:
+        logging.warning(f"{label}: cancelled")
+        return False
+    except Exception:
+        logging.exception(f"{label}: failed")
+        return False
+
+    if ok is False:
+        logging.error(f"{label}: failed, see log for details")
+        return False
+
+    logging.info(f"{label}: saved to {job['output']} (pages {metrics.get(PAGE_FETCHED, 0):.0f}, "
+                 f"rows {metrics.get(ROWS_WRITTEN, 0):.0f}, {metrics.get(BYTES_DOWNLOADED, 0) / 2 ** 20:.1f} MB, "
+                 f"rate limit wait {metrics.get(RATE_LIMIT_WAIT, 0):.1f}s)")
+    return True
+
+
+def write_prometheus(path: str, runs: List[RunMetrics]) -> None:
+    """Replace the file at once, so a textfile collector never reads it half-written."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(prometheus_text(runs))
+    os.replace(tmp_path, path)
+
+
+def main(argv: List[str]) -> int:
+    args = parse_args(argv)
+
+    setup_api_logger("MULTI_BANK_LOGGER", payload_sample_rate=args.log_sample_rate, console=True)
+
+    logging.info(f"CLI started at {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+
+    try:
+        jobs = load_jobs(args)
+    except (OSError, ValueError) as e:
+        logging.error(f"Cannot load jobs: {e}")
+        return 2
+
+    credentials = load_credentials()
+
+    response_cache = ResponseCache()
+    transaction_store = TransactionStore()
+    transport = HttpTransport(pool_maxsize=args.pool_size)
+    rate_limiter = RateLimiter(load_rate_limits())
+    metrics_store = MetricsStore() if args.metrics else None
+    clients = {
+        "pasha": PashaBankAPI(excel_path=Path(args.output_dir), cache=response_cache, store=transaction_store,
+                              transport=transport, rate_limiter=rate_limiter, use_asyncio=args.asyncio,
+                              streaming_json=args.stream_json, metrics_store=metrics_store,
+                              sheet_rows=args.sheet_rows, shard_by=args.shard_by,
+                              column_widths=args.column_widths),
+        "kapital": KapitalBankAPI(excel_path=Path(args.output_dir), cache=response_cache, store=transaction_store,
+                                  transport=transport, rate_limiter=rate_limiter, use_asyncio=args.asyncio,
+                                  streaming_json=args.stream_json, metrics_store=metrics_store,
+                                  sheet_rows=args.sheet_rows, shard_by=args.shard_by,
+                                  column_widths=args.column_widths),
+    }
+
+    # у каждой выгрузки свои метрики; период в метках отличает выгрузки одного банка
+    runs = [
+        RunMetrics(job["bank"], {"period": f"{job['date_from']}_{job['date_to']}"})
+        if args.metrics or args.prometheus else None
+        for job in jobs
+    ]
+
+    cancel_event = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=max(1, args.jobs), thread_name_prefix="cli-export")
+    futures = [executor.submit(run_job, job, clients, credentials, args, cancel_event, run_metrics)
+               for job, run_metrics in zip(jobs, runs)]
+
+    try:
+        results = [future.result() for future in futures]
+    except KeyboardInterrupt:
+        logging.warning("Interrupted, cancelling exports ...")
+        cancel_event.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+        return 130
+    executor.shutdown()
+
+    for host, stats in transport.pool_stats().items():
+        logging.info(f"HTTP pool {host}: {stats}")
+
+    if args.prometheus:
+        write_prometheus(args.prometheus, [run for run in runs if run is not None])
+
+    failed = results.count(False)
+    logging.info(f"{len(results) - failed}/{len(results)} jobs succeeded")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,79 @@
+import json
+import os
+import sqlite3 as sql
+from typing import Any, Dict, List, Optional
+
+from db.db_utils import resource_path
+
+
+class MetricsStore:
+    """
+    Итоги выгрузок (banks_api.metrics.RunMetrics.summary) в db/metrics.db для анализа трендов.
+
+    Основные показатели лежат отдельными колонками (удобно строить графики запросом SQL),
+    полная сводка — JSON в summary. Хранятся последние max_runs выгрузок.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, max_runs: int = 10_000) -> None:
+        self.db_path = db_path or resource_path("db/metrics.db")
+        self.max_runs = max_runs
+
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+
+        with sql.connect(self.db_path) as connection:
+            connection.executescript("""
+                CREATE TABLE IF NOT EXISTS run_metrics
+                (
+                    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+                    bank            TEXT    NOT NULL,
+                    started_at      TEXT    NOT NULL,
+                    duration_s      REAL,
+                    ok              INTEGER,
+                    requests        INTEGER NOT NULL,
+                    bytes_received  INTEGER NOT NULL,
+                    retries         INTEGER NOT NULL,
+                    rate_limit_wait REAL    NOT NULL,
+                    rows_written    INTEGER NOT NULL,
+                    excel_write_s   REAL    NOT NULL,
+                    summary         TEXT    NOT NULL
+                );
+
+                CREATE INDEX IF NOT EXISTS run_metrics_by_bank
+                    ON run_metrics (bank, started_at);
+            """)
+
+    def save(self, summary: Dict[str, Any]) -> None:
+        counters = summary.get("counters", {})
+        excel = counters.get("excel_write_seconds_total", 0)
+
+        with sql.connect(self.db_path) as connection:
+            connection.execute(
+                "INSERT INTO run_metrics (bank, started_at, duration_s, ok, requests, bytes_received, retries,"
+                " rate_limit_wait, rows_written, excel_write_s, summary) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    summary["bank"],
+                    summary["started_at"],
+                    summary.get("duration_s"),
+                    None if summary.get("ok") is None else int(summary["ok"]),
+                    sum(endpoint["count"] for endpoint in summary.get("requests", {}).values()),
+                    int(counters.get("bytes_received_total", 0)),
+                    int(counters.get("retries_total", 0)),
+                    counters.get("rate_limit_wait_seconds_total", 0.0),
+                    int(counters.get("rows_written_total", 0)),
+                    sum(excel.values()) if isinstance(excel, dict) else excel,
+                    json.dumps(summary, ensure_ascii=False),
+                ),
+            )
+            connection.execute(
+                "DELETE FROM run_metrics WHERE id <= (SELECT MAX(id) FROM run_metrics) - ?",
+                (self.max_runs,),
+            )
+
+    def recent(self, bank: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """Summaries of the latest runs, newest first."""
+        with sql.connect(self.db_path) as connection:
+            rows = connection.execute(
+                "SELECT summary FROM run_metrics WHERE ? IS NULL OR bank=? ORDER BY id DESC LIMIT ?",
+                (bank, bank, limit),
+            ).fetchall()
+        return [json.loads(summary) for summary, in rows]
@@ -0,0 +1,145 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3 as sql
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from db.db_utils import resource_path
+
+
+class ResponseCache:
+    """
+    Кэш ответов API (списки аккаунтов и карт) в SQLite рядом с db/bank.db.
+
+    Ключ — банк, отпечаток учётных данных и endpoint. Записи старше ttl_seconds
+    считаются устаревшими; при превышении max_entries удаляются давно не читанные.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, ttl_seconds: int = 24 * 60 * 60,
+                 max_entries: int = 256) -> None:
+        self.db_path = db_path or resource_path("db/cache.db")
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+
+        with sql.connect(self.db_path) as connection:
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS response_cache
+                (
+                    bank        TEXT NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    endpoint    TEXT NOT NULL,
+                    payload     TEXT NOT NULL,
+                    created_at  REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    PRIMARY KEY (bank, fingerprint, endpoint)
+                )
+            """)
+
+    @staticmethod
+    def fingerprint(*credentials: str) -> str:
+        """Hash of the credentials, so secrets never end up in the cache table."""
+        digest = hashlib.sha256("\x1f".join(credentials).encode("utf-8"))
+        return digest.hexdigest()[:32]
+
+    def get(self, bank: str, fingerprint: str, endpoint: str) -> Optional[Any]:
+        now = time.time()
+        with sql.connect(self.db_path) as connection:
+            row = connection.execute(
+                "SELECT payload, created_at FROM response_cache WHERE bank=? AND fingerprint=? AND endpoint=?",
+                (bank, fingerprint, endpoint),
+            ).fetchone()
+
+            if row is None:
+                return None
+
+            payload, created_at = row
+            if now - created_at > self.ttl_seconds:
+                connection.execute(
+                    "DELETE FROM response_cache WHERE bank=? AND fingerprint=? AND endpoint=?",
+                    (bank, fingerprint, endpoint),
+                )
+                return None
+
+            connection.execute(
+                "UPDATE response_cache SET accessed_at=? WHERE bank=? AND fingerprint=? AND endpoint=?",
+                (now, bank, fingerprint, endpoint),
+            )
+
+        return json.loads(payload)
+
+    def set(self, bank: str, fingerprint: str, endpoint: str, value: Any) -> None:
+        now = time.time()
+        with sql.connect(self.db_path) as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO response_cache VALUES (?, ?, ?, ?, ?, ?)",
+                (bank, fingerprint, endpoint, json.dumps(value), now, now),
+            )
+            self._evict(connection, now)
+
+    def invalidate(self, bank: Optional[str] = None, fingerprint: Optional[str] = None) -> None:
+        query = "DELETE FROM response_cache WHERE (? IS NULL OR bank=?) AND (? IS NULL OR fingerprint=?)"
+        with sql.connect(self.db_path) as connection:
+            connection.execute(query, (bank, bank, fingerprint, fingerprint))
+
+    def get_or_fetch(self, bank: str, fingerprint: str, endpoint: str, fetch: Callable[[], Any],
+                     force_refresh: bool = False) -> Any:
+        """
+        Return the cached value, or call fetch() and cache its result.
+        Empty results are not cached (a failed request returns an empty list).
+        """
+        cached = None if force_refresh else self._read(bank, fingerprint, endpoint)
+        if cached is not None:
+            return cached
+
+        value = fetch()
+        self._write(bank, fingerprint, endpoint, value)
+        return value
+
+    async def get_or_fetch_async(self, bank: str, fingerprint: str, endpoint: str,
+                                 fetch: Callable[[], Awaitable[Any]], force_refresh: bool = False) -> Any:
+        """get_or_fetch() with a coroutine fetch (banks_api.async_fetch); SQLite is read and written off the loop."""
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        cached = None if force_refresh else await loop.run_in_executor(None, self._read, bank, fingerprint, endpoint)
+        if cached is not None:
+            return cached
+
+        value = await fetch()
+        await loop.run_in_executor(None, self._write, bank, fingerprint, endpoint, value)
+        return value
+
+    def _read(self, bank: str, fingerprint: str, endpoint: str) -> Any:
+        try:
+            cached = self.get(bank, fingerprint, endpoint)
+        except sql.Error as e:
+            logging.warning(f"Response cache read failed: {e}")
+            return None
+
+        if cached is not None:
+            logging.info(f"Using cached {bank} {endpoint}")
+        return cached
+
+    def _write(self, bank: str, fingerprint: str, endpoint: str, value: Any) -> None:
+        if not value:
+            return
+
+        try:
+            self.set(bank, fingerprint, endpoint, value)
+        except sql.Error as e:
+            logging.warning(f"Response cache write failed: {e}")
+
+    def _evict(self, connection: sql.Connection, now: float) -> None:
+        connection.execute("DELETE FROM response_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+        connection.execute(
+            """
+            DELETE FROM response_cache WHERE rowid IN (
+                SELECT rowid FROM response_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_entries,),
+        )
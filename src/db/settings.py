@@ -0,0 +1,32 @@
+import os
+import sqlite3 as sql
+from typing import Dict, Optional, Tuple
+
+from db.db_utils import resource_path
+
+
+def load_rate_limits(db_path: Optional[str] = None) -> Dict[Tuple[str, str], Tuple[float, int]]:
+    """
+    Лимиты запросов из таблицы rate_limits в db/bank.db: {(bank, endpoint): (rps, burst)}.
+
+    endpoint "*" задаёт лимит банка по умолчанию. Пустая таблица — встроенные лимиты
+    (banks_api.rate_limiter.DEFAULT_RATE_LIMITS).
+    """
+    db_path = db_path or resource_path("db/bank.db")
+
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+
+    with sql.connect(db_path) as connection:
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS rate_limits
+            (
+                bank                TEXT NOT NULL,
+                endpoint            TEXT NOT NULL DEFAULT '*',
+                requests_per_second REAL NOT NULL,
+                burst               INTEGER NOT NULL DEFAULT 1,
+                PRIMARY KEY (bank, endpoint)
+            )
+        """)
+        rows = connection.execute("SELECT bank, endpoint, requests_per_second, burst FROM rate_limits").fetchall()
+
+    return {(bank, endpoint): (float(rate), int(burst)) for bank, endpoint, rate, burst in rows}
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+import sqlite3 as sql
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from db.db_utils import resource_path
+
+# Форматы дат, которые встречаются во вводе пользователя и в ответах API
+DATE_FORMATS = ("%Y-%m-%d", "%d-%m-%Y", "%d.%m.%Y", "%Y.%m.%d", "%d/%m/%Y")
+
+# Поля, по которым операция однозначно определяется (первое непустое)
+DEDUP_FIELDS = ("transactionNo", "referenceNumber", "refNo", "trnRefNo", "reference", "id")
+
+
+def parse_day(value: Any) -> Optional[date]:
+    """Parse the date part of an API/user date string ("2024-01-31", "31-01-2024 10:00", ...)."""
+    if not isinstance(value, str) or not value.strip():
+        return None
+
+    text = value.strip()[:10]
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def dedup_key(record: Dict[str, Any]) -> str:
+    for field in DEDUP_FIELDS:
+        value = record.get(field)
+        if value not in (None, "", "N/A"):
+            return f"{field}:{value}"
+
+    payload = json.dumps(record, sort_keys=True, default=str)
+    return "sha1:" + hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class TransactionStore:
+    """
+    Локальное хранилище операций выписок в db/bank.db.
+
+    Операции хранятся по (банк, вид выписки, счёт) без дублей; для каждого счёта
+    хранится отметка синхронизации — диапазон дней, уже полностью загруженный из API.
+    """
+
+    def __init__(self, db_path: Optional[str] = None) -> None:
+        self.db_path = db_path or resource_path("db/bank.db")
+
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+
+        with self._connect() as connection:
+            connection.executescript("""
+                CREATE TABLE IF NOT EXISTS transactions
+                (
+                    bank      TEXT NOT NULL,
+                    kind      TEXT NOT NULL,
+                    account   TEXT NOT NULL,
+                    op_date   TEXT NOT NULL,
+                    dedup_key TEXT NOT NULL,
+                    payload   TEXT NOT NULL,
+                    PRIMARY KEY (bank, kind, account, dedup_key)
+                );
+
+                CREATE INDEX IF NOT EXISTS transactions_by_date
+                    ON transactions (bank, kind, account, op_date);
+
+                CREATE TABLE IF NOT EXISTS sync_watermarks
+                (
+                    bank           TEXT NOT NULL,
+                    kind           TEXT NOT NULL,
+                    account        TEXT NOT NULL,
+                    synced_from    TEXT NOT NULL,
+                    synced_through TEXT NOT NULL,
+                    PRIMARY KEY (bank, kind, account)
+                );
+            """)
+
+    def _connect(self) -> sql.Connection:
+        # несколько потоков пишут одновременно — ждём блокировку, а не падаем
+        return sql.connect(self.db_path, timeout=30)
+
+    def sync_window(self, bank: str, kind: str, account: str,
+                    date_from: date, date_to: date) -> Tuple[date, date]:
+        """
+        Days that still have to be fetched for [date_from, date_to].
+
+        The last synced day is always fetched again (it may have been synced while
+        still in progress), so a daily run fetches a single day.
+        """
+        watermark = self.watermark(bank, kind, account)
+        if watermark is None:
+            return date_from, date_to
+
+        synced_from, synced_through = watermark
+        if date_from < synced_from or synced_through < date_from - timedelta(days=1):
+            # запрошенный диапазон не примыкает к уже загруженному — грузим целиком
+            return date_from, date_to
+
+        start = min(synced_through, date_to)
+        return start, date_to
+
+    def watermark(self, bank: str, kind: str, account: str) -> Optional[Tuple[date, date]]:
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT synced_from, synced_through FROM sync_watermarks WHERE bank=? AND kind=? AND account=?",
+                (bank, kind, account),
+            ).fetchone()
+
+        if row is None:
+            return None
+        return date.fromisoformat(row[0]), date.fromisoformat(row[1])
+
+    def mark_synced(self, bank: str, kind: str, account: str, date_from: date, date_to: date) -> None:
+        """Extend the account's synced range with [date_from, date_to] (never past today)."""
+        date_to = min(date_to, date.today())
+
+        watermark = self.watermark(bank, kind, account)
+        if watermark is not None:
+            synced_from, synced_through = watermark
+            if date_from <= synced_through + timedelta(days=1) and synced_from <= date_to + timedelta(days=1):
+                date_from = min(date_from, synced_from)
+                date_to = max(date_to, synced_through)
+
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO sync_watermarks VALUES (?, ?, ?, ?, ?)",
+                (bank, kind, account, date_from.isoformat(), date_to.isoformat()),
+            )
+
+    def save(self, bank: str, kind: str, account: str, records: Iterable[Dict[str, Any]],
+             date_fields: Sequence[str], fallback_date: date) -> int:
+        """Insert or replace records; op_date is the first parsable field of date_fields."""
+        rows = []
+        for record in records:
+            op_date = next((d for d in (parse_day(record.get(f)) for f in date_fields) if d), fallback_date)
+            rows.append((bank, kind, account, op_date.isoformat(), dedup_key(record),
+                         json.dumps(record, default=str)))
+
+        with self._connect() as connection:
+            # ON CONFLICT вместо REPLACE: rowid (порядок операций) сохраняется
+            connection.executemany(
+                """
+                INSERT INTO transactions VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (bank, kind, account, dedup_key)
+                DO UPDATE SET op_date=excluded.op_date, payload=excluded.payload
+                """,
+                rows,
+            )
+
+        return len(rows)
+
+    def load(self, bank: str, kind: str, account: str, date_from: date, date_to: date) -> List[Dict[str, Any]]:
+        with self._connect() as connection:
+            cursor = connection.execute(
+                """
+                SELECT payload FROM transactions
+                WHERE bank=? AND kind=? AND account=? AND op_date BETWEEN ? AND ?
+                ORDER BY op_date, rowid
+                """,
+                (bank, kind, account, date_from.isoformat(), date_to.isoformat()),
+            )
+            return [json.loads(payload) for (payload,) in cursor]
@@ -0,0 +1,139 @@
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional
+
+from banks_api.progress import (
+    ACCOUNT_DONE, ACCOUNTS_TOTAL, BYTES_DOWNLOADED, PAGE_FETCHED, RATE_LIMIT_WAIT, ROWS_WRITTEN, STATUS,
+    ExportCancelled, ProgressReporter,
+)
+
+# Состояния задачи выгрузки
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class ExportJob:
+    """Одна выгрузка в очереди: цель, флаг отмены и счётчики прогресса (читаются из потока Tk)"""
+
+    def __init__(self, bank: str, target: Callable[[ProgressReporter], Any]) -> None:
+        self.bank = bank
+        self.target = target
+        self.cancel_event = threading.Event()
+
+        self.state = QUEUED
+        self.result: Any = None
+        self.error = ""
+
+        self.accounts_total = 0
+        self.accounts_done = 0
+        self.pages_fetched = 0
+        self.rows_written = 0
+        self.bytes_downloaded = 0
+        # секунды, проведённые в ожидании ограничителя запросов (отдельно от времени запросов)
+        self.rate_limit_wait = 0.0
+        self.status = "Queued"
+
+    @property
+    def finished(self) -> bool:
+        return self.state in (DONE, FAILED, CANCELLED)
+
+    def apply(self, kind: str, value: Any) -> None:
+        if kind == ACCOUNTS_TOTAL:
+            self.accounts_total = value
+        elif kind == ACCOUNT_DONE:
+            self.accounts_done += value
+        elif kind == PAGE_FETCHED:
+            self.pages_fetched += value
+        elif kind == ROWS_WRITTEN:
+            self.rows_written += value
+        elif kind == BYTES_DOWNLOADED:
+            self.bytes_downloaded += value
+        elif kind == RATE_LIMIT_WAIT:
+            self.rate_limit_wait += value
+        elif kind == STATUS:
+            self.status = value
+
+
+class ExportWorker:
+    """
+    Выполняет выгрузки в фоновых потоках, чтобы окно Tk не зависало.
+
+    События прогресса из рабочих потоков складываются в очередь; поток Tk забирает их
+    через poll() (вызывается из root.after) и обновляет состояние задач.
+    """
+
+    def __init__(self, max_parallel: int = 1) -> None:
+        self.executor = ThreadPoolExecutor(max_workers=max_parallel, thread_name_prefix="export")
+        self.events: "queue.Queue[tuple]" = queue.Queue()
+        self.jobs: List[ExportJob] = []
+
+    def submit(self, bank: str, target: Callable[[ProgressReporter], Any]) -> ExportJob:
+        job = ExportJob(bank, target)
+        self.jobs.append(job)
+        self.executor.submit(self._run, job)
+        return job
+
+    def _run(self, job: ExportJob) -> None:
+        if job.cancel_event.is_set():
+            self.events.put((job, "state", CANCELLED))
+            return
+
+        self.events.put((job, "state", RUNNING))
+        progress = ProgressReporter(lambda kind, value: self.events.put((job, kind, value)), job.cancel_event)
+
+        try:
+            result = job.target(progress)
+        except ExportCancelled:
+            logging.info(f"{job.bank} export cancelled")
+            self.events.put((job, "state", CANCELLED))
+        except Exception as e:
+            logging.exception(f"{job.bank} export failed")
+            self.events.put((job, "error", str(e)))
+            self.events.put((job, "state", FAILED))
+        else:
+            self.events.put((job, "result", result))
+            self.events.put((job, "state", DONE if result is not False else FAILED))
+
+    def cancel(self, bank: str) -> None:
+        """Cancel the running and all queued exports of a bank."""
+        for job in self.jobs:
+            if job.bank == bank and not job.finished:
+                job.cancel_event.set()
+
+    def poll(self) -> List[ExportJob]:
+        """Apply queued events (Tk thread only); returns jobs that finished since the last poll."""
+        finished = []
+        while True:
+            try:
+                job, kind, value = self.events.get_nowait()
+            except queue.Empty:
+                break
+
+            if kind == "state":
+                job.state = value
+                job.status = value.capitalize()
+                if job.finished:
+                    finished.append(job)
+            elif kind == "result":
+                job.result = value
+            elif kind == "error":
+                job.error = value
+            else:
+                job.apply(kind, value)
+
+        self.jobs = [job for job in self.jobs if not job.finished or job in finished]
+        return finished
+
+    def current(self, bank: str) -> Optional[ExportJob]:
+        """The running (or oldest queued) export of a bank."""
+        pending = [job for job in self.jobs if job.bank == bank and not job.finished]
+        running = [job for job in pending if job.state == RUNNING]
+        return (running or pending or [None])[0]
+
+    def queued(self, bank: str) -> int:
+        return sum(1 for job in self.jobs if job.bank == bank and job.state == QUEUED)
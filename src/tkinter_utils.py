@@ -1,29 +1,145 @@
 import os
+import threading
 import tkinter as tk
 import tkinter.ttk as ttk
 from pathlib import Path
 from tkinter import messagebox
 
 import sqlite3 as sql
-from banks_api.kapital_bank_api import KapitalBankAPI
-from banks_api.pasha_bank_api import PashaBankAPI
 from db.db_utils import resource_path
+from export_worker import CANCELLED, DONE, QUEUED, ExportWorker
+
+
+def default_save_dir(destination: str) -> Path:
+    """Folder on the Desktop for reports (not created here)."""
+    return Path.joinpath(Path.home(), 'Desktop', destination).resolve()
+
 
 def get_default_save_dir(destination: str):
-    home_directory = Path.home()
-    desktop = Path.joinpath(home_directory, 'Desktop', destination)
+    desktop = default_save_dir(destination)
 
     if not os.path.exists(desktop):
         os.mkdir(desktop)
-    return desktop.resolve()
+    return desktop
+
+
+# Клиенты создаются при первой выгрузке: модули клиентов тянут requests и openpyxl
+# (LAZY_MODULES в benchmarks/bench_startup.py), и их импорт не должен задерживать появление окна
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _shared_storage():
+    """Cache, transaction store, HTTP transport, rate limiter and metrics store shared by both clients."""
+    from banks_api.rate_limiter import RateLimiter
+    from banks_api.transport import HttpTransport
+    from db.metrics_store import MetricsStore
+    from db.response_cache import ResponseCache
+    from db.settings import load_rate_limits
+    from db.transaction_store import TransactionStore
+
+    if "storage" not in _clients:
+        _clients["storage"] = (
+            ResponseCache(), TransactionStore(), HttpTransport(), RateLimiter(load_rate_limits()), MetricsStore(),
+        )
+    return _clients["storage"]
+
+
+def get_pasha_client():
+    with _clients_lock:
+        if "pasha" not in _clients:
+            from banks_api.pasha_bank_api import PashaBankAPI
+
+            response_cache, transaction_store, transport, rate_limiter, metrics_store = _shared_storage()
+            _clients["pasha"] = PashaBankAPI(
+                excel_path=get_default_save_dir("Pasha_Bank_Excel"),
+                cache=response_cache,
+                store=transaction_store,
+                transport=transport,
+                rate_limiter=rate_limiter,
+                metrics_store=metrics_store,
+            )
+        return _clients["pasha"]
+
+
+def get_kapital_client():
+    with _clients_lock:
+        if "kapital" not in _clients:
+            from banks_api.kapital_bank_api import KapitalBankAPI
+
+            response_cache, transaction_store, transport, rate_limiter, metrics_store = _shared_storage()
+            _clients["kapital"] = KapitalBankAPI(
+                excel_path=get_default_save_dir("Kapital_Bank_Excel"),
+                cache=response_cache,
+                store=transaction_store,
+                transport=transport,
+                rate_limiter=rate_limiter,
+                metrics_store=metrics_store,
+            )
+        return _clients["kapital"]
+
+
+# выгрузки выполняются по очереди в фоне, окно остаётся отзывчивым
+export_worker = ExportWorker()
+
+POLL_INTERVAL_MS = 200
+
+
+def add_progress_panel(frm, bank: str):
+    """Progress bar, status line and Cancel button for the bank's background exports."""
+    panel = ttk.Frame(frm, style="Modern.TFrame")
+    panel.pack(anchor="w", fill="x", pady=(5, 0))
 
-pasha_client = PashaBankAPI(
-    excel_path=get_default_save_dir("Pasha_Bank_Excel"),
-)
+    progress_bar = ttk.Progressbar(panel, mode="determinate")
+    progress_bar.pack(anchor="w", fill="x")
 
-kapital_client = KapitalBankAPI(
-    excel_path=get_default_save_dir("Kapital_Bank_Excel"),
-)
+    status_label = ttk.Label(panel, text="Idle", style="Modern.TLabel")
+    status_label.pack(anchor="w", pady=(5, 0))
+
+    cancel_button = ttk.Button(panel, text="Cancel", command=lambda: export_worker.cancel(bank))
+    cancel_button.pack(anchor="w", pady=(5, 0))
+    cancel_button.state(["disabled"])
+
+    def refresh():
+        if not panel.winfo_exists():
+            return
+
+        for job in export_worker.poll():
+            show_export_result(job)
+
+        job = export_worker.current(bank)
+        if job is None:
+            progress_bar.configure(maximum=1, value=0)
+            status_label.configure(text="Idle")
+            cancel_button.state(["disabled"])
+        else:
+            progress_bar.configure(maximum=max(job.accounts_total, 1), value=job.accounts_done)
+            status_label.configure(text=format_job_status(job, export_worker.queued(bank)))
+            cancel_button.state(["!disabled"])
+
+        panel.winfo_toplevel().after(POLL_INTERVAL_MS, refresh)
+
+    # таймер вешаем на корневое окно: вкладки пересоздаются, а after() на удалённом виджете падает
+    panel.winfo_toplevel().after(POLL_INTERVAL_MS, refresh)
+
+
+def format_job_status(job, queued: int) -> str:
+    status = (f"{job.status}: accounts {job.accounts_done}/{job.accounts_total or '?'}, "
+              f"pages {job.pages_fetched}, rows {job.rows_written}, "
+              f"{job.bytes_downloaded / (1024 * 1024):.1f} MB, rate limit wait {job.rate_limit_wait:.1f}s")
+    if queued and job.state != QUEUED:
+        status += f" ({queued} queued)"
+    return status
+
+
+def show_export_result(job):
+    bank = job.bank.replace("_", " ")
+    if job.state == DONE:
+        messagebox.showinfo("Info", f"{bank}: report saved. Check destination folder")
+    elif job.state == CANCELLED:
+        messagebox.showinfo("Info", f"{bank}: export cancelled")
+    else:
+        messagebox.showerror("Error", f"{bank}: export failed. {job.error or 'See log for details'}")
 
 
 def add_to_pasha_tab(root, JWT_TOKEN, API_KEY):
@@ -59,8 +175,18 @@ def add_to_pasha_tab(root, JWT_TOKEN, API_KEY):
     if API_KEY:
         entry_api.insert(0, API_KEY)
 
+    # Cache refresh
+    refresh_var = tk.BooleanVar(master=frm, value=False)
+    tk.Checkbutton(frm, text="Refresh cached account list", variable=refresh_var,
+                   bg="#ffffff", font=("Segoe UI", 10)).pack(anchor="w")
+
+    # Incremental sync
+    sync_var = tk.BooleanVar(master=frm, value=False)
+    tk.Checkbutton(frm, text="Incremental sync (fetch only new days)", variable=sync_var,
+                   bg="#ffffff", font=("Segoe UI", 10)).pack(anchor="w")
+
     # Path label
-    tk.Label(frm, text=f"* Saved to: {get_default_save_dir('Pasha_Bank_Excel')}",
+    tk.Label(frm, text=f"* Saved to: {default_save_dir('Pasha_Bank_Excel')}",
              fg="#7f8c8d", bg="#ffffff",
              font=("Segoe UI", 9)).pack(anchor="w", pady=(5,10))
 
@@ -69,9 +195,12 @@ def add_to_pasha_tab(root, JWT_TOKEN, API_KEY):
         frm,
         text="Generate Excel",
         style="Modern.TButton",
-        command=lambda: send_request_pasha(entry_date_from, entry_date_to, entry_jwt, entry_api)
+        command=lambda: send_request_pasha(entry_date_from, entry_date_to, entry_jwt, entry_api, refresh_var,
+                                           sync_var)
     ).pack(pady=10)
 
+    add_progress_panel(frm, "Pasha_Bank")
+
 
 def add_to_kapital_tab(root, username, password):
     for widget in root.winfo_children():
@@ -106,9 +235,17 @@ def add_to_kapital_tab(root, username, password):
     entry_date_to = ttk.Entry(frm, style="Modern.TEntry")
     entry_date_to.pack(anchor="w", fill="x", pady=5)
 
+    refresh_var = tk.BooleanVar(master=frm, value=False)
+    tk.Checkbutton(frm, text="Refresh cached accounts and cards", variable=refresh_var,
+                   bg="#ffffff", font=("Segoe UI", 10)).pack(anchor="w")
+
+    sync_var = tk.BooleanVar(master=frm, value=False)
+    tk.Checkbutton(frm, text="Incremental sync (fetch only new days)", variable=sync_var,
+                   bg="#ffffff", font=("Segoe UI", 10)).pack(anchor="w")
+
     tk.Label(
         frm,
-        text=f"* Saved to: {get_default_save_dir('Kapital_Bank_Excel')}",
+        text=f"* Saved to: {default_save_dir('Kapital_Bank_Excel')}",
         fg="#7f8c8d",
         bg="#ffffff",
         font=("Segoe UI", 9)
@@ -118,13 +255,16 @@ def add_to_kapital_tab(root, username, password):
         frm,
         text="Generate Excel",
         style="Modern.TButton",
-        command=lambda: send_request_kapital(entry_username, entry_password, entry_date_from, entry_date_to)
+        command=lambda: send_request_kapital(entry_username, entry_password, entry_date_from, entry_date_to,
+                                             refresh_var, sync_var)
     ).pack(pady=10)
 
+    add_progress_panel(frm, "Kapital_Bank")
 
 
 
-def send_request_kapital(entry_username, entry_password, entry_date_from, entry_date_to):
+
+def send_request_kapital(entry_username, entry_password, entry_date_from, entry_date_to, refresh_var, sync_var):
     username = entry_username.get().strip()
     password = entry_password.get().strip()
     date_from = entry_date_from.get().strip()
@@ -137,10 +277,14 @@ def send_request_kapital(entry_username, entry_password, entry_date_from, entry_
     save_data("Kapital_Bank", username, password)
 
 
-    kapital_client.process_data(date_from, date_to, username, password)
-    messagebox.showinfo("Info", "Request has been sent. Check destination folder")
+    force_refresh, sync = refresh_var.get(), sync_var.get()
+    export_worker.submit(
+        "Kapital_Bank",
+        lambda progress: get_kapital_client().process_data(date_from, date_to, username, password,
+                                                     force_refresh=force_refresh, sync=sync, progress=progress),
+    )
 
-def send_request_pasha(entry_date_from, entry_date_to, entry_jwt_to, entry_api):
+def send_request_pasha(entry_date_from, entry_date_to, entry_jwt_to, entry_api, refresh_var, sync_var):
     jwt_val = entry_jwt_to.get().strip()
     api_val = entry_api.get().strip()
 
@@ -154,8 +298,12 @@ def send_request_pasha(entry_date_from, entry_date_to, entry_jwt_to, entry_api):
     date_from = entry_date_from.get().strip()
     date_to = entry_date_to.get().strip()
 
-    pasha_client.process_data(date_from, date_to, jwt_val, api_val)
-    messagebox.showinfo("Info", "Request has been sent. Check destination folder")
+    force_refresh, sync = refresh_var.get(), sync_var.get()
+    export_worker.submit(
+        "Pasha_Bank",
+        lambda progress: get_pasha_client().process_data(date_from, date_to, jwt_val, api_val,
+                                                   force_refresh=force_refresh, sync=sync, progress=progress),
+    )
 
 
 def save_data(bank:str, jwt: str, api_key: str):
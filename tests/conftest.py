@@ -0,0 +1,19 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# модули приложения запускаются из src, фейковый банк лежит рядом с бенчмарками
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from fake_bank_server import FakeBank, FakeBankServer  # noqa: E402
+
+
+@pytest.fixture
+def bank_server():
+    """Small fake bank without latency, one per test (scripts and the request log start empty)."""
+    with FakeBankServer(FakeBank(operations=200, accounts=3, page_size=50)) as server:
+        yield server
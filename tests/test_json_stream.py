@@ -0,0 +1,69 @@
+import asyncio
+import io
+import json
+import logging
+
+import pytest
+import requests
+
+from banks_api import json_stream
+from banks_api.pasha_bank_api import PashaBankAPI
+
+
+def test_streaming_json_is_turned_off_with_a_warning_without_ijson(tmp_path, monkeypatch, caplog):
+    monkeypatch.setattr(json_stream, "ijson", None)
+
+    with caplog.at_level(logging.WARNING):
+        client = PashaBankAPI(tmp_path, streaming_json=True)
+
+    # без ijson разбор всё равно читал бы тело целиком — потоковый режим не включается молча
+    assert client.streaming_json is False
+    assert "ijson" in caplog.text
+
+
+def test_streaming_json_stays_off_without_a_warning_when_not_requested(tmp_path, monkeypatch, caplog):
+    monkeypatch.setattr(json_stream, "ijson", None)
+
+    with caplog.at_level(logging.WARNING):
+        client = PashaBankAPI(tmp_path)
+
+    assert client.streaming_json is False
+    assert "ijson" not in caplog.text
+
+
+class AsyncBody:
+    """aiohttp's response.content for a body in memory, read in small chunks."""
+
+    def __init__(self, body: bytes) -> None:
+        self._body = io.BytesIO(body)
+
+    async def read(self, size: int = -1) -> bytes:
+        return self._body.read(size if size < 0 else min(size, 7))
+
+
+PAGE = {"operations": [{"id": i, "amount": i * 1.5, "tags": ["a", {"b": i}]} for i in range(20)],
+        "openingBalance": 10, "paginationMetaData": {"currentPage": 1, "totalPages": 1}}
+
+
+async def read_all(array):
+    return [item async for item in array]
+
+
+@pytest.mark.parametrize("keep_rest", [True, False])
+def test_async_streamed_array_gives_the_items_and_the_rest_of_the_page(keep_rest):
+    body = json.dumps(PAGE).encode()
+
+    streamed = json_stream.AsyncStreamedArray(AsyncBody(body), "operations", keep_rest)
+    items = asyncio.run(read_all(streamed))
+
+    assert items == PAGE["operations"]
+    assert streamed.bytes_read == len(body)
+    if keep_rest:
+        assert streamed.rest == {**PAGE, "operations": []}
+
+
+def test_async_streamed_array_raises_the_requests_decode_error():
+    streamed = json_stream.AsyncStreamedArray(AsyncBody(b'{"operations": [{"id": 1}, {"id": '), "operations")
+
+    with pytest.raises(requests.JSONDecodeError):
+        asyncio.run(read_all(streamed))
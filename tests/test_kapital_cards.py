@@ -0,0 +1,56 @@
+import sqlite3
+from collections import Counter
+from datetime import date
+
+import pytest
+
+from banks_api.kapital_bank_api import KapitalBankAPI
+from banks_api.rate_limiter import RateLimiter
+from fake_bank_server import KAPITAL_PREFIX, FakeBank, FakeBankServer
+
+ACCOUNTS = 6
+CARD_ACCOUNTS = 4
+CARDS_PER_ACCOUNT = 3
+
+CARDS_PATH = KAPITAL_PREFIX + "/cards"
+CARD_STATEMENT_PATH = KAPITAL_PREFIX + "/v2/statement/card"
+
+
+@pytest.fixture(params=["threads", "asyncio"])
+def use_asyncio(request):
+    if request.param == "asyncio":
+        pytest.importorskip("aiohttp")
+    return request.param == "asyncio"
+
+
+def test_cards_requested_once_and_card_statements_once_per_card_account_and_window(tmp_path, use_asyncio):
+    bank = FakeBank(operations=2000, accounts=ACCOUNTS, cards=CARD_ACCOUNTS, cards_per_account=CARDS_PER_ACCOUNT)
+    with FakeBankServer(bank) as server:
+        client = KapitalBankAPI(tmp_path, rate_limiter=RateLimiter({("kapital", "*"): (0, 1)}),
+                                use_asyncio=use_asyncio, report_format="sqlite")
+        client.base_url = server.url + KAPITAL_PREFIX
+
+        assert client.process_data("01-01-2024", "31-12-2024", "user", "password")
+
+        windows = client._calculate_90_days_period("2024-01-01", "2024-12-31")
+        assert len(windows) > 1
+        card_requests = Counter((r.query["accountNumber"], r.query["fromDate"], r.query["toDate"])
+                                for r in server.requests_to(CARD_STATEMENT_PATH))
+
+        # /cards не зависит от счёта: один запрос на выгрузку, сколько бы ни было счетов
+        assert len(server.requests_to(CARDS_PATH)) == 1
+        # по запросу на карточный счёт и 90-дневное окно, без повторов для карт одного счёта
+        assert set(card_requests.values()) == {1}
+        assert sorted(card_requests) == sorted((str(4100000000 + i), w["start"], w["end"])
+                                               for i in range(CARD_ACCOUNTS) for w in windows)
+
+    report, = tmp_path.glob("*.sqlite")
+    with sqlite3.connect(report) as db:
+        card_accounts = [row[0] for row in db.execute('SELECT "accountNumber" FROM "Cards"')]
+        card_operations = db.execute('SELECT COUNT(*) FROM "Cards_Statements"').fetchone()[0]
+
+    # каждая карта счёта в отчёте один раз, операции счёта не умножены на число его карт
+    assert sorted(card_accounts) == [str(4100000000 + i) for i in range(CARD_ACCOUNTS)]
+    expected = sum(bank.kapital_card_operations(i, date.fromisoformat(w["start"]), date.fromisoformat(w["end"]))[1]
+                   for i in range(CARD_ACCOUNTS) for w in windows)
+    assert card_operations == expected
@@ -0,0 +1,82 @@
+import threading
+
+import pytest
+
+from banks_api import report_sinks
+from banks_api.pasha_bank_api import PashaBankAPI
+from banks_api.progress import ExportCancelled, ProgressReporter
+from banks_api.rate_limiter import RateLimiter
+
+
+@pytest.fixture(params=["threads", "asyncio"])
+def use_asyncio(request):
+    if request.param == "asyncio":
+        pytest.importorskip("aiohttp")
+    return request.param == "asyncio"
+
+
+def streaming_client(tmp_path, server, use_asyncio):
+    client = PashaBankAPI(tmp_path, max_workers=1, report_format="csv", use_asyncio=use_asyncio,
+                          rate_limiter=RateLimiter({("pasha", "*"): (0, 1)}))
+    client.base_url = server.url
+    return client
+
+
+def test_streamed_report_writes_rows_while_later_accounts_are_still_to_fetch(bank_server, tmp_path, monkeypatch,
+                                                                            use_asyncio):
+    client = streaming_client(tmp_path, bank_server, use_asyncio)
+    events = []
+
+    if use_asyncio:
+        from banks_api.async_fetch import AsyncPashaFetcher
+
+        fetch_statements = AsyncPashaFetcher.fetch_account_statements
+
+        async def recorded_fetch(self, acc_no, *args):
+            events.append(("fetch", acc_no))
+            return await fetch_statements(self, acc_no, *args)
+
+        monkeypatch.setattr(AsyncPashaFetcher, "fetch_account_statements", recorded_fetch)
+    else:
+        fetch_statements = client._fetch_account_statements
+
+        def recorded_fetch(acc_no, *args):
+            events.append(("fetch", acc_no))
+            return fetch_statements(acc_no, *args)
+
+        monkeypatch.setattr(client, "_fetch_account_statements", recorded_fetch)
+
+    write_table = report_sinks.CsvSink.write_table
+
+    def recorded_write(self, name, columns, rows, **kwargs):
+        def recorded_rows():
+            for values in rows:
+                events.append(("write", name, values[0]))
+                yield values
+        return write_table(self, name, columns, recorded_rows(), **kwargs)
+
+    monkeypatch.setattr(report_sinks.CsvSink, "write_table", recorded_write)
+
+    assert client.process_data("2024-01-01", "2024-12-31", "jwt", "api-key")
+
+    fetched = [event[1] for event in events if event[0] == "fetch"]
+    assert len(fetched) == 3
+    first_written = events.index(next(e for e in events if e[:2] == ("write", "Statements")))
+    # с max_workers=1 загружен только следующий аккаунт; третий ждёт, пока пишутся строки первого
+    assert first_written < events.index(("fetch", fetched[2]))
+
+
+def test_cancelled_streamed_export_leaves_no_report(bank_server, tmp_path, use_asyncio):
+    client = streaming_client(tmp_path, bank_server, use_asyncio)
+    cancel = threading.Event()
+
+    def on_event(kind, value):
+        # первый аккаунт готов: выписки уже в отчёте, идёт таблица POS
+        if kind == "account_done":
+            cancel.set()
+
+    with pytest.raises(ExportCancelled):
+        client.process_data("2024-01-01", "2024-12-31", "jwt", "api-key",
+                            progress=ProgressReporter(on_event, cancel))
+
+    assert not list(tmp_path.iterdir())
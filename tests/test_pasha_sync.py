@@ -0,0 +1,65 @@
+from datetime import date
+
+from banks_api.pasha_bank_api import STATEMENT_PAGE_FIELDS, PashaBankAPI
+from db.transaction_store import TransactionStore
+
+ACCOUNT = "AZ00PAHA40060000000000"
+
+
+def statements_page(opening, closing, page, total, *operations):
+    return {
+        "operations": [{"operationDate": day, "transactionNo": number, "amountInAccountCurrency": 10.5}
+                       for day, number in operations],
+        "openingBalance": opening,
+        "closingBalance": closing,
+        "availableOpeningBalance": opening,
+        "availableClosingBalance": closing,
+        "pagination": {"currentPage": page, "totalPages": total},
+        "message": "",
+    }
+
+
+def test_sync_report_takes_page_fields_only_from_the_current_fetch(tmp_path):
+    store = TransactionStore(str(tmp_path / "bank.db"))
+    client = PashaBankAPI(tmp_path, store=store)
+
+    january = client._gather_statements_rows(ACCOUNT, statements_page(100, 200, 1, 1, ("2024-01-10", "T1")))
+    client._store_synced(ACCOUNT, (date(2024, 1, 1), date(2024, 1, 31), date(2024, 1, 1), date(2024, 1, 31)),
+                         january, complete=True)
+
+    february = client._gather_statements_rows(ACCOUNT, statements_page(200, 300, 2, 3, ("2024-02-10", "T2")))
+    rows = client._store_synced(ACCOUNT, (date(2024, 1, 1), date(2024, 2, 29), date(2024, 1, 31), date(2024, 2, 29)),
+                                february, complete=True)
+
+    by_number = {row["transactionNo"]: row for row in rows}
+    assert set(by_number) == {"T1", "T2"}
+
+    # строка прошлой синхронизации: балансов и страниц её окна в отчёте нет
+    assert all(by_number["T1"][field] == "N/A" for field in STATEMENT_PAGE_FIELDS)
+    assert by_number["T1"]["amountInAccountCurrency"] == 10.5
+
+    # строка этой загрузки — с полями её страницы
+    assert by_number["T2"]["openingBalance"] == 200
+    assert by_number["T2"]["closingBalance"] == 300
+    assert (by_number["T2"]["page_current"], by_number["T2"]["page_total"]) == (2, 3)
+
+    # в хранилище только поля операций
+    stored = store.load("pasha", "statements", ACCOUNT, date(2024, 1, 1), date(2024, 2, 29))
+    assert stored and not any(STATEMENT_PAGE_FIELDS & set(record) for record in stored)
+
+
+def test_pages_without_operations_leave_no_ghost_rows_in_the_store(tmp_path):
+    store = TransactionStore(str(tmp_path / "bank.db"))
+    client = PashaBankAPI(tmp_path, store=store)
+    window = (date(2024, 1, 1), date(2024, 1, 31), date(2024, 1, 1), date(2024, 1, 31))
+
+    # страница не загрузилась ({}): в отчёте строка-заглушка, в хранилище ничего
+    failed = client._gather_statements_rows(ACCOUNT, client._statements_page({}))
+    rows = client._store_synced(ACCOUNT, window, failed, complete=False)
+    assert len(rows) == 1 and rows[0]["transactionNo"] == "N/A"
+    assert store.load("pasha", "statements", ACCOUNT, date(2024, 1, 1), date(2024, 1, 31)) == []
+
+    january = client._gather_statements_rows(ACCOUNT, statements_page(100, 200, 1, 1, ("2024-01-10", "T1")))
+    rows = client._store_synced(ACCOUNT, window, january, complete=True)
+
+    assert [row["transactionNo"] for row in rows] == ["T1"]
@@ -0,0 +1,82 @@
+import pytest
+from openpyxl import load_workbook
+
+from banks_api.report_sinks import ParquetSink, ReportSink, XlsxSink
+
+
+def test_xlsx_index_is_the_first_sheet_and_links_to_every_shard(tmp_path):
+    with XlsxSink(str(tmp_path / "report"), sheet_rows=3) as sink:
+        sink.write_table("Accounts", ["accountNo"], [["A"], ["B"]])
+        sink.write_table("Statements", ["accountNo", "amount"], [["A", i] for i in range(7)])
+        sink.write_table("POS", ["accountNo", "amount"], [["A", 1], ["B", 2], ["A", 3]],
+                         shard_key=lambda values: values[0])
+    workbook = load_workbook(sink.path)
+
+    assert workbook.sheetnames == ["Index", "Accounts", "Statements_1", "Statements_2", "Statements_3",
+                                   "POS_1", "POS_2"]
+
+    index_rows = list(workbook["Index"].iter_rows(min_row=2))
+    assert [[cell.value for cell in row] for row in index_rows] == [
+        ["Statements_1", "Statements", None, 3],
+        ["Statements_2", "Statements", None, 3],
+        ["Statements_3", "Statements", None, 1],
+        ["POS_1", "POS", "A", 2],
+        ["POS_2", "POS", "B", 1],
+    ]
+    for row in index_rows:
+        link = row[0].hyperlink
+        # внутренняя ссылка на A1 листа из той же строки, а не внешний адрес
+        assert link.target is None
+        sheet, cell = link.location.rsplit("!", 1)
+        assert sheet.strip("'") in workbook.sheetnames and sheet.strip("'") == row[0].value
+        assert cell == "A1"
+        assert workbook[row[0].value].max_row - 1 == row[3].value
+
+
+def test_xlsx_without_split_tables_has_no_index(tmp_path):
+    with XlsxSink(str(tmp_path / "report")) as sink:
+        sink.write_table("Accounts", ["accountNo"], [["A"], ["B"]])
+
+    assert load_workbook(sink.path).sheetnames == ["Accounts"]
+
+
+def write_parquet(tmp_path, rows, batch_size=2):
+    pq = pytest.importorskip("pyarrow.parquet")
+    with ParquetSink(str(tmp_path / "report"), batch_size=batch_size) as sink:
+        count = sink.write_table("Statements", ["amount"], rows)
+    table = pq.read_table(tmp_path / "report" / "Statements.parquet")
+    return count, table
+
+
+def test_parquet_widens_whole_amounts_to_float_instead_of_nulling(tmp_path):
+    # JSON 100 приходит как int: первая группа одних целых не должна делать колонку int64 навсегда
+    count, table = write_parquet(tmp_path, [[100], [200], [150.75], [99.5]])
+
+    assert count == 4
+    assert str(table.schema.field("amount").type) == "double"
+    assert table.column("amount").to_pylist() == [100.0, 200.0, 150.75, 99.5]
+
+
+def test_parquet_falls_back_to_string_for_mixed_values(tmp_path):
+    count, table = write_parquet(tmp_path, [[1], ["N/A"], [2.5], [None], ["x"], [True]])
+
+    assert count == 6
+    assert str(table.schema.field("amount").type) == "string"
+    # int64 -> float64 -> string: первая группа уже была переписана как 1.0
+    assert table.column("amount").to_pylist() == ["1.0", None, "2.5", None, "x", "True"]
+
+
+def test_parquet_keeps_types_that_fit(tmp_path):
+    _, table = write_parquet(tmp_path, [[1], [2], ["N/A"], [3]])
+
+    assert str(table.schema.field("amount").type) == "int64"
+    assert table.column("amount").to_pylist() == [1, 2, None, 3]
+    assert not list((tmp_path / "report").glob("*.part"))
+
+
+def test_sink_without_write_table_fails_when_created(tmp_path):
+    class NoTables(ReportSink):
+        pass
+
+    with pytest.raises(TypeError):
+        NoTables(str(tmp_path / "report"))
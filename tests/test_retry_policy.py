@@ -0,0 +1,206 @@
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+import pytest
+import requests
+
+from banks_api.progress import ExportCancelled, ProgressReporter
+from banks_api.retry_policy import CircuitBreaker, CircuitOpenError, RetryPolicy
+from banks_api.transport import HttpTransport
+from fake_bank_server import DROP
+
+PATH = "/api/v1/accounts"
+
+
+@pytest.fixture
+def get(bank_server):
+    session = HttpTransport(connect_timeout=2, read_timeout=2).session()
+    url = bank_server.url + PATH
+    yield url, lambda: session.get(url)
+    session.close()
+
+
+def policy(**kwargs) -> RetryPolicy:
+    kwargs.setdefault("backoff_base", 0.01)
+    kwargs.setdefault("breaker", CircuitBreaker(failure_threshold=100))
+    return RetryPolicy(**kwargs)
+
+
+def test_retries_scripted_failures_until_success(bank_server, get):
+    url, send = get
+    bank_server.script(PATH, 503, 502, DROP)
+
+    response = policy(max_attempts=4).send(send, url)
+
+    assert response.status_code == 200
+    assert len(bank_server.requests_to(PATH)) == 4
+
+
+def test_returns_last_retryable_response_after_max_attempts(bank_server, get):
+    url, send = get
+    bank_server.script(PATH, *[503] * 5)
+
+    response = policy(max_attempts=3).send(send, url)
+
+    assert response.status_code == 503
+    assert len(bank_server.requests_to(PATH)) == 3
+
+
+def test_reraises_last_connection_error(bank_server, get):
+    url, send = get
+    bank_server.script(PATH, DROP, DROP)
+
+    with pytest.raises(requests.ConnectionError):
+        policy(max_attempts=2).send(send, url)
+    assert len(bank_server.requests_to(PATH)) == 2
+
+
+def test_non_retryable_status_is_not_retried(bank_server, get):
+    url, send = get
+    bank_server.script(PATH, 400)
+
+    assert policy().send(send, url).status_code == 400
+    assert len(bank_server.requests_to(PATH)) == 1
+
+
+def test_retry_after_is_honoured(bank_server, get):
+    url, send = get
+    bank_server.script(PATH, (429, {"Retry-After": "1"}))
+
+    # без Retry-After пауза была бы не больше backoff_base
+    response = policy(backoff_base=0.01, backoff_max=0.01).send(send, url)
+
+    first, second = bank_server.requests_to(PATH)
+    assert response.status_code == 200
+    assert second.at - first.at >= 0.9
+
+
+def test_429_does_not_open_the_breaker(bank_server, get):
+    url, send = get
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    bank_server.script(PATH, (429, {"Retry-After": "0"}), (429, {"Retry-After": "0"}))
+
+    assert policy(breaker=breaker).send(send, url).status_code == 200
+    assert not breaker.is_open(urlsplit(url).netloc)
+
+
+def test_deadline_stops_retries(bank_server, get):
+    url, send = get
+    bank_server.script(PATH, (503, {"Retry-After": "5"}), 503)
+    progress = ProgressReporter()
+    progress.start_deadline(1.0)
+
+    started = time.monotonic()
+    response = policy(max_attempts=4).send(send, url, progress)
+
+    # пауза в 5 с не помещается в оставшийся срок: повторов нет, ожидания тоже
+    assert response.status_code == 503
+    assert len(bank_server.requests_to(PATH)) == 1
+    assert time.monotonic() - started < 1.0
+
+
+def test_breaker_opens_half_opens_and_closes(bank_server, get):
+    url, send = get
+    host = urlsplit(url).netloc
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.5)
+    retry_policy = policy(max_attempts=5, breaker=breaker)
+    bank_server.script(PATH, 503, 503)
+
+    # открыт после двух неудач подряд: оставшиеся попытки не тратятся
+    assert retry_policy.send(send, url).status_code == 503
+    assert len(bank_server.requests_to(PATH)) == 2
+    assert breaker.is_open(host)
+
+    # открыт: запрос отклоняется, не доходя до банка
+    with pytest.raises(CircuitOpenError):
+        retry_policy.send(send, url)
+    assert len(bank_server.requests_to(PATH)) == 2
+
+    # через reset_timeout — полуоткрыт: пробный запрос проходит и закрывает размыкатель
+    time.sleep(0.6)
+    assert retry_policy.send(send, url).status_code == 200
+    assert len(bank_server.requests_to(PATH)) == 3
+    assert not breaker.is_open(host)
+
+
+def test_failed_probe_reopens_the_breaker(bank_server, get):
+    url, send = get
+    host = urlsplit(url).netloc
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.5)
+    retry_policy = policy(max_attempts=1, breaker=breaker)
+    bank_server.script(PATH, DROP, DROP)
+
+    with pytest.raises(requests.ConnectionError):
+        retry_policy.send(send, url)
+    time.sleep(0.6)
+    with pytest.raises(requests.ConnectionError):
+        retry_policy.send(send, url)
+
+    # проба не удалась: снова открыт на полный reset_timeout
+    with pytest.raises(CircuitOpenError):
+        retry_policy.send(send, url)
+    time.sleep(0.6)
+    assert retry_policy.send(send, url).status_code == 200
+    assert not breaker.is_open(host)
+
+
+def _open_then_wait(retry_policy: RetryPolicy, send, url: str, bank_server) -> None:
+    bank_server.script(PATH, DROP)
+    with pytest.raises(requests.ConnectionError):
+        retry_policy.send(send, url)
+    time.sleep(0.6)
+
+
+def test_probe_cut_off_mid_response_counts_as_failure(bank_server, get):
+    url, send = get
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.5)
+    retry_policy = policy(max_attempts=1, breaker=breaker)
+    _open_then_wait(retry_policy, send, url, bank_server)
+
+    def cut_off():
+        raise requests.exceptions.ChunkedEncodingError("connection broken mid-body")
+
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        retry_policy.send(cut_off, url)
+
+    # проба не удалась — снова открыт, а через reset_timeout следующая проба проходит
+    with pytest.raises(CircuitOpenError):
+        retry_policy.send(send, url)
+    time.sleep(0.6)
+    assert retry_policy.send(send, url).status_code == 200
+    assert not breaker.is_open(urlsplit(url).netloc)
+
+
+def test_cancelled_probe_frees_the_half_open_slot(bank_server, get):
+    url, send = get
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.5)
+    retry_policy = policy(max_attempts=1, breaker=breaker)
+    _open_then_wait(retry_policy, send, url, bank_server)
+
+    def cancelled():
+        raise ExportCancelled()
+
+    with pytest.raises(ExportCancelled):
+        retry_policy.send(cancelled, url)
+
+    # отмена ничего не сказала о банке: следующий запрос сразу становится пробой
+    assert retry_policy.send(send, url).status_code == 200
+    assert not breaker.is_open(urlsplit(url).netloc)
+
+
+def test_cancelled_async_probe_frees_the_half_open_slot(bank_server, get):
+    url, send = get
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.5)
+    retry_policy = policy(max_attempts=1, breaker=breaker)
+    _open_then_wait(retry_policy, send, url, bank_server)
+
+    async def cancelled():
+        raise asyncio.CancelledError()
+
+    async def ok():
+        return send()
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(retry_policy.send_async(cancelled, url))
+    assert asyncio.run(retry_policy.send_async(ok, url)).status_code == 200
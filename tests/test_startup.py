@@ -0,0 +1,22 @@
+import sys
+
+import pytest
+
+from bench_startup import BUDGET_MS, LAZY_MODULES, measure_all_imports, measure_startup, startup_code
+
+pytest.importorskip("tkinter")
+
+
+def test_startup_imports_fit_the_budget():
+    # лучший из трёх холодных запусков: одиночный замер шумит на занятой машине
+    timings = measure_startup(sys.executable, runs=3)
+
+    assert "tkinter_utils" in timings
+    assert sum(timings.values()) / 1000 <= BUDGET_MS, timings
+
+
+def test_heavy_modules_are_not_imported_at_startup():
+    imported = measure_all_imports(sys.executable, startup_code())
+
+    assert "tkinter_utils" in imported
+    assert [module for module in LAZY_MODULES if module in imported] == []